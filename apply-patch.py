@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import sys
+import utils as u
+
+
+if __name__ == '__main__':
+    args = u.parse_args(
+        description='Upgrades a pokeapi.sqlite file in place with a patch created by "build.py --base". The patch is applied in a single transaction, so the file is left untouched if anything fails.',
+        args={
+            'patch': {
+                'help': 'The patch file (pokeapi.sqlite.patch)',
+            },
+            '--db': {
+                'default': 'pokeapi.sqlite',
+                'metavar': 'FILE',
+                'help': 'The database to upgrade (default: pokeapi.sqlite)',
+            },
+            '--force': {
+                'action': 'store_true',
+                'help': 'Apply the patch even if the database was not built from the same commits as the base of the patch',
+            },
+            '--vacuum': {
+                'action': 'store_true',
+                'help': 'VACUUM the database after applying the patch',
+            },
+        }
+    )
+
+    for file in [args.patch, args.db]:
+        if not os.path.exists(file):
+            u.error(f'The {file} file does not exist.')
+            sys.exit(1)
+
+    patch = sqlite3.connect(f'file:{args.patch}?mode=ro', uri=True)
+    db = sqlite3.connect(args.db)
+
+    patch_metadata = dict(patch.execute('SELECT key, value FROM __metadata'))
+    metadata = dict(db.execute('SELECT key, value FROM __metadata'))
+
+    u.info(f'Patch created at: {patch_metadata["created_at"]}')
+    for key in ['pokeapi_git_sha', 'pokeapi_sqlite_git_sha']:
+        u.info(f'{key}: {patch_metadata["base_" + key]} -> {patch_metadata[key]}')
+    u.info()
+
+    if metadata.get('pokeapi_git_sha') == patch_metadata['pokeapi_git_sha'] and metadata.get('created_at') == patch_metadata['created_at']:
+        u.info(f'The {args.db} file is already up to date.')
+        sys.exit(0)
+
+    for key in ['pokeapi_git_sha', 'pokeapi_sqlite_git_sha', 'created_at']:
+        if metadata.get(key) != patch_metadata['base_' + key]:
+            if args.force:
+                u.warn(f'The {key} of {args.db} ({metadata.get(key)}) does not match the base of the patch.')
+            else:
+                u.error(f'The {key} of {args.db} ({metadata.get(key)}) does not match the base of the patch.')
+                u.info('Use --force to apply it anyway.')
+                sys.exit(1)
+
+    u.info(f'Applying patch to {args.db}...')
+    filesize = os.path.getsize(args.db)
+    try:
+        changes = u.apply_patch(db, patch)
+    except (ValueError, sqlite3.Error) as e:
+        u.error(f'Failed to apply the patch, {args.db} was not changed: {e}')
+        sys.exit(1)
+
+    for table_name, counts in sorted(changes.items()):
+        if counts == 'drop':
+            u.info(f'   {table_name}: dropped')
+        else:
+            u.info(f'   {table_name}: {", ".join(f"{count} {op}" for op, count in counts.items()) or "recreated"}')
+
+    if args.vacuum:
+        u.info('Vacuuming...')
+        db.execute('VACUUM')
+    db.close()
+
+    u.info()
+    u.info(f'File Size: {filesize / 1024 / 1024:.2f} MB -> {os.path.getsize(args.db) / 1024 / 1024:.2f} MB')
+    u.info('Done!')
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+import time
+import u
+
+build_py = os.path.join(u.parent_dir, 'build.py')
+
+# The build modes that are compared, the default build is the baseline
+MODES = {
+    'default': [],
+    'fast': ['--fast'],
+}
+
+
+# Builds the database with build.py, returning the wall clock time and the peak
+# memory usage (os.wait4 gives the resource usage of just that child, it's not
+# available on Windows)
+def run(args, cwd, log_file):
+    with open(log_file, 'w', encoding='utf8') as log:
+        started_at = time.perf_counter()
+        process = subprocess.Popen(args, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            _, status, rusage = os.wait4(process.pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+            # macOS reports bytes, everything else kilobytes
+            peak_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+        else:
+            returncode = process.wait()
+            peak_rss = None
+        seconds = time.perf_counter() - started_at
+
+    if returncode != 0:
+        u.error(f'build.py {" ".join(args[2:])} failed with exit code {returncode}, see {log_file}')
+        sys.exit(1)
+    return seconds, peak_rss
+
+
+def main():
+    args = u.parse_args(
+        description='Compares the time taken by build.py to build the database, and the size of the file it builds, in the default mode and with --fast.',
+        args={
+            'directory': {
+                'nargs': '?',
+                'default': u.parent_dir,
+                'help': 'The directory to run build.py in, which has the PokeAPI repo checked out (default: the root of this repo, see run-benchmarks.py for synthetic data)',
+            },
+            '--repeat': {
+                'type': int,
+                'default': 3,
+                'metavar': 'N',
+                'help': 'Number of times to build in each mode, the best time is kept (default: 3)',
+            },
+            '--workdir': {
+                'default': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'work'),
+                'metavar': 'DIR',
+                'help': 'Directory to write the builds to (default: bench/work)',
+            },
+            '--output': {
+                'metavar': 'FILE',
+                'help': 'Write the results as JSON to this file',
+            },
+        }
+    )
+
+    if not os.path.exists(os.path.join(args.directory, 'pokeapi')):
+        u.error(f'The PokeAPI repo does not exist in {args.directory}.')
+        sys.exit(1)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    outputs = {mode: os.path.join(args.workdir, f'build-{mode}.sqlite') for mode in MODES}
+
+    # The modes take turns so a slow spell of the machine doesn't favour one
+    runs = {mode: [] for mode in MODES}
+    for i in range(args.repeat):
+        for mode, mode_args in MODES.items():
+            build_args = [sys.executable, build_py, '--no-clone', '--overwrite', '--output', outputs[mode], *mode_args]
+            runs[mode].append(run(build_args, args.directory, f'{outputs[mode]}.log'))
+
+    results = {}
+    for mode in MODES:
+        result = results[mode] = {
+            'seconds': min(seconds for seconds, _ in runs[mode]),
+            'peak_rss': max((peak_rss for _, peak_rss in runs[mode] if peak_rss is not None), default=None),
+            'file_size': os.path.getsize(outputs[mode]),
+        }
+        text = f'{result["seconds"]:.2f}s'
+        if result['peak_rss'] is not None:
+            text += f', {result["peak_rss"] / 1024 / 1024:.1f} MB peak'
+        text += f', {result["file_size"] / 1024 / 1024:.2f} MB file'
+        baseline = results['default']
+        if mode != 'default':
+            seconds_change = (result['seconds'] - baseline['seconds']) / baseline['seconds'] * 100
+            size_change = (result['file_size'] - baseline['file_size']) / baseline['file_size'] * 100
+            text += f' ({seconds_change:+.1f}% time, {size_change:+.1f}% size)'
+        u.info(f'{mode:<8} {text}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4)
+        u.info(f'Results written to {args.output}')
+
+
+main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+import csv
+import os
+import random
+import u
+
+# Row counts of the real data set (roughly) at scale 1
+SPECIES = 1025
+FORMS = 300
+MOVES = 920
+ITEMS = 2100
+ABILITIES = 310
+LOCATIONS = 800
+VERSION_GROUPS = 25
+
+# (id, iso639, iso3166, identifier)
+LANGUAGES = [
+    (1, 'ja', 'jp', 'ja-Hrkt'),
+    (2, 'ja', 'jp', 'roomaji'),
+    (3, 'ko', 'kr', 'ko'),
+    (4, 'zh', 'tw', 'zh-Hant'),
+    (5, 'fr', 'fr', 'fr'),
+    (6, 'de', 'de', 'de'),
+    (7, 'es', 'es', 'es'),
+    (8, 'it', 'it', 'it'),
+    (9, 'en', 'us', 'en'),
+    (10, 'cs', 'cz', 'cs'),
+    (11, 'ja', 'jp', 'ja'),
+    (12, 'zh', 'cn', 'zh-Hans'),
+]
+NAME_LANGUAGES = [1, 3, 4, 5, 6, 7, 8, 9, 11, 12]
+FLAVOR_TEXT_LANGUAGES = [1, 3, 5, 6, 7, 8, 9, 11]
+
+TYPES = [
+    'normal', 'fighting', 'flying', 'poison', 'ground', 'rock', 'bug', 'ghost', 'steel',
+    'fire', 'water', 'grass', 'electric', 'psychic', 'ice', 'dragon', 'dark', 'fairy',
+]
+STATS = [
+    (1, '', 'hp', 0, 1),
+    (2, 2, 'attack', 0, 2),
+    (3, 2, 'defense', 0, 3),
+    (4, 3, 'special-attack', 0, 5),
+    (5, 3, 'special-defense', 0, 6),
+    (6, '', 'speed', 0, 4),
+    (7, '', 'accuracy', 1, ''),
+    (8, '', 'evasion', 1, ''),
+]
+IDENTIFIER_TABLES = {
+    'pokemon_habitats': ['cave', 'forest', 'grassland', 'mountain', 'rare', 'rough-terrain', 'sea', 'urban', 'waters-edge'],
+    'egg_groups': ['monster', 'water1', 'bug', 'flying', 'ground', 'fairy', 'plant', 'humanshape', 'water3', 'mineral', 'indeterminate', 'water2', 'ditto', 'dragon', 'no-eggs'],
+    'pokemon_move_methods': ['level-up', 'egg', 'tutor', 'machine', 'stadium-surfing-pikachu', 'light-ball-egg', 'colosseum-purification', 'xd-shadow', 'xd-purification', 'form-change', 'zygarde-cube'],
+    'move_targets': ['specific-move', 'selected-pokemon-me-first', 'ally', 'users-field', 'user-or-ally', 'opponents-field', 'user', 'random-opponent', 'all-other-pokemon', 'selected-pokemon', 'all-opponents', 'entire-field', 'user-and-allies', 'all-pokemon'],
+    'move_damage_classes': ['status', 'physical', 'special'],
+    'move_meta_categories': ['damage', 'ailment', 'net-good-stats', 'heal', 'damage+ailment', 'swagger', 'damage+lower', 'damage+raise', 'damage+heal', 'ohko', 'whole-field-effect', 'field-effect', 'force-switch', 'unique'],
+    'evolution_triggers': ['level-up', 'trade', 'use-item', 'shed', 'spin', 'tower-of-darkness', 'tower-of-waters', 'three-critical-hits', 'take-damage', 'other'],
+    'genders': ['female', 'male', 'genderless'],
+    'regions': ['kanto', 'johto', 'hoenn', 'sinnoh', 'unova', 'kalos', 'alola', 'galar', 'hisui', 'paldea'],
+}
+MOVE_META_AILMENTS = ['unknown', 'none', 'paralysis', 'sleep', 'freeze', 'burn', 'poison', 'confusion', 'infatuation', 'trap']
+MECHANICS = ['hp', 'burn', 'paralysis', 'sleep', 'regular-damage', 'critical-hit', 'stat-modifier', 'weather']
+WORDS = [
+    'the', 'user', 'target', 'opponent', 'attack', 'raises', 'lowers', 'damage', 'turn', 'chance',
+    'power', 'speed', 'with', 'every', 'its', 'foe', 'strikes', 'hard', 'may', 'cause', 'a',
+    'powerful', 'blast', 'of', 'wind', 'fire', 'water', 'electricity', 'body', 'move',
+]
+
+
+class Generator:
+    def __init__(self, directory, scale, seed):
+        self.directory = directory
+        self.random = random.Random(seed)
+
+        # Scaling up adds version groups (which is how the real data grows, the big
+        # tables are all per version group) while scaling down shrinks everything.
+        # The entity counts are never scaled up as ids >= 10000 have a special
+        # meaning (non-standard pokemon, moves, etc)
+        entity_scale = min(scale, 1)
+        self.species = max(3, round(SPECIES * entity_scale))
+        self.forms = max(1, round(FORMS * entity_scale))
+        self.moves = max(3, round(MOVES * entity_scale))
+        self.items = max(3, round(ITEMS * entity_scale))
+        self.abilities = max(3, round(ABILITIES * entity_scale))
+        self.locations = max(3, round(LOCATIONS * entity_scale))
+        self.version_groups = max(3, round(VERSION_GROUPS * scale))
+
+        # The default form of a species has the same id as the species
+        self.pokemon = [(i, i) for i in range(1, self.species + 1)]
+        self.pokemon += [(10000 + i, 1 + (i * 7) % self.species) for i in range(1, self.forms + 1)]
+
+    def write(self, table_name, header, rows):
+        path = os.path.join(self.directory, f'{table_name}.csv')
+        with open(path, 'w', encoding='utf8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def sentence(self, length):
+        words = ' '.join(self.random.choice(WORDS) for _ in range(length))
+        return words.capitalize() + '.'
+
+    # Prose with the [label]{kind:target} mark-up used by the effect tables
+    def prose(self, length):
+        return ' '.join([
+            self.sentence(length),
+            f'Like []{{move:move-{self.random.randint(1, self.moves)}}}, this can cause',
+            f'[{self.random.choice(MECHANICS)}]{{mechanic:{self.random.choice(MECHANICS)}}}.',
+            f'Has no effect on []{{type:{self.random.choice(TYPES)}}} Pokémon.',
+        ])
+
+    # Flavor text has hard line breaks and the occasional form feed
+    def flavor_text(self):
+        text = self.sentence(self.random.randint(8, 16))
+        text = text.replace(' ', '\n', 1)
+        if self.random.random() < 0.2:
+            text = text.replace(' ', '\x0c', 1)
+        return text
+
+    # Flavor text only exists for some of the version groups and, for most
+    # entities, only in english
+    def version_group_range(self, id):
+        return range(1 + id % 5, self.version_groups + 1, 4)
+
+    def flavor_text_languages(self, id):
+        return FLAVOR_TEXT_LANGUAGES if id % 3 == 0 else [9]
+
+    def generate(self):
+        r = self.random
+
+        # Languages, versions and other small lookup tables
+        self.write('languages', ['id', 'iso639', 'iso3166', 'identifier', 'official', 'order'], (
+            (id, iso639, iso3166, identifier, 1, order)
+            for order, (id, iso639, iso3166, identifier) in enumerate(LANGUAGES, 1)
+        ))
+        self.write('language_names', ['language_id', 'local_language_id', 'name'], (
+            (id, local_id, identifier)
+            for id, _, _, identifier in LANGUAGES
+            for local_id in NAME_LANGUAGES
+        ))
+        self.write('generations', ['id', 'main_region_id', 'identifier'], (
+            (i, i, f'generation-{i}') for i in range(1, 10)
+        ))
+        self.write('version_groups', ['id', 'identifier', 'generation_id', 'order'], (
+            (i, f'version-group-{i}', min(9, 1 + i // 3), i) for i in range(1, self.version_groups + 1)
+        ))
+        self.write('versions', ['id', 'version_group_id', 'identifier'], (
+            (i, (i + 1) // 2, f'version-{i}') for i in range(1, 2 * self.version_groups + 1)
+        ))
+        self.write('stats', ['id', 'damage_class_id', 'identifier', 'is_battle_only', 'game_index'], STATS)
+        self.write('growth_rates', ['id', 'identifier', 'formula'], (
+            (i, identifier, '\\frac{6x^3}{5} - 15x^2 + 100x - 140')
+            for i, identifier in enumerate(['slow', 'medium', 'fast', 'medium-slow', 'slow-then-very-fast', 'fast-then-very-slow'], 1)
+        ))
+        for table_name, identifiers in IDENTIFIER_TABLES.items():
+            self.write(table_name, ['id', 'identifier'], enumerate(identifiers, 1))
+        self.write('move_meta_ailments', ['id', 'identifier'], enumerate(MOVE_META_AILMENTS, -1))
+        self.write('locations', ['id', 'region_id', 'identifier'], (
+            (i, r.choice(['', r.randint(1, 10)]), f'location-{i}') for i in range(1, self.locations + 1)
+        ))
+
+        # Types
+        self.write('types', ['id', 'identifier', 'generation_id', 'damage_class_id'], [
+            *((i, identifier, 1, r.choice(['', 2, 3])) for i, identifier in enumerate(TYPES, 1)),
+            (10001, 'unknown', 2, ''),
+            (10002, 'shadow', 3, ''),
+        ])
+        self.write('type_names', ['type_id', 'local_language_id', 'name'], (
+            (i, language_id, identifier.title())
+            for i, identifier in enumerate(TYPES, 1)
+            for language_id in NAME_LANGUAGES
+        ))
+        self.write('type_efficacy', ['damage_type_id', 'target_type_id', 'damage_factor'], (
+            (damage_type_id, target_type_id, r.choice([0, 50, 100, 100, 100, 200]))
+            for damage_type_id in range(1, len(TYPES) + 1)
+            for target_type_id in range(1, len(TYPES) + 1)
+        ))
+        self.write('type_efficacy_past', ['damage_type_id', 'target_type_id', 'damage_factor', 'generation_id'], [
+            (8, 9, 50, 5),
+            (16, 9, 50, 5),
+            (17, 9, 50, 5),
+        ])
+
+        # Abilities
+        self.write('abilities', ['id', 'identifier', 'generation_id', 'is_main_series'], (
+            (i, f'ability-{i}', 1 + i % 9, 1) for i in range(1, self.abilities + 1)
+        ))
+        self.write('ability_names', ['ability_id', 'local_language_id', 'name'], (
+            (i, language_id, f'Ability {i}')
+            for i in range(1, self.abilities + 1)
+            for language_id in NAME_LANGUAGES
+        ))
+        self.write('ability_flavor_text', ['ability_id', 'version_group_id', 'language_id', 'flavor_text'], (
+            (i, version_group_id, language_id, self.flavor_text())
+            for i in range(1, self.abilities + 1)
+            for version_group_id in self.version_group_range(i)
+            for language_id in self.flavor_text_languages(i)
+        ))
+
+        # Items
+        self.write('item_categories', ['id', 'pocket_id', 'identifier'], (
+            (i, 1 + i % 8, f'item-category-{i}') for i in range(1, 51)
+        ))
+        self.write('items', ['id', 'identifier', 'category_id', 'cost', 'fling_power', 'fling_effect_id'], (
+            (i, f'item-{i}', r.randint(1, 50), r.randint(0, 100) * 100, r.choice(['', 10, 30, 90]), r.choice(['', '', 1, 2, 3]))
+            for i in range(1, self.items + 1)
+        ))
+        self.write('item_names', ['item_id', 'local_language_id', 'name'], (
+            (i, language_id, f'Item {i}')
+            for i in range(1, self.items + 1)
+            for language_id in NAME_LANGUAGES
+        ))
+        self.write('item_prose', ['item_id', 'local_language_id', 'short_effect', 'effect'], (
+            (i, 9, self.sentence(8), self.prose(25)) for i in range(1, self.items + 1)
+        ))
+        self.write('item_flavor_text', ['item_id', 'version_group_id', 'language_id', 'flavor_text'], (
+            (i, version_group_id, language_id, self.flavor_text())
+            for i in range(1, self.items + 1)
+            for version_group_id in self.version_group_range(i)
+            for language_id in self.flavor_text_languages(i)
+        ))
+
+        # Moves
+        move_effects = max(3, self.moves // 3)
+        self.write('moves', ['id', 'identifier', 'generation_id', 'type_id', 'power', 'pp', 'accuracy', 'priority', 'target_id', 'damage_class_id', 'effect_id', 'effect_chance', 'contest_type_id', 'contest_effect_id', 'super_contest_effect_id'], [
+            *(
+                (
+                    i, f'move-{i}', 1 + i % 9, r.randint(1, len(TYPES)),
+                    r.choice(['', 40, 60, 80, 90, 120]), r.choice([5, 10, 15, 20, 35, '']),
+                    r.choice(['', 100, 90, 85, 70]), r.choice([0, 0, 0, 1, -1]),
+                    r.randint(1, 14), r.randint(1, 3), 1 + i % move_effects,
+                    r.choice(['', '', 10, 30]), r.choice(['', 1, 2, 3]), r.choice(['', 1, 2]), r.choice(['', 1, 2]),
+                )
+                for i in range(1, self.moves + 1)
+            ),
+            *(
+                (10000 + i, f'shadow-move-{i}', 3, 10002, 90, '', 100, 0, 10, 2, 1, '', '', '', '')
+                for i in range(1, 19)
+            ),
+        ])
+        self.write('move_names', ['move_id', 'local_language_id', 'name'], (
+            (i, language_id, f'Move {i}')
+            for i in range(1, self.moves + 1)
+            for language_id in NAME_LANGUAGES
+        ))
+        self.write('move_effect_prose', ['move_effect_id', 'local_language_id', 'short_effect', 'effect'], (
+            (i, 9, 'Inflicts [regular damage]{mechanic:regular-damage} with a $effect_chance% chance.', self.prose(40))
+            for i in range(1, move_effects + 1)
+        ))
+        self.write('move_flavor_text', ['move_id', 'version_group_id', 'language_id', 'flavor_text'], (
+            (i, version_group_id, language_id, self.flavor_text())
+            for i in range(1, self.moves + 1)
+            for version_group_id in self.version_group_range(i)
+            for language_id in self.flavor_text_languages(i)
+        ))
+        self.write('move_meta', ['move_id', 'meta_category_id', 'meta_ailment_id', 'min_hits', 'max_hits', 'min_turns', 'max_turns', 'drain', 'healing', 'crit_rate', 'ailment_chance', 'flinch_chance', 'stat_chance'], (
+            (
+                i, r.randint(0, 13), r.choice([0, 0, 0, 1, 2, 4]),
+                *((2, 5) if i % 7 == 0 else ('', '')),
+                *((2, 3) if i % 11 == 0 else ('', '')),
+                r.choice([0, 0, 0, 50, -25]), r.choice([0, 0, 0, 50]), r.choice([0, 0, 1]),
+                r.choice([0, 0, 10, 30]), r.choice([0, 0, 0, 30]), r.choice([0, 0, 100]),
+            )
+            for i in range(1, self.moves + 1)
+        ))
+        self.write('move_meta_stat_changes', ['move_id', 'stat_id', 'change'], (
+            (i, stat_id, r.choice([-2, -1, 1, 2]))
+            for i in range(5, self.moves + 1, 5)
+            for stat_id in sorted(r.sample(range(1, 7), r.randint(1, 2)))
+        ))
+
+        # Pokemon
+        self.write('pokemon_species', ['id', 'identifier', 'generation_id', 'evolves_from_species_id', 'evolution_chain_id', 'color_id', 'shape_id', 'habitat_id', 'gender_rate', 'capture_rate', 'base_happiness', 'is_baby', 'hatch_counter', 'has_gender_differences', 'growth_rate_id', 'forms_switchable', 'is_legendary', 'is_mythical', 'order', 'conquest_order'], (
+            (
+                # Evolution chains of 3 species, each evolving from the previous one
+                i, f'species-{i}', 1 + i % 9, i - 1 if i % 3 != 1 else '', (i + 2) // 3,
+                1 + i % 10, 1 + i % 14, r.choice(['', 1, 2, 3, 4, 5, 6, 7, 8, 9]),
+                r.choice([-1, 0, 1, 2, 4, 8]), r.randint(3, 255), r.choice([0, 50, 70, 140]),
+                int(i % 50 == 0), r.randint(5, 120), r.randint(0, 1), r.randint(1, 6), 0,
+                int(i % 97 == 0), int(i % 101 == 0), i, r.choice(['', i]),
+            )
+            for i in range(1, self.species + 1)
+        ))
+        self.write('pokemon_species_names', ['pokemon_species_id', 'local_language_id', 'name', 'genus'], (
+            (i, language_id, f'Species {i}', r.choice(['', f'Genus {i % 400}']))
+            for i in range(1, self.species + 1)
+            for language_id in NAME_LANGUAGES
+        ))
+        self.write('pokemon_species_flavor_text', ['species_id', 'version_id', 'language_id', 'flavor_text'], (
+            # Later versions often repeat the flavor text of earlier ones
+            (i, version_id, language_id, text)
+            for i in range(1, self.species + 1)
+            for texts in [[self.flavor_text() for _ in range(3)]]
+            for version_id in range(1 + 2 * (i % 5), 2 * self.version_groups + 1, 4)
+            for language_id in self.flavor_text_languages(i)
+            for text in [r.choice(texts)]
+        ))
+        self.write('pokemon_dex_numbers', ['species_id', 'pokedex_id', 'pokedex_number'], (
+            (i, pokedex_id, i if pokedex_id == 1 else (i * 13) % self.species)
+            for i in range(1, self.species + 1)
+            for pokedex_id in (1, 2 + i % 20)
+        ))
+        self.write('pokemon_egg_groups', ['species_id', 'egg_group_id'], (
+            (i, egg_group_id)
+            for i in range(1, self.species + 1)
+            for egg_group_id in sorted(r.sample(range(1, 16), r.randint(1, 2)))
+        ))
+        self.write('pokemon', ['id', 'identifier', 'species_id', 'height', 'weight', 'base_experience', 'order', 'is_default'], (
+            (
+                id, f'species-{species_id}' if id == species_id else f'species-{species_id}-form-{id}', species_id,
+                r.randint(1, 200), r.randint(1, 9999), r.choice(['', r.randint(36, 400)]), order, int(id == species_id),
+            )
+            for order, (id, species_id) in enumerate(self.pokemon, 1)
+        ))
+        self.write('pokemon_types', ['pokemon_id', 'type_id', 'slot'], (
+            (id, type_id, slot)
+            for id, _ in self.pokemon
+            for slot, type_id in enumerate(r.sample(range(1, len(TYPES) + 1), r.randint(1, 2)), 1)
+        ))
+        self.write('pokemon_abilities', ['pokemon_id', 'ability_id', 'is_hidden', 'slot'], (
+            (id, ability_id, int(slot == 3), slot)
+            for id, _ in self.pokemon
+            for slot, ability_id in zip(r.sample([1, 2, 3], r.randint(1, 3)), r.sample(range(1, self.abilities + 1), 3))
+        ))
+        self.write('pokemon_stats', ['pokemon_id', 'stat_id', 'base_stat', 'effort'], (
+            (id, stat_id, r.randint(5, 255), r.choice([0, 0, 0, 1, 2, 3]))
+            for id, _ in self.pokemon
+            for stat_id in range(1, 7)
+        ))
+        self.write('pokemon_moves', ['pokemon_id', 'version_group_id', 'move_id', 'pokemon_move_method_id', 'level', 'order', 'mastery'], (
+            (id, version_group_id, move_id, method_id, r.randint(1, 100) if method_id == 1 else 0, r.choice(['', '', 1, 2]), '')
+            for id, _ in self.pokemon
+            for version_group_id in range(1 + id % 5, self.version_groups + 1, 2)
+            for move_id in sorted(r.sample(range(1, self.moves + 1), min(self.moves, 40)))
+            for method_id in [r.choice([1, 1, 2, 3, 4, 4])]
+        ))
+        self.write('pokemon_evolution', ['id', 'evolved_species_id', 'evolution_trigger_id', 'trigger_item_id', 'minimum_level', 'gender_id', 'location_id', 'held_item_id', 'time_of_day', 'known_move_id', 'known_move_type_id', 'minimum_happiness', 'minimum_beauty', 'minimum_affection', 'relative_physical_stats', 'party_species_id', 'party_type_id', 'trade_species_id', 'needs_overworld_rain', 'turn_upside_down'], (
+            (
+                id, species_id, r.randint(1, 3), r.choice(['', '', r.randint(1, self.items)]),
+                r.choice(['', 16, 32]), r.choice(['', '', 1, 2]), r.choice(['', '', r.randint(1, self.locations)]),
+                r.choice(['', '', r.randint(1, self.items)]), r.choice(['', '', 'day', 'night']),
+                r.choice(['', '', r.randint(1, self.moves)]), r.choice(['', '', r.randint(1, len(TYPES))]),
+                r.choice(['', '', 220]), r.choice(['', '', 170]), r.choice(['', '', 2]), r.choice(['', '', -1, 0, 1]),
+                r.choice(['', '', r.randint(1, self.species)]), r.choice(['', '', r.randint(1, len(TYPES))]),
+                r.choice(['', '', r.randint(1, self.species)]), int(species_id % 13 == 0), int(species_id % 17 == 0),
+            )
+            for id, species_id in enumerate((i for i in range(1, self.species + 1) if i % 3 != 1), 1)
+        ))
+
+
+def main():
+    args = u.parse_args(
+        description='Generates a synthetic copy of the PokeAPI CSV files (pokeapi/data/v2/csv) for benchmarking.',
+        args={
+            'directory': {
+                'help': 'Directory to write the CSV files to',
+            },
+            '--scale': {
+                'type': float,
+                'default': 1,
+                'help': 'Size of the data set relative to the real one (default: 1), scaling up adds version groups',
+            },
+            '--seed': {
+                'type': int,
+                'default': 0,
+                'help': 'Random seed (default: 0)',
+            },
+        }
+    )
+
+    os.makedirs(args.directory, exist_ok=True)
+    Generator(args.directory, args.scale, args.seed).generate()
+
+
+main()
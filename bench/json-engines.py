@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import u
+
+generate_pokedex_py = os.path.join(u.parent_dir, 'how-to-query', 'generate-pokedex.json.py')
+
+# The engines of generate-pokedex.json.py (see --engine) and the formats they're
+# compared in, the python engine is the baseline. The python engine builds the
+# whole dataset before writing it and the sql engine streams it a pokemon at a
+# time, which is most of the difference in their peak memory.
+ENGINES = ['python', 'sql']
+FORMATS = ['pretty', 'minified', 'ndjson']
+
+
+# Runs the script to completion with its output in a file, returning the wall
+# clock time and the peak memory usage (os.wait4 gives the resource usage of
+# just that child, it's not available on Windows)
+def run(args, env, output_file):
+    with open(output_file, 'wb') as output:
+        started_at = time.perf_counter()
+        process = subprocess.Popen(args, stdout=output, env=env)
+        if hasattr(os, 'wait4'):
+            _, status, rusage = os.wait4(process.pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+            # macOS reports bytes, everything else kilobytes
+            peak_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+        else:
+            returncode = process.wait()
+            peak_rss = None
+        seconds = time.perf_counter() - started_at
+
+    if returncode != 0:
+        u.error(f'{" ".join(args[1:])} failed with exit code {returncode}')
+        sys.exit(1)
+    return seconds, peak_rss
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def benchmark(engine, format, env, output_file, repeat):
+    args = [sys.executable, generate_pokedex_py, '--engine', engine, '--format', format]
+    runs = [run(args, env, output_file) for _ in range(repeat)]
+    return {
+        'seconds': min(seconds for seconds, _ in runs),
+        'peak_rss': runs[0][1],
+        'output_size': os.path.getsize(output_file),
+        'output_sha256': file_sha256(output_file),
+    }
+
+
+def main():
+    args = u.parse_args(
+        description='Compares the time taken by generate-pokedex.json.py to generate the pokedex with each of its engines (see --engine) in every format, and checks that they give the same output.',
+        args={
+            'database': {
+                'nargs': '?',
+                'default': os.path.join(u.parent_dir, 'pokeapi.sqlite'),
+                'help': 'The database to read (default: pokeapi.sqlite)',
+            },
+            '--repeat': {
+                'type': int,
+                'default': 5,
+                'metavar': 'N',
+                'help': 'Number of times to run each benchmark, the best time is kept (default: 5)',
+            },
+            '--workdir': {
+                'default': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'work'),
+                'metavar': 'DIR',
+                'help': 'Directory to write the outputs to (default: bench/work)',
+            },
+            '--output': {
+                'metavar': 'FILE',
+                'help': 'Write the results as JSON to this file',
+            },
+        }
+    )
+
+    if not os.path.exists(args.database):
+        u.error(f'{args.database} does not exist.')
+        sys.exit(1)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    env = dict(os.environ, POKEAPI_SQLITE=os.path.abspath(args.database))
+
+    results = {}
+    different = []
+    for format in FORMATS:
+        u.info(f'{format}:')
+        results[format] = {}
+        for engine in ENGINES:
+            output_file = os.path.join(args.workdir, f'pokedex-{engine}.{format}')
+            result = results[format][engine] = benchmark(engine, format, env, output_file, args.repeat)
+            text = f'{result["seconds"]:.2f}s'
+            if result['peak_rss'] is not None:
+                text += f', {result["peak_rss"] / 1024 / 1024:.1f} MB'
+            baseline = results[format][ENGINES[0]]
+            if engine != ENGINES[0]:
+                text += f' ({baseline["seconds"] / result["seconds"]:.2f}x)'
+                if result['output_sha256'] != baseline['output_sha256']:
+                    different.append(f'{engine} {format}')
+                    text += ', DIFFERENT OUTPUT'
+            u.info(f'   {engine:<8} {text}, {result["output_size"] / 1024:.0f} KB output')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4)
+        u.info(f'Results written to {args.output}')
+
+    if different:
+        u.error(f'The output of the engines differs: {", ".join(different)}')
+        sys.exit(1)
+
+
+main()
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+
+import http.server
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import urllib.request
+import u
+
+
+# Serves a single file over HTTP with support for (single) range requests and
+# counts the requests and bytes sent
+class RangeServer(http.server.ThreadingHTTPServer):
+    def __init__(self, file):
+        super().__init__(('127.0.0.1', 0), RangeRequestHandler)
+        self.file = file
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'http://{host}:{port}/{os.path.basename(self.file)}'
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    RANGE_RGX = re.compile(r'^bytes=(\d+)-(\d*)$')
+
+    def do_GET(self):
+        file_size = os.path.getsize(self.server.file)
+        start, end = 0, file_size - 1
+        match = self.RANGE_RGX.match(self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else end, file_size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        with open(self.server.file, 'rb') as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+        self.wfile.write(body)
+
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Reads the pages of a SQLite file with HTTP range requests, one request per
+# page (like sql.js-httpvfs with its request chunk size set to the page size),
+# caching the pages that have already been fetched
+class RemotePages:
+    def __init__(self, url):
+        self.url = url
+        self.cache = {}
+        self.fetched = []
+        # Enough of the header to get the page size, the way a reader would
+        header = self.fetch(0, 100)
+        (page_size,) = struct.unpack('>H', header[16:18])
+        self.page_size = 65536 if page_size == 1 else page_size
+        self.usable_size = self.page_size - header[20]
+
+    def fetch(self, start, length):
+        request = urllib.request.Request(self.url, headers={'Range': f'bytes={start}-{start + length - 1}'})
+        with urllib.request.urlopen(request) as response:
+            return response.read()
+
+    def get(self, page_number):
+        if page_number not in self.cache:
+            self.cache[page_number] = self.fetch((page_number - 1) * self.page_size, self.page_size)
+            self.fetched.append(page_number)
+        return self.cache[page_number]
+
+    def clear(self):
+        self.cache.clear()
+        self.fetched = []
+
+
+def read_varint(data, offset):
+    value = 0
+    for i in range(8):
+        byte = data[offset + i]
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, offset + i + 1
+    return (value << 8) | data[offset + 8], offset + 9
+
+
+def decode_record(payload):
+    header_size, offset = read_varint(payload, 0)
+    serial_types = []
+    while offset < header_size:
+        serial_type, offset = read_varint(payload, offset)
+        serial_types.append(serial_type)
+
+    values = []
+    offset = header_size
+    for serial_type in serial_types:
+        if serial_type == 0:
+            values.append(None)
+        elif serial_type in (8, 9):
+            values.append(serial_type - 8)
+        elif serial_type <= 6:
+            size = [1, 2, 3, 4, 6, 8][serial_type - 1]
+            values.append(int.from_bytes(payload[offset:offset + size], 'big', signed=True))
+            offset += size
+        elif serial_type == 7:
+            values.append(struct.unpack('>d', payload[offset:offset + 8])[0])
+            offset += 8
+        else:
+            size = (serial_type - 12) // 2
+            value = payload[offset:offset + size]
+            values.append(value.decode('utf8') if serial_type % 2 else bytes(value))
+            offset += size
+    return values
+
+
+# Sort key matching SQLite's ordering of values (with the BINARY collation)
+def sort_key(value):
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value.encode('utf8'))
+    return (3, value)
+
+
+# Commas that aren't in (unnested) parentheses
+TOP_LEVEL_COMMA = re.compile(r',(?![^(]*\))')
+
+
+# Just enough of the SQLite file format to look rows up by rowid or through an
+# index, see https://www.sqlite.org/fileformat2.html
+class RemoteDatabase:
+    def __init__(self, pages):
+        self.pages = pages
+        self.tables = {}
+        self.indexes = {}
+        for type, name, tbl_name, root_page, sql in self.scan_table(1):
+            if sql is None or type == 'view':
+                continue
+            # The column definitions of the tables (and the columns of the
+            # indexes) created by build.py only contain commas in parentheses,
+            # ie. the CHECK constraints of STRICT tables and the composite key
+            # of WITHOUT ROWID tables, which comes last
+            body = sql[sql.index('(') + 1:sql.rindex(')')]
+            definitions = [definition.strip() for definition in TOP_LEVEL_COMMA.split(body)]
+            key = None
+            if definitions[-1].startswith('PRIMARY KEY ('):
+                key = [column.strip('"') for column in definitions.pop()[len('PRIMARY KEY ('):-1].split(',')]
+            columns = [definition.split()[0].strip('"') for definition in definitions]
+            if type == 'table':
+                rowid_column = None if key else next((
+                    column for column, definition in zip(columns, definitions)
+                    if 'INTEGER' in definition and 'PRIMARY KEY' in definition
+                ), None)
+                self.tables[name] = (root_page, columns, rowid_column, key)
+            elif type == 'index':
+                self.indexes[name] = (tbl_name, root_page, columns)
+
+        # The tables encoded by build.py --dictionary are views, their rows are
+        # read from __encoded_<table> and the strings looked up by id instead
+        self.encoded = {}
+        if '__encoded_tables' in self.tables:
+            for table_name, _, columns in self.scan_table(self.tables['__encoded_tables'][0]):
+                self.encoded[table_name] = columns.split(',')
+
+    def read_page(self, page_number):
+        page = self.pages.get(page_number)
+        offset = 100 if page_number == 1 else 0
+        page_type = page[offset]
+        (cell_count,) = struct.unpack('>H', page[offset + 3:offset + 5])
+        is_interior = page_type in (2, 5)
+        right_pointer = struct.unpack('>I', page[offset + 8:offset + 12])[0] if is_interior else None
+        header_size = 12 if is_interior else 8
+        cells = [
+            struct.unpack('>H', page[offset + header_size + i * 2:offset + header_size + i * 2 + 2])[0]
+            for i in range(cell_count)
+        ]
+        return page, page_type, cells, right_pointer
+
+    def read_payload(self, page, offset, payload_size, is_table):
+        usable_size = self.pages.usable_size
+        max_local = usable_size - 35 if is_table else (usable_size - 12) * 64 // 255 - 23
+        if payload_size <= max_local:
+            return page[offset:offset + payload_size]
+
+        min_local = (usable_size - 12) * 32 // 255 - 23
+        local_size = min_local + (payload_size - min_local) % (usable_size - 4)
+        if local_size > max_local:
+            local_size = min_local
+        payload = bytearray(page[offset:offset + local_size])
+        (overflow_page,) = struct.unpack('>I', page[offset + local_size:offset + local_size + 4])
+        while overflow_page and len(payload) < payload_size:
+            data = self.pages.get(overflow_page)
+            payload += data[4:4 + min(usable_size - 4, payload_size - len(payload))]
+            (overflow_page,) = struct.unpack('>I', data[:4])
+        return bytes(payload)
+
+    # Yields the values of every row of a table b-tree
+    def scan_table(self, page_number):
+        page, page_type, cells, right_pointer = self.read_page(page_number)
+        if page_type == 13:
+            for offset in cells:
+                payload_size, offset = read_varint(page, offset)
+                _, offset = read_varint(page, offset)
+                yield decode_record(self.read_payload(page, offset, payload_size, True))
+            return
+        for offset in cells:
+            yield from self.scan_table(struct.unpack('>I', page[offset:offset + 4])[0])
+        yield from self.scan_table(right_pointer)
+
+    # Returns the values of the row with the given rowid, or None
+    def seek_rowid(self, page_number, rowid):
+        while True:
+            page, page_type, cells, right_pointer = self.read_page(page_number)
+            if page_type == 13:
+                for offset in cells:
+                    payload_size, offset = read_varint(page, offset)
+                    cell_rowid, offset = read_varint(page, offset)
+                    if cell_rowid == rowid:
+                        return decode_record(self.read_payload(page, offset, payload_size, True))
+                return None
+            page_number = right_pointer
+            for offset in cells:
+                key, _ = read_varint(page, offset + 4)
+                if rowid <= key:
+                    page_number = struct.unpack('>I', page[offset:offset + 4])[0]
+                    break
+
+    # Yields the entries of an index b-tree that start with the given key
+    def seek_index(self, page_number, key):
+        return self._seek_index(page_number, [sort_key(value) for value in key])
+
+    def _seek_index(self, page_number, key):
+        page, page_type, cells, right_pointer = self.read_page(page_number)
+        for offset in cells:
+            left_child = None
+            if page_type == 2:
+                left_child = struct.unpack('>I', page[offset:offset + 4])[0]
+                offset += 4
+            payload_size, offset = read_varint(page, offset)
+            entry = decode_record(self.read_payload(page, offset, payload_size, False))
+            prefix = [sort_key(value) for value in entry[:len(key)]]
+            if prefix < key:
+                continue
+            if left_child is not None:
+                yield from self._seek_index(left_child, key)
+            if prefix > key:
+                return
+            yield entry
+        if right_pointer is not None:
+            yield from self._seek_index(right_pointer, key)
+
+    # Returns the given columns of the rows where column = value, using the
+    # rowid, the key of a WITHOUT ROWID table or an index (a covering one if
+    # there is one)
+    def select(self, table_name, columns, column, value):
+        if table_name in self.encoded:
+            rows = self.select(f'__encoded_{table_name}', columns, column, value)
+            positions = [i for i, name in enumerate(columns) if name in self.encoded[table_name]]
+            return [self.decode_row(row, positions) for row in rows]
+
+        root_page, table_columns, rowid_column, key = self.tables[table_name]
+        # The records of WITHOUT ROWID tables start with the key columns
+        if key:
+            table_columns = key + [name for name in table_columns if name not in key]
+
+        def from_row(rowid, values):
+            row = dict(zip(table_columns, values))
+            if rowid_column is not None:
+                row[rowid_column] = rowid
+            return tuple(row[name] for name in columns)
+
+        if column == rowid_column:
+            values = self.seek_rowid(root_page, value)
+            return [] if values is None else [from_row(value, values)]
+        if key and column == key[0]:
+            return [from_row(None, values) for values in self.seek_index(root_page, [value])]
+
+        indexes = sorted((
+            (not set(columns) <= set(index_columns), len(index_columns), index_root_page, index_columns)
+            for tbl_name, index_root_page, index_columns in self.indexes.values()
+            if tbl_name == table_name and index_columns[0] == column
+        ))
+        if not indexes:
+            raise ValueError(f'No index on {table_name}.{column}')
+        not_covering, _, index_root_page, index_columns = indexes[0]
+
+        rows = []
+        for entry in self.seek_index(index_root_page, [value]):
+            if not_covering and key:
+                # The entries end with the key columns that aren't in the index
+                entry = dict(zip(index_columns + [name for name in key if name not in index_columns], entry))
+                rows.append(from_row(None, next(self.seek_index(root_page, [entry[name] for name in key]))))
+            elif not_covering:
+                rowid = entry[-1]
+                rows.append(from_row(rowid, self.seek_rowid(root_page, rowid)))
+            else:
+                rows.append(tuple(entry[index_columns.index(name)] for name in columns))
+        return rows
+
+    # Replaces the string ids at the given positions of the row by the strings
+    def decode_row(self, row, positions):
+        row = list(row)
+        for position in positions:
+            if row[position] is not None:
+                # The id is the rowid of __strings, the record only holds the value
+                row[position] = self.seek_rowid(self.tables['__strings'][0], row[position])[1]
+        return tuple(row)
+
+
+# The queries needed to show a single pokedex entry
+def pokedex_lookup(db, pokemon_id):
+    (pokemon,) = db.select('pokemon', ['id', 'species_id', 'height', 'weight'], 'id', pokemon_id)
+    species_id = pokemon[1]
+    return {
+        'pokemon': [pokemon],
+        'pokemon_species': db.select('pokemon_species', ['id', 'generation_id', 'evolves_from_species_id', 'evolution_chain_id'], 'id', species_id),
+        'pokemon_species_names': db.select('pokemon_species_names', ['local_language_id', 'name', 'genus'], 'pokemon_species_id', species_id),
+        'pokemon_types': db.select('pokemon_types', ['slot', 'type_id'], 'pokemon_id', pokemon_id),
+        'pokemon_abilities': db.select('pokemon_abilities', ['slot', 'ability_id', 'is_hidden'], 'pokemon_id', pokemon_id),
+        'pokemon_stats': db.select('pokemon_stats', ['stat_id', 'base_stat', 'effort'], 'pokemon_id', pokemon_id),
+        'pokemon_egg_groups': db.select('pokemon_egg_groups', ['egg_group_id'], 'species_id', species_id),
+        'pokemon_species_flavor_text': db.select('pokemon_species_flavor_text', ['version_id', 'language_id', 'flavor_text'], 'species_id', species_id),
+    }
+
+
+# Checks the lookup against the same queries run by SQLite itself
+def check_lookup(local_db, pokemon_id, result):
+    keys = {
+        'pokemon': ('id', pokemon_id),
+        'pokemon_species': ('id', result['pokemon'][0][1]),
+        'pokemon_species_names': ('pokemon_species_id', result['pokemon'][0][1]),
+        'pokemon_types': ('pokemon_id', pokemon_id),
+        'pokemon_abilities': ('pokemon_id', pokemon_id),
+        'pokemon_stats': ('pokemon_id', pokemon_id),
+        'pokemon_egg_groups': ('species_id', result['pokemon'][0][1]),
+        'pokemon_species_flavor_text': ('species_id', result['pokemon'][0][1]),
+    }
+    columns = {
+        'pokemon': 'id, species_id, height, weight',
+        'pokemon_species': 'id, generation_id, evolves_from_species_id, evolution_chain_id',
+        'pokemon_species_names': 'local_language_id, name, genus',
+        'pokemon_types': 'slot, type_id',
+        'pokemon_abilities': 'slot, ability_id, is_hidden',
+        'pokemon_stats': 'stat_id, base_stat, effort',
+        'pokemon_egg_groups': 'egg_group_id',
+        'pokemon_species_flavor_text': 'version_id, language_id, flavor_text',
+    }
+    for table_name, (column, value) in keys.items():
+        expected = local_db.execute(f'SELECT {columns[table_name]} FROM "{table_name}" WHERE "{column}" = ?', (value,)).fetchall()
+        if sorted(expected, key=repr) != sorted(result[table_name], key=repr):
+            u.error(f'Lookup of pokemon {pokemon_id} returned the wrong rows for {table_name}')
+            sys.exit(1)
+
+
+def main():
+    args = u.parse_args(
+        description='Serves a pokeapi.sqlite file over HTTP with range requests and counts the bytes fetched by a pokedex lookup, the way a remote reader (eg. sql.js-httpvfs) would do it.',
+        args={
+            'database': {
+                'nargs': '?',
+                'default': os.path.join(u.parent_dir, 'pokeapi.sqlite'),
+                'help': 'The database to serve (default: pokeapi.sqlite)',
+            },
+            '--pokemon': {
+                'type': int,
+                'nargs': '+',
+                'metavar': 'ID',
+                'help': 'The pokemon to look up (default: 5 spread across the pokedex)',
+            },
+            '--output': {
+                'metavar': 'FILE',
+                'help': 'Write the results as JSON to this file',
+            },
+        }
+    )
+
+    if not os.path.exists(args.database):
+        u.error(f'{args.database} does not exist.')
+        sys.exit(1)
+
+    local_db = sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)
+    pokemon_ids = args.pokemon
+    if not pokemon_ids:
+        ids = [row[0] for row in local_db.execute('SELECT id FROM pokemon WHERE id < 10000 ORDER BY id')]
+        pokemon_ids = [ids[i * (len(ids) - 1) // 4] for i in range(5)]
+
+    # The page manifest (see build.py --range-requests) is used to attribute
+    # the fetched pages to tables and indexes
+    manifest = None
+    manifest_file = f'{args.database}.pages.json'
+    if os.path.exists(manifest_file):
+        with open(manifest_file, encoding='utf8') as f:
+            manifest = json.load(f)
+    page_owners = {}
+    for name, obj in (manifest or {}).get('objects', {}).items():
+        for first, last in obj['ranges']:
+            for page in range(first, last + 1):
+                page_owners[page] = name
+
+    server = RangeServer(args.database)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    pages = RemotePages(server.url)
+    db = RemoteDatabase(pages)
+    schema = {'requests': server.requests, 'bytes': server.bytes_sent, 'pages': len(pages.fetched)}
+    u.info(f'Serving {args.database} ({os.path.getsize(args.database)} bytes, {pages.page_size} byte pages)')
+    u.info(f'   Schema: {schema["requests"]} requests, {schema["bytes"]} bytes')
+    if manifest is None:
+        u.warn(f'No page manifest ({manifest_file}), fetched pages will not be attributed to tables.')
+
+    # Each lookup starts with an empty page cache but a loaded schema, as if
+    # each was the first query of a page load that had already opened the file
+    lookups = []
+    for pokemon_id in pokemon_ids:
+        pages.clear()
+        requests, bytes_sent = server.requests, server.bytes_sent
+        result = pokedex_lookup(db, pokemon_id)
+        check_lookup(local_db, pokemon_id, result)
+
+        objects = {}
+        for page in pages.fetched:
+            name = page_owners.get(page, '?')
+            objects[name] = objects.get(name, 0) + 1
+        lookups.append({
+            'pokemon_id': pokemon_id,
+            'requests': server.requests - requests,
+            'bytes': server.bytes_sent - bytes_sent,
+            'pages': objects,
+        })
+        u.info(f'   Pokemon {pokemon_id}: {server.requests - requests} requests, {server.bytes_sent - bytes_sent} bytes')
+
+    server.shutdown()
+
+    average = sum(lookup['bytes'] for lookup in lookups) / len(lookups)
+    u.info(f'   Average: {average:.0f} bytes per lookup')
+    if manifest is not None:
+        u.info('Pages fetched per table/index (all lookups):')
+        totals = {}
+        for lookup in lookups:
+            for name, count in lookup['pages'].items():
+                totals[name] = totals.get(name, 0) + count
+        for name, count in sorted(totals.items(), key=lambda item: -item[1]):
+            u.info(f'   {name}: {count}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump({
+                'database': args.database,
+                'file_size': os.path.getsize(args.database),
+                'page_size': pages.page_size,
+                'schema': schema,
+                'lookups': lookups,
+                'average_bytes': average,
+            }, f, indent=4)
+
+
+main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+import sys
+import time
+import u
+
+
+# The Row of utils/db.py before it cached a record class per set of columns,
+# kept as the baseline
+class DictRow:
+    @staticmethod
+    def row_factory(cursor, row):
+        return DictRow(cursor, row)
+
+    def __init__(self, cursor, row):
+        self._fields = { column[0]: i for i, column in enumerate(cursor.description) }
+        self._values = row
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __getattr__(self, key):
+        if key in self._fields:
+            return self._values[self._fields[key]]
+        raise AttributeError(f'Row has no attribute {key}')
+
+    def __iter__(self):
+        for field, index in self._fields.items():
+            yield field, self._values[index]
+
+
+# The row factories to compare, as (name, row_factory, get) where get reads a
+# column by name the way the how-to-query scripts would
+ROW_FACTORIES = [
+    ('tuple', None, None),
+    ('sqlite3.Row', sqlite3.Row, lambda row, name: row[name]),
+    ('DictRow', DictRow.row_factory, getattr),
+    ('Row', u.Row.row_factory, getattr),
+]
+
+# The queries, the columns of all rows are read by name. These are the biggest
+# tables the export scripts read.
+QUERIES = [
+    ('pokemon_moves', 'SELECT pokemon_id, version_group_id, move_id, pokemon_move_method_id, level, "order" FROM pokemon_moves'),
+    ('pokemon_species_flavor_text', 'SELECT species_id, version_id, language_id, flavor_text FROM pokemon_species_flavor_text'),
+]
+
+
+# Returns the best time of the given number of runs of fn
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started_at)
+    return min(times)
+
+
+def benchmark(db, sql, row_factory, get, repeat):
+    db.row_factory = row_factory
+    names = [column[0] for column in db.execute(sql).description]
+    rows = db.execute(sql).fetchall()
+
+    def read():
+        for row in rows:
+            for name in names:
+                get(row, name)
+
+    result = {
+        'rows': len(rows),
+        'fetch_seconds': best_of(repeat, lambda: db.execute(sql).fetchall()),
+    }
+    if get is not None:
+        result['read_seconds'] = best_of(repeat, read)
+        result['dict_seconds'] = best_of(repeat, lambda: [dict(row) for row in rows])
+        # The same as utils/json.py does for Row, for all of them
+        result['json_seconds'] = best_of(repeat, lambda: json.dumps(rows, default=dict, indent=4, ensure_ascii=False))
+    return result
+
+
+def main():
+    args = u.parse_args(
+        description='Compares the time taken to fetch rows and read their columns by name with utils.Row, the Row it replaced (DictRow), sqlite3.Row and plain tuples.',
+        args={
+            'database': {
+                'nargs': '?',
+                'default': os.path.join(u.parent_dir, 'pokeapi.sqlite'),
+                'help': 'The database to read (default: pokeapi.sqlite)',
+            },
+            '--repeat': {
+                'type': int,
+                'default': 5,
+                'metavar': 'N',
+                'help': 'Number of times to run each benchmark, the best time is kept (default: 5)',
+            },
+            '--output': {
+                'metavar': 'FILE',
+                'help': 'Write the results as JSON to this file',
+            },
+        }
+    )
+
+    if not os.path.exists(args.database):
+        u.error(f'{args.database} does not exist.')
+        sys.exit(1)
+
+    db = sqlite3.connect(f'file:{args.database}?mode=ro', uri=True)
+
+    results = {}
+    for query_name, sql in QUERIES:
+        u.info(f'{query_name}:')
+        results[query_name] = {}
+        for name, row_factory, get in ROW_FACTORIES:
+            result = results[query_name][name] = benchmark(db, sql, row_factory, get, args.repeat)
+            timings = ', '.join(
+                f'{timing[:-len("_seconds")]} {result[timing]:.3f}s'
+                for timing in ('fetch_seconds', 'read_seconds', 'dict_seconds', 'json_seconds')
+                if timing in result
+            )
+            u.info(f'   {name:<12} {result["rows"]} rows: {timings}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4)
+        u.info(f'Results written to {args.output}')
+
+
+main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import datetime
+import glob
+import json
+import os
+import platform
+import shlex
+import sqlite3
+import subprocess
+import sys
+import time
+import u
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+build_py = os.path.join(u.parent_dir, 'build.py')
+generate_csv_py = os.path.join(bench_dir, 'generate-csv.py')
+exporters = sorted(glob.glob(os.path.join(u.parent_dir, 'how-to-query', 'generate-*.json.py')))
+export_py = os.path.join(u.parent_dir, 'how-to-query', 'export.py')
+
+# The output formats export.py is run with (see OUTPUT_ARGS in how-to-query/u.py)
+EXPORT_FORMATS = [
+    [],
+    ['--format', 'minified'],
+    ['--format', 'ndjson'],
+    ['--gzip'],
+    ['--format', 'minified', '--gzip'],
+    ['--format', 'ndjson', '--gzip'],
+]
+
+
+# Runs a command to completion, returning its wall clock time, cpu time and
+# peak memory usage (os.wait4 gives the resource usage of just that child)
+def run(args, cwd, stdout, stderr, env=None):
+    started_at = time.perf_counter()
+    process = subprocess.Popen(args, cwd=cwd, stdout=stdout, stderr=stderr, env=env)
+    if hasattr(os, 'wait4'):
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # macOS reports bytes, everything else kilobytes
+        peak_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+        user_seconds, system_seconds = rusage.ru_utime, rusage.ru_stime
+    else:
+        # Not available on Windows
+        process.wait()
+        peak_rss = user_seconds = system_seconds = None
+    seconds = time.perf_counter() - started_at
+
+    return {
+        'returncode': process.returncode,
+        'seconds': seconds,
+        'user_seconds': user_seconds,
+        'system_seconds': system_seconds,
+        'peak_rss': peak_rss,
+    }
+
+
+def check(result, name, log_file):
+    if result['returncode'] == 0:
+        return
+    u.error(f'{name} failed with exit code {result["returncode"]}, see {log_file}')
+    sys.exit(1)
+
+
+def format_run(result):
+    text = f'{result["seconds"]:.2f}s'
+    if result['peak_rss'] is not None:
+        text += f', {result["peak_rss"] / 1024 / 1024:.1f} MB'
+    return text
+
+
+def is_git_repo(directory):
+    return subprocess.call(
+        ['git', 'rev-parse', '--is-inside-work-tree'],
+        cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    ) == 0
+
+
+def git_init(directory):
+    for args in [
+        ['git', 'init', '--quiet'],
+        ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost', 'commit', '--quiet', '--allow-empty', '-m', 'Synthetic data'],
+    ]:
+        subprocess.check_call(args, cwd=directory)
+
+
+# Sets up a directory for build.py to run in, with a fake PokeAPI repo holding
+# the synthetic CSV files. The CSV files are only generated once per scale as
+# generating the larger scales takes a while.
+def prepare_scale(workdir, scale, seed):
+    scale_dir = os.path.join(workdir, f'scale-{scale:g}')
+    pokeapi_dir = os.path.join(scale_dir, 'pokeapi')
+    csv_dir = os.path.join(pokeapi_dir, 'data', 'v2', 'csv')
+
+    if not os.path.exists(os.path.join(pokeapi_dir, '.git')):
+        u.info(f'Generating synthetic CSV files (scale {scale:g})...')
+        subprocess.check_call([sys.executable, generate_csv_py, csv_dir, '--scale', str(scale), '--seed', str(seed)])
+        # build.py records the commit of the PokeAPI repo, the contents don't matter
+        git_init(pokeapi_dir)
+
+    # and the commit of the pokeapi.sqlite repo, which is this one unless the
+    # workdir has been moved elsewhere
+    if not is_git_repo(scale_dir):
+        git_init(scale_dir)
+
+    files = glob.glob(os.path.join(csv_dir, '*.csv'))
+    return scale_dir, len(files), sum(os.path.getsize(file) for file in files)
+
+
+def benchmark_scale(workdir, scale, args):
+    scale_dir, csv_files, csv_size = prepare_scale(workdir, scale, args.seed)
+    pokeapi_sqlite = os.path.join(scale_dir, 'pokeapi.sqlite')
+    build_log = os.path.join(scale_dir, 'build.log')
+    build_report = os.path.join(scale_dir, 'build-report.json')
+    build_args = shlex.split(args.build_args)
+
+    result = {
+        'scale': scale,
+        'csv_files': csv_files,
+        'csv_size': csv_size,
+        'build': [],
+        'exports': {},
+    }
+
+    u.info(f'Scale {scale:g} ({csv_files} files, {csv_size / 1024 / 1024:.1f} MB of CSV):')
+
+    for i in range(args.repeat):
+        if os.path.exists(pokeapi_sqlite):
+            os.remove(pokeapi_sqlite)
+
+        with open(build_log, 'w', encoding='utf8') as log:
+            build = run(
+                [sys.executable, build_py, '--no-clone', '--report', build_report, *build_args],
+                cwd=scale_dir, stdout=log, stderr=subprocess.STDOUT,
+            )
+        check(build, 'build.py', build_log)
+
+        with open(build_report, encoding='utf8') as f:
+            report = json.load(f)
+        build['stages'] = report['stages']
+        build['file_size'] = os.path.getsize(pokeapi_sqlite)
+        result['build'].append(build)
+        u.info(f'   build.py: {format_run(build)}, {build["file_size"] / 1024 / 1024:.1f} MB file')
+
+    env = dict(os.environ, POKEAPI_SQLITE=pokeapi_sqlite, PYTHONHASHSEED='0')
+    for exporter in exporters:
+        name = os.path.basename(exporter)
+        output_file = os.path.join(scale_dir, name[len('generate-'):-len('.py')])
+        export_log = os.path.join(scale_dir, name[:-len('.py')] + '.log')
+        runs = result['exports'][name] = []
+
+        for i in range(args.repeat):
+            with open(output_file, 'w', encoding='utf8') as output, open(export_log, 'w', encoding='utf8') as log:
+                export = run([sys.executable, exporter], cwd=scale_dir, stdout=output, stderr=log, env=env)
+            check(export, name, export_log)
+
+            export['output_size'] = os.path.getsize(output_file)
+            runs.append(export)
+            u.info(f'   {name}: {format_run(export)}')
+
+    # All the datasets with a single run of export.py, in every format
+    for format_args in EXPORT_FORMATS:
+        name = ' '.join(['export.py', *format_args])
+        export_dir = os.path.join(scale_dir, 'export', '-'.join(arg.lstrip('-') for arg in format_args) or 'pretty')
+        export_log = os.path.join(scale_dir, 'export.log')
+        runs = result['exports'][name] = []
+
+        for i in range(args.repeat):
+            with open(export_log, 'w', encoding='utf8') as log:
+                export = run([sys.executable, export_py, '--output-dir', export_dir, *format_args], cwd=scale_dir, stdout=log, stderr=subprocess.STDOUT, env=env)
+            check(export, name, export_log)
+
+            export['output_sizes'] = {file: os.path.getsize(os.path.join(export_dir, file)) for file in sorted(os.listdir(export_dir))}
+            export['output_size'] = sum(export['output_sizes'].values())
+            runs.append(export)
+            u.info(f'   {name}: {format_run(export)}, {export["output_size"] / 1024:.0f} KB output')
+
+    u.info()
+    return result
+
+
+def main():
+    args = u.parse_args(
+        description='Benchmarks build.py and the how-to-query exports (the generate-*.json.py scripts and export.py) against synthetic PokeAPI data (see generate-csv.py), no network access needed.',
+        args={
+            '--scale': {
+                'type': float,
+                'nargs': '+',
+                'default': [1],
+                'help': 'Size(s) of the synthetic data set relative to the real one, eg. "--scale 1 10 100" (default: 1)',
+            },
+            '--repeat': {
+                'type': int,
+                'default': 1,
+                'metavar': 'N',
+                'help': 'Number of times to run each benchmark (default: 1)',
+            },
+            '--build-args': {
+                'default': '',
+                'metavar': 'ARGS',
+                'help': 'Extra arguments for build.py, eg. --build-args="--fast --stream"',
+            },
+            '--seed': {
+                'type': int,
+                'default': 0,
+                'help': 'Random seed for the synthetic data (default: 0)',
+            },
+            '--workdir': {
+                'default': os.path.join(bench_dir, 'work'),
+                'metavar': 'DIR',
+                'help': 'Directory for the synthetic data, databases and outputs, kept between runs (default: bench/work)',
+            },
+            '--output': {
+                'default': 'benchmark-results.json',
+                'metavar': 'FILE',
+                'help': 'File to write the results to as JSON (default: benchmark-results.json)',
+            },
+        }
+    )
+
+    os.makedirs(args.workdir, exist_ok=True)
+
+    results = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'pokeapi_sqlite_git_sha': subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=u.parent_dir).decode('utf8').strip(),
+        'build_args': args.build_args,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'python_version': platform.python_version(),
+        'sqlite_version': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scales': [benchmark_scale(args.workdir, scale, args) for scale in args.scale],
+    }
+
+    with open(args.output, 'w', encoding='utf8') as f:
+        json.dump(results, f, indent=4)
+    u.info(f'Results written to {args.output}')
+
+
+main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import the utils module from the parent directory
+sys.path.append(parent_dir)
+from utils import *
@@ -1,21 +1,63 @@
 #!/usr/bin/env python3
 
-import collections
+import concurrent.futures
 import csv
 import datetime
+import functools
 import glob
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import pathlib
 import re
+import shutil
 import sqlite3
 import subprocess
 import sys
+import time
 import utils as u
 
 
+POKEAPI_REPO = 'https://github.com/PokeAPI/pokeapi.git'
+# The only part of the PokeAPI repo that's used
+CSV_DIR = 'data/v2/csv'
+
+# Number of rows inserted per executemany call
+BATCH_SIZE = 10_000
+
+# Settings used by --fast, these trade away crash safety during the build (a
+# failed build has to be redone from scratch anyway, which is why --fast can't
+# update an existing file with --incremental) for import speed
+FAST_PRAGMAS = {
+    'journal_mode': 'OFF',
+    'synchronous': 'OFF',
+    'locking_mode': 'EXCLUSIVE',
+    'temp_store': 'MEMORY',
+    'cache_size': -256 * 1024, # 256 MB
+}
+# The exports mostly do full scans and range scans over the larger tables, which
+# do slightly better with bigger pages (fewer interior b-tree pages and less
+# per-page overhead for the long prose rows)
+FAST_PAGE_SIZE = 8192
+# The page size used by --range-requests, remote readers fetch whole pages so
+# smaller pages waste fewer bytes per lookup at the cost of deeper b-trees (ie.
+# more requests). A pokedex lookup fetches ~21 KB in ~20 requests with 1 KB
+# pages vs ~63 KB in ~15 requests with 4 KB pages (see bench/range-requests.py)
+RANGE_PAGE_SIZE = 1024
+
+# The stages of importing a table, in the order they are shown in the summary
+STAGES = ['parse', 'infer', 'scrub', 'create', 'insert', 'index', 'commit']
+
+# Number of tables shown in the summary, the full list is in the build report
+SUMMARY_TABLES = 10
+
+
 # src: pokeapi/data/v2/build.py
-GROUP_RGX = r"\[(.*?)\]\{(.*?)\}"
-SUB_RGX = r"\[.*?\]\{.*?\}"
-def scrub_string(string):
+GROUP_RGX = re.compile(r"\[(.*?)\]\{(.*?)\}")
+def scrub_string(string, links=None):
     """
     The purpose of this function is to scrub the weird template mark-up out of strings
     that Veekun is using for their pokedex.
@@ -25,65 +67,394 @@ def scrub_string(string):
         dragon tail will effect the opponents HP.
 
     If you find this results in weird strings please take a stab at improving or re-writing.
+
+    All the mark-up is replaced in a single pass, if a links list is given the
+    (kind, target) of every replaced reference is appended to it.
     """
-    groups = re.findall(GROUP_RGX, string)
-    for group in groups:
-        if group[0]:
-            sub = group[0]
+    # Most strings (identifiers, names) have no mark-up at all
+    if '[' not in string:
+        return string
+
+    def replace(match):
+        label, reference = match.groups()
+        reference = reference.split(":")
+        if len(reference) >= 2:
+            kind, target = reference[0], reference[1]
         else:
-            sub = group[1].split(":")
-            if len(sub) >= 2:
-                sub = sub[1]
-            else:
-                sub = sub[0]
-            sub = sub.replace("-", " ")
-        string = re.sub(SUB_RGX, sub, string, 1)
-    return string
-
-
-INT_PATTTERN = re.compile(r'^-?\d+$') # Matches: 123, -123, 0
-REAL_PATTERN = re.compile(r'^(?:-?\d+\.\d*|\.\d+)$') # Matches: 123.456, -123.456, 0.456, .456, 123.
-def get_value_type(value):
-    if not value:
-        return 'NULL'
-    if INT_PATTTERN.match(value):
-        return 'INTEGER'
-    if REAL_PATTERN.match(value):
-        return 'REAL'
-    if value != '':
-        return 'TEXT'
-    return 'NULL'
-
-
-def get_column_type(type_counts):
-    # if there is even a single TEXT value, the column is TEXT
-    if type_counts['TEXT'] > 0:
-        return 'TEXT'
-    if type_counts['REAL'] > 0:
-        return 'REAL'
-    if type_counts['INTEGER'] > 0:
-        return 'INTEGER'
-    # if there's no values at all, default to BLOB (ie. no coercion)
-    return 'BLOB'
-
-
-def get_column_is_nullable(type_counts):
-    # if there is even a single NULL value, the column is NULLABLE
-    return type_counts['NULL'] > 0
-
-
-def safe_index(array, index, default = None):
-    try:
-        return array[index]
-    except IndexError:
-        return default
+            kind, target = None, reference[0]
+
+        if links is not None:
+            links.append((kind, target))
+
+        if label:
+            return label
+        return target.replace("-", " ")
+
+    return GROUP_RGX.sub(replace, string)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+# Fixes up and scrubs the rows, the links removed by the scrubbing are appended
+# to the links list as (rowid, column_name, kind, target) tuples. For STRICT
+# tables the empty values are turned into NULLs, which they can't be coerced
+# from (see --strict).
+def prepare_rows(table_name, schema, rows, links, strict=False):
+    headers = schema.names
+    column_count = len(headers)
+    text_columns = schema.text_columns
+    rowid_column = schema.rowid_column
+    empty_columns = schema.nullable_columns if strict else []
+    for rowid, row in enumerate(rows, 1):
+        # Ensure all rows have the same number of columns
+        if len(row) != column_count:
+            u.warn(f'{table_name}: Row has wrong number of columns (expected {column_count}): {row}')
+            row = (row + [None] * column_count)[:column_count]
+
+        for col_idx in empty_columns:
+            if not row[col_idx]:
+                row[col_idx] = None
+
+        # The rowid is either the INTEGER PRIMARY KEY or, as the tables are
+        # always freshly created, the position of the row
+        if rowid_column is not None:
+            rowid = int(row[rowid_column])
+
+        # Scrub string data
+        for col_idx in text_columns:
+            if row[col_idx]:
+                column_links = []
+                row[col_idx] = scrub_string(row[col_idx], column_links)
+                links.extend((rowid, headers[col_idx], kind, target) for kind, target in column_links)
+
+        yield row
+
+
+# Local repos are cloned by copying (and don't filter the objects they send)
+# unless they're given as a file:// URL
+def repo_url(repo):
+    if os.path.isdir(repo):
+        return pathlib.Path(repo).resolve().as_uri()
+    return repo
+
+
+# Only the CSV files are read from the PokeAPI repo, so it's cloned without any
+# history or file contents (--depth=1 --filter=blob:none) and then only the CSV
+# directory is checked out, which fetches just the blobs it needs
+def sparse_clone(repo, directory):
+    subprocess.check_call(['git', 'clone', '--depth=1', '--filter=blob:none', '--sparse', '--no-checkout', repo_url(repo), directory])
+    subprocess.check_call(['git', 'sparse-checkout', 'set', '--no-cone', f'/{CSV_DIR}/'], cwd=directory)
+    subprocess.check_call(['git', 'checkout', '--quiet'], cwd=directory)
+
+
+# Clones the PokeAPI repo, optionally through a persistent mirror (a sparse
+# clone itself) that's kept between builds so only new commits are fetched
+def clone_pokeapi(repo, mirror=None):
+    if mirror:
+        if os.path.exists(mirror):
+            u.info(f'Updating PokeAPI mirror ({mirror})...')
+            subprocess.check_call(['git', 'fetch', '--depth=1', 'origin', 'HEAD'], cwd=mirror)
+            subprocess.check_call(['git', 'reset', '--hard', '--quiet', 'FETCH_HEAD'], cwd=mirror)
+        else:
+            u.info(f'Creating PokeAPI mirror ({mirror})...')
+            sparse_clone(repo, mirror)
+            # As the mirror is a partial clone, the clones of it have to be too
+            # (it can't fetch the missing blobs on their behalf)
+            subprocess.check_call(['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=mirror)
+        repo = mirror
+
+    u.info('Cloning PokeAPI repo...')
+    sparse_clone(repo, 'pokeapi')
+
+
+# Resolves a revision of the PokeAPI repo to a commit sha, fetching it first if
+# it's not in the clone (which only has the latest commit). It's fetched from
+# the PokeAPI repo itself, as the origin of the clone may be the mirror which
+# only has the latest commit too.
+def resolve_rev(rev, repo):
+    # rev-list (unlike rev-parse) doesn't fetch a missing commit from the origin
+    sha = subprocess.run(
+        ['git', 'rev-list', '--no-walk', '--missing=print', rev, '--'],
+        cwd='pokeapi', stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    ).stdout.decode('utf8').strip()
+    if not sha:
+        u.info(f'Fetching {rev}...')
+        subprocess.check_call(['git', 'fetch', '--depth=1', '--filter=blob:none', '--no-tags', repo_url(repo), rev], cwd='pokeapi')
+        sha = subprocess.check_output(['git', 'rev-parse', '--verify', 'FETCH_HEAD^{commit}'], cwd='pokeapi').decode('utf8').strip()
+    fetch_csv_blobs(sha, repo)
+    return sha
+
+
+# The CSV files of a commit that isn't checked out are missing from the clone,
+# they're fetched in a single batch up front rather than one by one as they're
+# read (which would also go through the origin, that may not have them)
+def fetch_csv_blobs(sha, repo):
+    output = subprocess.check_output(['git', 'rev-list', '--objects', '--missing=print', f'{sha}:{CSV_DIR}'], cwd='pokeapi')
+    missing = [line[1:] for line in output.decode('utf8').splitlines() if line.startswith('?')]
+    if not missing:
+        return
+    u.info(f'Fetching {len(missing)} CSV files of {sha[:12]}...')
+    subprocess.run(
+        ['git', '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', '--no-tags', '--no-write-fetch-head', '--filter=blob:none', '--stdin', repo_url(repo)],
+        cwd='pokeapi', input='\n'.join(missing).encode('utf8'), check=True,
+    )
+
+
+# Lists the CSV files of a commit of the PokeAPI repo as (table_name, blob sha)
+def list_csv_blobs(sha):
+    output = subprocess.check_output(['git', 'ls-tree', '-z', sha, f'{CSV_DIR}/'], cwd='pokeapi')
+    blobs = []
+    for entry in output.split(b'\0'):
+        if not entry:
+            continue
+        info, path = entry.split(b'\t', 1)
+        _, type, blob_sha = info.decode('utf8').split()
+        path = path.decode('utf8')
+        if type == 'blob' and path.endswith('.csv'):
+            blobs.append((os.path.splitext(os.path.basename(path))[0], blob_sha))
+    return blobs
+
+
+# Reads blobs from the PokeAPI repo through a single long-lived "git cat-file
+# --batch" process, without touching the working tree. In a partial clone git
+# fetches the blobs that are missing as they're read.
+class BlobReader:
+    def __init__(self):
+        self.process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd='pokeapi', stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, sha):
+        self.process.stdin.write(f'{sha}\n'.encode('utf8'))
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().decode('utf8').split()
+        if len(header) != 3:
+            raise ValueError(f'Failed to read blob {sha}: {" ".join(header)}')
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1) # trailing newline
+        return data
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+# Builds several revisions of the PokeAPI repo at the same time, each by a
+# build.py process of its own (with a single --rev and its own --output), and
+# returns the (rev, output) of each build, output is None if the build failed
+def build_revisions(revs, output, argv, repo):
+    # The revisions are fetched up front as concurrent fetches would conflict
+    shas = [resolve_rev(rev, repo) for rev in revs]
+
+    # Everything else is passed through to the builds
+    options = ['--rev', '--output']
+    flags = ['--multi-version']
+    child_argv = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in options:
+            skip = True
+        elif arg not in flags and not any(arg.startswith(f'{option}=') for option in options):
+            child_argv.append(arg)
+
+    def build(rev, sha):
+        rev_output = output.format(rev=sha[:12])
+        u.info(f'Building {rev} ({sha[:12]}) into {rev_output}...')
+        started_at = time.perf_counter()
+        with open(f'{rev_output}.log', 'w', encoding='utf8') as log:
+            returncode = subprocess.call(
+                [sys.executable, __file__, *child_argv, '--rev', sha, '--output', rev_output],
+                stdout=log, stderr=subprocess.STDOUT,
+            )
+        return rev, rev_output, returncode, time.perf_counter() - started_at
+
+    with concurrent.futures.ThreadPoolExecutor(os.cpu_count()) as executor:
+        results = list(executor.map(build, revs, shas))
+
+    u.info()
+    outputs = []
+    for rev, rev_output, returncode, elapsed in results:
+        if returncode == 0:
+            u.info(f'   {rev}: {rev_output} ({elapsed:.2f}s)')
+            outputs.append((rev, rev_output))
+        else:
+            u.error(f'   {rev}: failed, see {rev_output}.log')
+            outputs.append((rev, None))
+    return outputs
+
+
+# Builds several revisions of the PokeAPI repo (oldest first) and merges them
+# into a single multi-version database (see utils/versions.py), returns the
+# exit code
+def build_multi_version(revs, output, argv, repo, fts=False):
+    # The builds of each revision are only needed for the merge
+    directory = f'{output}.versions'
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    versions = build_revisions(revs, os.path.join(directory, '{rev}.sqlite'), argv, repo)
+    if any(file is None for _, file in versions):
+        return 1
 
+    u.info()
+    u.info(f'Merging {len(versions)} versions into {output}...')
+    started_at = time.perf_counter()
+    db = sqlite3.connect(output)
+    db.execute('BEGIN')
+    u.merge_versions(db, versions)
+
+    # The details of each version are in __versions
+    (pokeapi_git_sha,) = db.execute('SELECT pokeapi_git_sha FROM __versions ORDER BY version DESC').fetchone()
+    metadata = {
+        'created_at': datetime.datetime.utcnow().isoformat(),
+        'pokeapi_git_sha': pokeapi_git_sha,
+        'pokeapi_sqlite_git_sha': subprocess.check_output(['git', 'rev-parse', 'HEAD']).decode('utf8').strip(),
+        'versions': str(len(versions)),
+    }
+    db.execute('CREATE TABLE __metadata (key TEXT PRIMARY KEY, value TEXT)')
+    db.executemany('INSERT INTO __metadata VALUES (?, ?)', metadata.items())
+
+    # Only the latest version is searchable
+    if fts:
+        u.create_fts_tables(db)
+    db.commit()
+    db.execute('VACUUM')
+    db.close()
+
+    versions_size = sum(os.path.getsize(file) for _, file in versions)
+    shutil.rmtree(directory)
+    u.info(f'Merged in {time.perf_counter() - started_at:.2f}s')
+    u.info(f'File Size: {os.path.getsize(output) / 1024 / 1024:.2f} MB ({versions_size / 1024 / 1024:.2f} MB as separate files)')
+    u.info('Done!')
+    return 0
+
+
+def create_indexes(db, table_name, column_names, covering=False):
+    primary_key = u.get_primary_key(db, table_name)
+    for index_name, columns in u.get_indexes(table_name, column_names, covering=covering, primary_key=primary_key):
+        columns = ','.join(f'"{column}"' for column in columns)
+        db.execute(f'CREATE INDEX "{index_name}" ON "{table_name}" ({columns})')
+
+
+def hash_file(file):
+    sha256 = hashlib.sha256()
+    with open(file, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# The file is either a path or the contents of a blob (see --rev)
+def read_csv(file):
+    if isinstance(file, bytes):
+        f = io.TextIOWrapper(io.BytesIO(file), encoding='utf8')
+    else:
+        f = open(file, 'rt', encoding='utf8')
+    with f:
+        yield from csv.reader(f)
+
+
+# Parses a CSV file and prepares it for import.
+#
+# This is the CPU heavy part of the build (parsing, type inference and scrubbing)
+# and doesn't touch the database so it can be run in a worker process.
+#
+# When streaming the file is read twice, once to figure out the columns and then
+# again lazily as the rows are inserted, so only a batch of rows is ever in
+# memory. Otherwise all the rows are loaded up front.
+#
+# The schema is only inferred if it's not in the schemas dict, which holds the
+# schemas of previous builds for the files that haven't changed since.
+#
+# Takes a tuple of (table_name, file) and returns a tuple of (table_name, schema,
+# rows, links, timings), note that when streaming the links and timings are only
+# complete once all rows are consumed
+def read_table(source, schemas={}, stream=False, strict=False):
+    table_name, file = source
+
+    # ASSUMPTION: First row will always be the header. This may run in a map()
+    # so an empty file has to raise an error of its own, a StopIteration would
+    # silently end the import of the remaining tables.
+    reader = read_csv(file)
+    headers = next(reader, None)
+    if headers is None:
+        raise ValueError(f'{table_name}: The CSV file is empty, it has no header row')
+
+    timings = u.Timings()
+    links = []
+    schema = schemas.get(table_name)
+    if stream:
+        if schema is None:
+            with timings.measure('infer'):
+                schema = u.infer_schema(headers, timings.iterate('parse', reader))
+            reader = read_csv(file)
+            next(reader)
+        rows = prepare_rows(table_name, schema, timings.iterate('parse', reader), links, strict)
+        rows = timings.iterate('scrub', rows)
+    else:
+        with timings.measure('parse'):
+            rows = list(reader)
+        if schema is None:
+            with timings.measure('infer'):
+                schema = u.infer_schema(headers, rows)
+        with timings.measure('scrub'):
+            rows = list(prepare_rows(table_name, schema, rows, links, strict))
+        timings.record_peak_rss()
+
+    return table_name, schema, rows, links, timings
+
+
+# Returns the pages used by each table and index as [first, last] ranges, which
+# lets remote readers (see --range-requests) prefetch a whole table or index
+# with a few range requests. This needs the dbstat virtual table, which most
+# SQLite builds have, returns None if it's missing.
+def get_page_manifest(db):
+    try:
+        pages = db.execute('SELECT name, pageno FROM dbstat ORDER BY name, pageno').fetchall()
+    except sqlite3.OperationalError:
+        return None
+
+    (page_size,) = db.execute('PRAGMA page_size').fetchone()
+    (page_count,) = db.execute('PRAGMA page_count').fetchone()
+    schema = {name: (type, tbl_name) for type, name, tbl_name in db.execute('SELECT type, name, tbl_name FROM sqlite_master')}
+    schema['sqlite_schema'] = ('table', 'sqlite_schema')
+
+    objects = {}
+    for name, page in pages:
+        type, table_name = schema.get(name, ('table', name))
+        obj = objects.setdefault(name, {'type': type, 'table': table_name, 'pages': 0, 'ranges': []})
+        obj['pages'] += 1
+        ranges = obj['ranges']
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'objects': objects,
+    }
+
+
+def print_report(report):
+    tables = report['tables'][:SUMMARY_TABLES]
+    u.info(f'Slowest Tables (top {len(tables)} of {len(report["tables"])}):')
+    width = max((len(table['table']) for table in tables), default=0)
+    for table in tables:
+        stages = ', '.join(
+            f'{stage} {table["stages"][stage]:.2f}s'
+            for stage in STAGES if stage in table['stages']
+        )
+        u.info(f'   {table["table"]:<{width}} {table["seconds"]:>7.2f}s {table["rows"]:>9} rows {table["rows_per_second"]:>9.0f} rows/s  ({stages})')
 
-def counts(iterable):
-    counts = collections.defaultdict(int)
-    for item in iterable:
-        counts[item] += 1
-    return counts
+    u.info()
+    u.info('Stage Totals:')
+    for stage, seconds in report['stages'].items():
+        u.info(f'   {stage:<7} {seconds:>7.2f}s')
 
 
 if __name__ == '__main__':
@@ -98,9 +469,121 @@ if __name__ == '__main__':
                 'action': 'store_true',
                 'help': 'Do not clone the PokeAPI repo if it does not exist',
             },
+            '--repo': {
+                'default': POKEAPI_REPO,
+                'metavar': 'URL',
+                'help': f'The PokeAPI repo to clone, can be a local path (default: {POKEAPI_REPO})',
+            },
+            '--mirror': {
+                'metavar': 'DIR',
+                'help': 'Clone the PokeAPI repo through a mirror in this directory, which is created or updated first and can be kept between builds (eg. cached in CI)',
+            },
+            ('-j', '--jobs'): {
+                'type': int,
+                'default': 1,
+                'metavar': 'N',
+                'help': 'Number of worker processes used to parse the CSV files (0 uses all CPUs, default: 1)',
+            },
+            '--incremental': {
+                'action': 'store_true',
+                'help': 'Update an existing pokeapi.sqlite file, only re-importing the tables whose CSV file changed',
+            },
+            '--no-indexes': {
+                'action': 'store_true',
+                'help': 'Do not create secondary indexes (see utils/indexes.py)',
+            },
+            '--fast': {
+                'action': 'store_true',
+                'help': 'Import everything in a single unjournaled transaction and VACUUM/ANALYZE the result',
+            },
+            '--stream': {
+                'action': 'store_true',
+                'help': 'Stream rows from the CSV files into the database in batches to keep memory usage flat',
+            },
+            '--range-requests': {
+                'action': 'store_true',
+                'help': f'Lay out the file for remote readers that use HTTP range requests (eg. sql.js-httpvfs): {RANGE_PAGE_SIZE} byte pages, covering indexes, VACUUM/ANALYZE and a manifest of the page ranges of each table (pokeapi.sqlite.pages.json)',
+            },
+            '--strict': {
+                'action': 'store_true',
+                'help': 'Create STRICT tables, with empty values stored as NULL and the 0/1 flag columns (eg. is_baby) constrained to 0 and 1',
+            },
+            '--dictionary': {
+                'action': 'store_true',
+                'help': 'Store the TEXT columns that repeat the same values a lot (eg. flavor text) once in a shared table, the tables become views with the same columns (see utils/dictionary.py)',
+            },
+            '--fts': {
+                'action': 'store_true',
+                'help': 'Create FTS5 full-text search tables over the names, flavor text and prose, with a tokenizer per language (see utils/fts.py)',
+            },
+            '--base': {
+                'metavar': 'FILE',
+                'help': 'A previous build to write a patch (pokeapi.sqlite.patch) against, which upgrades it to this build (see apply-patch.py)',
+            },
+            '--report': {
+                'metavar': 'FILE',
+                'help': 'Write the build report (per table timings, throughput and peak memory) as JSON to this file',
+            },
+            '--rev': {
+                'action': 'append',
+                'metavar': 'REV',
+                'help': 'Build a commit of the PokeAPI repo straight from its git objects without touching the checkout (it is fetched from --repo if needed), can be given several times to build several commits at the same time',
+            },
+            '--output': {
+                'metavar': 'FILE',
+                'help': 'The file to build (default: pokeapi.sqlite), with several --rev "{rev}" is replaced by the commit (default: pokeapi-{rev}.sqlite)',
+            },
+            '--multi-version': {
+                'action': 'store_true',
+                'help': 'Build every --rev (oldest first) into a single file which stores the rows shared by consecutive versions once, the tables are views of the latest version (see utils/versions.py to query the others)',
+            },
         }
     )
 
+    several_revs = args.rev and len(args.rev) > 1 and not args.multi_version
+    output = args.output or ('pokeapi-{rev}.sqlite' if several_revs else 'pokeapi.sqlite')
+
+
+    if args.stream and args.jobs != 1:
+        u.error('The --stream and --jobs options can not be used together.')
+        sys.exit(1)
+
+    # --fast turns off the journal, which is only safe for a new file. A failed
+    # incremental build would leave the previous build corrupt.
+    if args.fast and args.incremental:
+        u.error('The --fast and --incremental options can not be used together.')
+        sys.exit(1)
+
+    if args.multi_version:
+        if not args.rev:
+            u.error('The --multi-version option needs the revisions to build (--rev).')
+            sys.exit(1)
+        if args.base or args.report or args.incremental or args.dictionary:
+            u.error('The --base, --report, --incremental and --dictionary options can not be used with --multi-version.')
+            sys.exit(1)
+        if os.path.exists(output):
+            if not args.overwrite:
+                u.error(f'The {output} file already exists.')
+                sys.exit(1)
+            u.warn(f'Removing existing {output} file...')
+            os.remove(output)
+
+    if several_revs:
+        if '{rev}' not in output:
+            u.error('The --output option has to contain "{rev}" when building several revisions.')
+            sys.exit(1)
+        if args.base or args.report:
+            u.error('The --base and --report options can not be used when building several revisions.')
+            sys.exit(1)
+
+    if args.base:
+        if not os.path.exists(args.base):
+            u.error(f'The {args.base} file does not exist.')
+            sys.exit(1)
+        if os.path.exists(output) and os.path.samefile(args.base, output):
+            u.error(f'The --base file can not be the {output} file that is being built.')
+            sys.exit(1)
+
 
     # Clone
     if not os.path.exists('pokeapi'):
@@ -108,34 +591,71 @@ if __name__ == '__main__':
             u.error('PokeAPI repo does not exist.')
             sys.exit(1)
 
-        u.info('Cloning PokeAPI repo...')
-        subprocess.call(['git', 'clone', '--depth=1', 'https://github.com/PokeAPI/pokeapi.git'])
+        try:
+            clone_pokeapi(args.repo, args.mirror)
+        except subprocess.CalledProcessError:
+            # Don't leave a partial clone behind, it would be used by the next build
+            shutil.rmtree('pokeapi', ignore_errors=True)
+            u.error('Failed to clone the PokeAPI repo.')
+            sys.exit(1)
         u.info()
 
+    if args.multi_version:
+        sys.exit(build_multi_version(args.rev, output, sys.argv[1:], args.repo, fts=args.fts))
 
-    # Build
-    if os.path.exists('pokeapi.sqlite'):
-        if not args.overwrite:
-            u.error('The pokeapi.sqlite file already exists.')
+    if several_revs:
+        versions = build_revisions(args.rev, output, sys.argv[1:], args.repo)
+        sys.exit(1 if any(file is None for _, file in versions) else 0)
+
+    if args.rev:
+        try:
+            pokeapi_git_sha = resolve_rev(args.rev[0], args.repo)
+        except subprocess.CalledProcessError:
+            u.error(f'Failed to fetch {args.rev[0]} from the PokeAPI repo.')
             sys.exit(1)
+        output = output.format(rev=pokeapi_git_sha[:12])
 
-        u.warn('Removing existing pokeapi.sqlite file...')
-        os.remove('pokeapi.sqlite')
+
+    # Build
+    if os.path.exists(output):
+        if args.incremental:
+            u.info(f'Updating existing {output} file...')
+        elif not args.overwrite:
+            u.error(f'The {output} file already exists.')
+            sys.exit(1)
+        else:
+            u.warn(f'Removing existing {output} file...')
+            os.remove(output)
         u.info()
 
-    db = sqlite3.connect('pokeapi.sqlite')
+    started_at = time.perf_counter()
+    build_timings = u.Timings()
+    db = sqlite3.connect(output)
+
+    # The page size only applies to new files, existing files (ie. when
+    # --incremental is used) are converted by the VACUUM at the end. The pages
+    # of the tables replaced by --dictionary are only given back by the VACUUM.
+    vacuum = args.fast or args.range_requests or args.dictionary
+    page_size = RANGE_PAGE_SIZE if args.range_requests else FAST_PAGE_SIZE if args.fast else None
+    if page_size:
+        db.execute(f'PRAGMA page_size = {page_size}')
+    if args.fast:
+        for pragma, value in FAST_PRAGMAS.items():
+            db.execute(f'PRAGMA {pragma} = {value}')
 
 
     # Add metadata
-    db.execute('CREATE TABLE __metadata (key TEXT PRIMARY KEY, value TEXT)')
+    db.execute('CREATE TABLE IF NOT EXISTS __metadata (key TEXT PRIMARY KEY, value TEXT)')
+    previous_metadata = dict(db.execute('SELECT key, value FROM __metadata'))
 
-    sql = 'INSERT INTO __metadata VALUES (?, ?)'
+    sql = 'INSERT OR REPLACE INTO __metadata VALUES (?, ?)'
 
     now = datetime.datetime.utcnow().isoformat()
     u.info(f'Created at: {now}')
     db.execute(sql, ('created_at', now))
 
-    pokeapi_git_sha = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd='pokeapi').decode('utf8').strip()
+    if not args.rev:
+        pokeapi_git_sha = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd='pokeapi').decode('utf8').strip()
     u.info(f'PokeAPI Git SHA: {pokeapi_git_sha}')
     db.execute(sql, ('pokeapi_git_sha', pokeapi_git_sha))
 
@@ -143,77 +663,325 @@ if __name__ == '__main__':
     u.info(f'PokeAPI SQLite Git SHA: {pokeapi_sqlite_git_sha}')
     db.execute(sql, ('pokeapi_sqlite_git_sha', pokeapi_sqlite_git_sha))
 
+    # Options which change the schema or contents of the tables
+    build_options = json.dumps({
+        'indexes': not args.no_indexes,
+        'covering_indexes': args.range_requests,
+        'strict': args.strict,
+        'dictionary': args.dictionary,
+    }, sort_keys=True)
+    u.info(f'Build Options: {build_options}')
+    db.execute(sql, ('build_options', build_options))
+
     u.info()
 
 
-    # Close and re-open the database to ensure the total_changes count doesn't include the metadata
+    # Dictionary encoded tables (see --dictionary) are views, they're turned
+    # back into plain tables so they can be updated and encoded again at the end
+    if u.decode_tables(db):
+        db.commit()
+
+
+    # Figure out which CSV files need to be imported, in incremental mode that's
+    # only the ones which changed since the last build
+    previous_tables = set()
+    previous_sources = {}
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = '__sources'").fetchone():
+        previous_tables = {row[0] for row in db.execute('SELECT table_name FROM __sources')}
+        if previous_metadata.get('pokeapi_sqlite_git_sha') == pokeapi_sqlite_git_sha:
+            previous_sources = {
+                table_name: (sha256, u.Schema.from_json(schema))
+                for table_name, sha256, schema in db.execute('SELECT table_name, sha256, schema FROM __sources')
+            }
+        else:
+            u.warn(f'The existing {output} file was built by a different version of this script, all tables will be imported.')
+            u.info()
+            db.execute('DROP TABLE __sources')
+
+    same_options = previous_metadata.get('build_options') == build_options
+    if previous_sources and not same_options:
+        u.warn(f'The existing {output} file was built with different options, all tables will be imported.')
+        u.info()
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS __sources (
+            table_name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            schema TEXT NOT NULL
+        )
+    ''')
+
+    # The [label]{kind:target} references removed from the text columns, so they
+    # can be looked up without having to parse the original mark-up
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS __text_links (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            column_name TEXT NOT NULL,
+            kind TEXT,
+            target TEXT NOT NULL
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS __text_links__table_name__row_id ON __text_links (table_name, row_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS __text_links__kind__target ON __text_links (kind, target)')
+
+    # The files are either paths in the checkout or, with --rev, blob shas
+    if args.rev:
+        blobs = BlobReader()
+        sources = list_csv_blobs(pokeapi_git_sha)
+    else:
+        sources = [
+            (os.path.splitext(os.path.basename(file))[0], file)
+            for file in glob.glob(f'pokeapi/{CSV_DIR}/*.csv')
+        ]
+
+    hashes = {}
+    sizes = {}
+    schemas = {}
+    files = []
+    for table_name, file in sources:
+        with build_timings.measure('hash'):
+            if args.rev:
+                data = blobs.read(file)
+                hashes[table_name] = hashlib.sha256(data).hexdigest()
+                sizes[table_name] = len(data)
+                del data
+            else:
+                hashes[table_name] = hash_file(file)
+                sizes[table_name] = os.path.getsize(file)
+
+        previous_hash, previous_schema = previous_sources.get(table_name, (None, None))
+        if hashes[table_name] == previous_hash:
+            # The inferred schema only depends on the file so it can be reused
+            schemas[table_name] = previous_schema
+            if same_options:
+                continue
+        files.append((table_name, file))
+
+    for table_name in previous_tables - hashes.keys():
+        u.warn(f'Removing {table_name}...')
+        db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        db.execute('DELETE FROM __sources WHERE table_name = ?', (table_name,))
+        db.execute('DELETE FROM __text_links WHERE table_name = ?', (table_name,))
+
     db.commit()
-    db.close()
-    db = sqlite3.connect('pokeapi.sqlite')
 
 
     # Add pokeapi data
-    total_tables = 0
-    for file in glob.glob('pokeapi/data/v2/csv/*.csv'):
-        table_name = os.path.splitext(os.path.basename(file))[0]
+    if args.jobs != 1:
+        # Schedule the largest files first so they don't end up as stragglers
+        files.sort(key=lambda file: sizes[file[0]], reverse=True)
+    # The blobs are read again as they're imported so they're not all in memory
+    sources = ((table_name, blobs.read(file)) for table_name, file in files) if args.rev else files
+    if args.jobs == 1:
+        tables = map(functools.partial(read_table, schemas=schemas, stream=args.stream, strict=args.strict), sources)
+    else:
+        pool = multiprocessing.Pool(args.jobs or None)
+        tables = pool.imap_unordered(functools.partial(read_table, schemas=schemas, strict=args.strict), sources)
+
+    # In fast mode everything is imported in a single transaction
+    if args.fast:
+        db.execute('BEGIN')
+
+    report_tables = []
+    for table_name, schema, rows, links, timings in tables:
         u.info(f'Importing {table_name}...')
 
-        with open(file, 'rt', encoding='utf8') as f:
-            reader = csv.reader(f)
+        # Replace the table and its __sources entry in a single transaction so an
+        # interrupted build never leaves a stale hash behind
+        with timings.measure('create'):
+            if not db.in_transaction:
+                db.execute('BEGIN')
+            db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            db.execute('DELETE FROM __text_links WHERE table_name = ?', (table_name,))
+            db.execute(schema.create_table_sql(table_name, strict=args.strict))
+
+        # Insert the data, all values will be coerced by SQLite
+        row_count = 0
+        sql = f'INSERT INTO "{table_name}" VALUES ({",".join("?" * len(schema.columns))})'
+        for batch in batched(rows, BATCH_SIZE):
+            with timings.measure('insert'):
+                db.executemany(sql, batch)
+            row_count += len(batch)
+
+        with timings.measure('insert'):
+            db.executemany('INSERT INTO __text_links VALUES (?, ?, ?, ?, ?)', (
+                (table_name, *link) for link in links
+            ))
+
+        # Indexes are created after the data is inserted as that's faster than
+        # updating them row by row
+        if not args.no_indexes:
+            with timings.measure('index'):
+                create_indexes(db, table_name, schema.names, covering=args.range_requests)
+
+        db.execute('INSERT OR REPLACE INTO __sources VALUES (?, ?, ?, ?)', (table_name, hashes[table_name], row_count, schema.to_json()))
+        if not args.fast:
+            with timings.measure('commit'):
+                db.commit()
+
+        timings.record_peak_rss()
+        report_tables.append({
+            'table': table_name,
+            'rows': row_count,
+            'seconds': timings.total,
+            'rows_per_second': row_count / timings.total if timings.total else 0,
+            'stages': timings.stages,
+            'peak_rss': timings.peak_rss,
+        })
+
+    with build_timings.measure('commit'):
+        db.commit()
+
+    if args.jobs != 1:
+        pool.close()
+        pool.join()
+    if args.rev:
+        blobs.close()
+
+    # The latest tables are rebuilt from scratch as their source tables may
+    # have changed, it only takes a fraction of the import
+    u.info('Creating latest tables...')
+    with build_timings.measure('latest'):
+        if not db.in_transaction:
+            db.execute('BEGIN')
+        for table_name, column_names, row_count in u.create_latest_tables(db):
+            u.info(f'   {table_name}: {row_count} rows')
+            if not args.no_indexes:
+                create_indexes(db, table_name, column_names, covering=args.range_requests)
+        db.commit()
+
+    if args.dictionary:
+        u.info('Encoding repeated text...')
+        with build_timings.measure('dictionary'):
+            if not db.in_transaction:
+                db.execute('BEGIN')
+            encoded = u.encode_tables(db)
+            db.commit()
+        for table_name, column_names in encoded:
+            u.info(f'   {table_name}: {", ".join(column_names)}')
+
+    # The full-text search tables are rebuilt from scratch as any of the tables
+    # they index may have changed
+    if args.fts:
+        u.info('Creating full-text search tables...')
+        with build_timings.measure('fts'):
+            fts_counts = u.create_fts_tables(db)
+            db.commit()
+        for kind, count in fts_counts.items():
+            u.info(f'   {kind}: {count} texts')
+    else:
+        u.drop_fts_tables(db)
+        db.commit()
 
-            # ASSUMPTION: First row will always be the header
-            headers = next(reader)
-            column_count = len(headers)
+    total_tables, total_rows = db.execute('SELECT COUNT(*), TOTAL(rows) FROM __sources').fetchone()
 
-            # Create the table for this CSV file
-            rows = list(reader)
-            sql = []
-            for col_idx, column_name in enumerate(headers):
-                # Figure out the type of the column
-                type_counts = counts(get_value_type(safe_index(row, col_idx)) for row in rows)
-                column_type = get_column_type(type_counts)
-                column_is_nullable = get_column_is_nullable(type_counts)
-                column_is_primary_key = (
-                    column_name == 'id' and
-                    column_type == 'INTEGER' and
-                    not column_is_nullable and
-                    len(rows) == len(set(row[col_idx] for row in rows)))
-
-                sql_decl = f'"{column_name}" {column_type}'
-                if not column_is_nullable:
-                    sql_decl += ' NOT NULL'
-                if column_is_primary_key:
-                    sql_decl += ' PRIMARY KEY'
-
-                sql.append(sql_decl)
-
-                # Scrub string data
-                if column_type == 'TEXT':
-                    for row in rows:
-                        row[col_idx] = scrub_string(row[col_idx])
-
-            db.execute(f'CREATE TABLE "{table_name}" ({",".join(sql)})')
-            total_tables += 1
-
-            # Ensure all rows have the same number of columns
-            for i, row in enumerate(rows):
-                if len(row) != column_count:
-                    u.warn(f'Row has wrong number of columns (expected {column_count}): {row}')
-                    rows[i] = (row + [None] * column_count)[:column_count]
-
-            # Insert the data, all values will be coerced by SQLite
-            db.executemany(f'INSERT INTO "{table_name}" VALUES ({",".join("?" * column_count)})', rows)
+    if vacuum:
+        u.info()
+        unvacuumed_filesize = os.path.getsize(output)
+        u.info('Analyzing...')
+        with build_timings.measure('analyze'):
+            db.execute('ANALYZE')
             db.commit()
+        u.info('Vacuuming...')
+        with build_timings.measure('vacuum'):
+            if page_size:
+                db.execute(f'PRAGMA page_size = {page_size}')
+            db.execute('VACUUM')
+
+    elapsed = time.perf_counter() - started_at
+
+
+    # Build report, stage totals add up the per table stages (which may have run
+    # in parallel) and the stages of the build as a whole
+    report_tables.sort(key=lambda table: table['seconds'], reverse=True)
+    stage_totals = {}
+    for table in report_tables:
+        for stage in STAGES:
+            if stage in table['stages']:
+                stage_totals[stage] = stage_totals.get(stage, 0) + table['stages'][stage]
+    for stage, seconds in build_timings.stages.items():
+        stage_totals[stage] = stage_totals.get(stage, 0) + seconds
+
+    report = {
+        'created_at': now,
+        'pokeapi_git_sha': pokeapi_git_sha,
+        'pokeapi_sqlite_git_sha': pokeapi_sqlite_git_sha,
+        'build_options': json.loads(build_options),
+        'jobs': args.jobs,
+        'stream': args.stream,
+        'fast': args.fast,
+        'incremental': args.incremental,
+        'range_requests': args.range_requests,
+        'strict': args.strict,
+        'dictionary': args.dictionary,
+        'fts': args.fts,
+        'build_time': elapsed,
+        'peak_rss': u.get_peak_rss(),
+        'stages': stage_totals,
+        'tables': report_tables,
+    }
+    report_json = json.dumps(report, indent=4)
+    db.execute('INSERT OR REPLACE INTO __metadata VALUES (?, ?)', ('build_report', report_json))
+    db.commit()
 
-    total_rows = db.total_changes
+    # Written last so it matches the final layout of the file
+    if args.range_requests:
+        manifest = get_page_manifest(db)
+        if manifest is None:
+            u.warn('This SQLite build has no dbstat table, the page manifest will not be written.')
+        else:
+            with open(f'{output}.pages.json', 'w', encoding='utf8') as f:
+                json.dump(manifest, f, indent=4)
     db.close()
 
+    if args.report:
+        with open(args.report, 'w', encoding='utf8') as f:
+            f.write(report_json)
+
+    u.info()
+    print_report(report)
+
     u.info()
     u.info('Database Metadata:')
-    u.info(f'   Tables: {total_tables}')
-    u.info(f'   Rows: {total_rows}')
-    filesize = os.path.getsize("pokeapi.sqlite")
+    u.info(f'   Tables: {total_tables} ({len(files)} imported, {total_tables - len(files)} unchanged)')
+    u.info(f'   Rows: {int(total_rows)}')
+    filesize = os.path.getsize(output)
     u.info(f'   File Size: {filesize / 1024 / 1024:.2f} MB ({filesize} bytes)')
+    if vacuum:
+        change = (filesize - unvacuumed_filesize) / unvacuumed_filesize * 100
+        u.info(f'   File Size before VACUUM: {unvacuumed_filesize / 1024 / 1024:.2f} MB ({change:+.1f}%)')
+    u.info(f'   Build Time: {elapsed:.2f}s')
+    if report['peak_rss'] is not None:
+        u.info(f'   Peak Memory: {report["peak_rss"] / 1024 / 1024:.2f} MB')
+
+
+    # Patch
+    if args.base:
+        u.info()
+        u.info(f'Creating patch from {args.base}...')
+        base_db = sqlite3.connect(f'file:{args.base}?mode=ro', uri=True)
+        db = sqlite3.connect(f'file:{output}?mode=ro', uri=True)
+        base_metadata = dict(base_db.execute('SELECT key, value FROM __metadata'))
+        changes = u.create_patch(base_db, db, f'{output}.patch', {
+            'created_at': now,
+            'base_created_at': base_metadata.get('created_at'),
+            'base_pokeapi_git_sha': base_metadata.get('pokeapi_git_sha'),
+            'pokeapi_git_sha': pokeapi_git_sha,
+            'base_pokeapi_sqlite_git_sha': base_metadata.get('pokeapi_sqlite_git_sha'),
+            'pokeapi_sqlite_git_sha': pokeapi_sqlite_git_sha,
+        })
+        base_db.close()
+        db.close()
+
+        for table_name, counts in sorted(changes.items()):
+            if counts == 'drop':
+                u.info(f'   {table_name}: dropped')
+            else:
+                u.info(f'   {table_name}: {", ".join(f"{count} {op}" for op, count in counts.items()) or "recreated"}')
+        patch_filesize = os.path.getsize(f'{output}.patch')
+        u.info(f'   Patch Size: {patch_filesize / 1024:.2f} KB ({patch_filesize} bytes)')
 
     u.info()
     u.info('Done!')
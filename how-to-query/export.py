@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import argparse
+import concurrent.futures
+import importlib.util
+import os
+import sys
+import time
+import u
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# The datasets, each generated by the generate(db, dimensions, filters)
+# function of its generate-<dataset>.json.py script
+DATASETS = ['pokedex', 'moves', 'items', 'types']
+
+# The filters of the scripts that apply to all the datasets, identifiers are
+# only those of one
+FILTER_ARGS = {name: options for name, options in u.FILTER_ARGS.items() if name != '--id'}
+
+
+# Imports a dataset's script, whose file name isn't a valid module name
+def load_script(dataset):
+    spec = importlib.util.spec_from_file_location(f'generate_{dataset}', os.path.join(script_dir, f'generate-{dataset}.json.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The filters of a dataset, without those its script doesn't support (eg.
+# --generation for the items) which only leave it unfiltered with a warning
+# rather than stopping the other datasets from being generated
+def get_filters(db, dataset, args):
+    script = load_script(dataset)
+    unsupported = [
+        name for name in FILTER_ARGS
+        if name not in script.FILTERS and getattr(args, name[2:]) is not None
+    ]
+    if unsupported:
+        u.warn(f'The {dataset} can\'t be filtered by {", ".join(unsupported)}, they\'re generated without it')
+        args = argparse.Namespace(**{**vars(args), **{name[2:]: None for name in unsupported}})
+    return u.get_filters(db, args, script.ENTITY_TABLE)
+
+
+# Writes the dataset to the output directory, the same as the output of the
+# script with the same --format/--gzip and filters. Returns the file name, the
+# time it took and the file size.
+def export(db, dimensions, dataset, filters, args):
+    started_at = time.perf_counter()
+    data = load_script(dataset).generate(db, dimensions, filters)
+    file_name = u.dataset_file_name(dataset, args)
+    output_file = os.path.join(args.output_dir, file_name)
+    with open(output_file, 'wb') as f:
+        u.write_dataset(data, f, args)
+    return file_name, time.perf_counter() - started_at, os.path.getsize(output_file)
+
+
+def format_export(result):
+    file_name, seconds, size = result
+    return f'{file_name}: {seconds:.2f}s, {size / 1024:.1f} KB'
+
+
+# The connection and lookups of a worker process (see --jobs)
+worker = {}
+
+
+def init_worker(dimensions):
+    worker['db'] = u.open_db()
+    worker['dimensions'] = dimensions
+
+
+def export_in_worker(dataset, filters, args):
+    return export(worker['db'], worker['dimensions'], dataset, filters, args)
+
+
+def main():
+    args = u.parse_args(
+        description='Generates the JSON datasets of the generate-*.json.py scripts in a single process, over one connection and with the lookups they share built once.',
+        args={
+            'datasets': {
+                'nargs': '*',
+                'metavar': 'DATASET',
+                'help': f'The datasets to generate: {", ".join(DATASETS)} (default: all)',
+            },
+            '--output-dir': {
+                'default': '.',
+                'metavar': 'DIR',
+                'help': 'Directory to write the <dataset>.json (or .ndjson, .json.gz, ...) files to (default: the current directory)',
+            },
+            '--jobs': {
+                'type': int,
+                'default': min(len(DATASETS), os.cpu_count() or 1),
+                'metavar': 'N',
+                'help': 'Number of datasets to generate at the same time, in worker processes (default: the number of CPUs, up to one per dataset)',
+            },
+            **FILTER_ARGS,
+            **u.OUTPUT_ARGS,
+        }
+    )
+
+    unknown = [dataset for dataset in args.datasets if dataset not in DATASETS]
+    if unknown:
+        u.error(f'Unknown datasets: {", ".join(unknown)} (choose from {", ".join(DATASETS)})')
+        sys.exit(1)
+    datasets = [dataset for dataset in DATASETS if dataset in args.datasets] if args.datasets else DATASETS
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started_at = time.perf_counter()
+
+    db = u.open_db()
+    dimensions = u.Dimensions(db)
+    filters = {dataset: get_filters(db, dataset, args) for dataset in datasets}
+
+    jobs = min(args.jobs, len(datasets))
+    if jobs <= 1:
+        for dataset in datasets:
+            u.info(format_export(export(db, dimensions, dataset, filters[dataset], args)))
+    else:
+        # The datasets are built in Python so threads wouldn't run them at the
+        # same time. SQLite connections can't be shared with other processes,
+        # so the workers open their own but get the lookups and filters
+        # resolved here.
+        with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(dimensions,)) as executor:
+            futures = {
+                dataset: executor.submit(export_in_worker, dataset, filters[dataset], args)
+                for dataset in datasets
+            }
+            for future in futures.values():
+                u.info(format_export(future.result()))
+
+    u.info(f'Total Time: {time.perf_counter() - started_at:.2f}s')
+
+
+# The worker processes import this script too (when they're spawned rather
+# than forked)
+if __name__ == '__main__':
+    main()
@@ -1,81 +1,99 @@
 #!/usr/bin/env python3
 
+import sys
 import u
 
 
+# The entities of the dataset, for --id
+ENTITY_TABLE = 'items'
+
+# The filters of the dataset (see FILTER_ARGS in u.py), items have no generation
+FILTERS = ['--id', '--lang']
+
+
 def main():
-    u.parse_args()
+    args = u.parse_args(args={**u.filter_args(FILTERS), **u.OUTPUT_ARGS})
 
     db = u.open_db()
+    filters = u.get_filters(db, args, ENTITY_TABLE)
+    u.write_dataset(generate(db, u.Dimensions(db), filters), sys.stdout.buffer, args)
+
 
+# Returns the dataset keyed by item identifier, export.py calls this directly
+def generate(db, dimensions, filters):
     data = {}
 
-    # Names
-    for row in db.execute('''
-        SELECT item_id, items.identifier, iso3166, name
+    # The items with a name, in any language as --lang only filters the names
+    # and texts
+    for row in db.execute(f'''
+        SELECT id, identifier
         FROM items
-
-        JOIN item_names
-        ON items.id = item_names.item_id
-
-        JOIN languages
-        ON item_names.local_language_id = languages.id
+        WHERE {filters.entities('id')}
+        AND EXISTS (SELECT 1 FROM item_names WHERE item_id = items.id)
+        ORDER BY id
     '''):
-        datum = data.setdefault(row.item_id, {
+        data[row.id] = {
             'id': row.identifier,
             'category': None,
             'name': {},
             'flavor_text': {},
             'effect': {},
-        })
-        datum['name'][row.iso3166] = row.name
+        }
+
+    # Names
+    for row in db.execute(f'''
+        SELECT item_id, local_language_id, name
+        FROM item_names
+        WHERE {filters.entities('item_id')}
+        AND {filters.languages('local_language_id')}
+        ORDER BY item_id, local_language_id
+    '''):
+        if row.item_id in data:
+            data[row.item_id]['name'][dimensions.languages[row.local_language_id]] = row.name
 
     # Categories
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT items.id, item_categories.identifier
         FROM items
 
         JOIN item_categories
         ON items.category_id = item_categories.id
+
+        WHERE {filters.entities('items.id')}
     '''):
         if row.id in data:
             data[row.id]['category'] = row.identifier
 
     # Flavor text
-    for row in db.execute('''
-        SELECT t1.item_id, iso3166, t1.flavor_text
-        FROM item_flavor_text AS t1
-
-        JOIN languages
-        ON t1.language_id = languages.id
-
-        -- Only get the flavor text from the latest version group
-        LEFT JOIN item_flavor_text AS t2
-        ON t1.item_id = t2.item_id
-        AND t1.language_id = t2.language_id
-        AND t1.version_group_id < t2.version_group_id
-        WHERE t2.version_group_id IS NULL
+    for row in db.execute(f'''
+        SELECT ft.item_id, ft.language_id, ft.flavor_text
+        -- Only the flavor text from the latest version group
+        FROM latest_item_flavor_text AS ft
+        WHERE {filters.entities('ft.item_id')}
+        AND {filters.languages('ft.language_id')}
+        ORDER BY ft.item_id, ft.language_id
     '''):
         if row.item_id in data:
-            data[row.item_id]['flavor_text'][row.iso3166] = row.flavor_text
+            data[row.item_id]['flavor_text'][dimensions.languages[row.language_id]] = row.flavor_text
 
     # Effects
-    for row in db.execute('''
-        SELECT item_id, iso3166, short_effect
+    for row in db.execute(f'''
+        SELECT item_id, local_language_id, short_effect
         FROM item_prose
-
-        JOIN languages
-        ON item_prose.local_language_id = languages.id
+        WHERE {filters.entities('item_id')}
+        AND {filters.languages('local_language_id')}
+        ORDER BY item_id, local_language_id
     '''):
         if row.item_id in data:
-            data[row.item_id]['effect'][row.iso3166] = row.short_effect
+            data[row.item_id]['effect'][dimensions.languages[row.local_language_id]] = row.short_effect
 
     # Convert to a dict keyed by id
     data = { datum['id']: datum for datum in data.values() }
     for datum in data.values():
         del datum['id']
 
-    print(u.json_dumps(data))
+    return data
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,65 @@
 #!/usr/bin/env python3
 
+import sys
 import u
 
 
+# The entities of the dataset, for --id and --generation
+ENTITY_TABLE = 'moves'
+
+# The filters of the dataset (see FILTER_ARGS in u.py)
+FILTERS = ['--id', '--lang', '--generation']
+
+
 def main():
-    u.parse_args()
+    args = u.parse_args(args={**u.filter_args(FILTERS), **u.OUTPUT_ARGS})
 
     db = u.open_db()
+    filters = u.get_filters(db, args, ENTITY_TABLE)
+    u.write_dataset(generate(db, u.Dimensions(db), filters), sys.stdout.buffer, args)
+
 
+# Returns the dataset keyed by move identifier, export.py calls this directly
+def generate(db, dimensions, filters):
     data = {}
 
-    # Names
-    for row in db.execute('''
-        SELECT move_id, moves.identifier, iso3166, name
+    # The moves with a name, in any language as --lang only filters the names
+    # and texts
+    for row in db.execute(f'''
+        SELECT id, identifier
         FROM moves
-
-        JOIN move_names
-        ON moves.id = move_names.move_id
-
-        JOIN languages
-        ON move_names.local_language_id = languages.id
-
         WHERE type_id < 10000 -- ignore non-standard moves
+        AND {filters.entities('id')}
+        AND EXISTS (SELECT 1 FROM move_names WHERE move_id = moves.id)
+        ORDER BY id
     '''):
-        datum = data.setdefault(row.move_id, {
+        data[row.id] = {
             'id': row.identifier,
             'name': {},
             'flavor_text': {},
             'effect': {},
             'meta': {},
-        })
-        datum['name'][row.iso3166] = row.name
+        }
+
+    # Names
+    for row in db.execute(f'''
+        SELECT move_id, local_language_id, name
+        FROM move_names
+        WHERE {filters.entities('move_id')}
+        AND {filters.languages('local_language_id')}
+        ORDER BY move_id, local_language_id
+    '''):
+        if row.move_id in data:
+            data[row.move_id]['name'][dimensions.languages[row.local_language_id]] = row.name
 
     # Basic data
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             moves.id AS move_id,
             power, pp, accuracy, priority,
             move_targets.identifier AS target,
             move_damage_classes.identifier AS damage_class,
-            types.identifier AS type
+            moves.type_id
         FROM moves
 
         LEFT JOIN move_targets
@@ -48,10 +68,8 @@ def main():
         LEFT JOIN move_damage_classes
         ON moves.damage_class_id = move_damage_classes.id
 
-        LEFT JOIN types
-        ON moves.type_id = types.id
-
         WHERE move_id < 10000 -- ignore non-standard moves
+        AND {filters.entities('moves.id')}
     '''):
         datum = data[row.move_id]
 
@@ -60,48 +78,45 @@ def main():
         datum['accuracy'] = row.accuracy
         datum['priority'] = row.priority
 
-        datum['type'] = row.type
+        datum['type'] = dimensions.types.get(row.type_id)
         datum['damage_class'] = row.damage_class
         datum['target'] = row.target
 
     # Flavor text
-    for row in db.execute('''
-        SELECT t1.move_id, iso3166, t1.flavor_text
-        FROM move_flavor_text AS t1
-
-        JOIN languages
-        ON t1.language_id = languages.id
-
-        -- Only get the flavor text from the latest version group
-        LEFT JOIN move_flavor_text AS t2
-        ON t1.move_id = t2.move_id
-        AND t1.language_id = t2.language_id
-        AND t1.version_group_id < t2.version_group_id
-        WHERE t2.version_group_id IS NULL
+    for row in db.execute(f'''
+        SELECT ft.move_id, ft.language_id, ft.flavor_text
+        -- Only the flavor text from the latest version group
+        FROM latest_move_flavor_text AS ft
+        WHERE {filters.entities('ft.move_id')}
+        AND {filters.languages('ft.language_id')}
+        ORDER BY ft.move_id, ft.language_id
     '''):
-        data[row.move_id]['flavor_text'][row.iso3166] = row.flavor_text
+        data[row.move_id]['flavor_text'][dimensions.languages[row.language_id]] = row.flavor_text
 
     # Effects
-    for row in db.execute('''
-        SELECT moves.id AS move_id, iso3166, short_effect
+    for row in db.execute(f'''
+        SELECT moves.id AS move_id, local_language_id, short_effect
         FROM moves
 
         JOIN move_effect_prose
         ON moves.effect_id = move_effect_prose.move_effect_id
 
-        JOIN languages
-        ON move_effect_prose.local_language_id = languages.id
-
         WHERE move_id < 10000 -- ignore non-standard moves
+        AND {filters.entities('moves.id')}
+        AND {filters.languages('local_language_id')}
+
+        ORDER BY moves.id, local_language_id
     '''):
-        data[row.move_id]['effect'][row.iso3166] = row.short_effect
+        data[row.move_id]['effect'][dimensions.languages[row.local_language_id]] = row.short_effect
 
     # Basic meta data
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             move_id,
             move_meta_categories.identifier AS meta_category,
-            min_hits, max_hits, min_turns, max_turns,
+            -- empty values are only NULL in "build.py --strict" databases
+            NULLIF(min_hits, '') AS min_hits, NULLIF(max_hits, '') AS max_hits,
+            NULLIF(min_turns, '') AS min_turns, NULLIF(max_turns, '') AS max_turns,
             drain, healing, crit_rate, flinch_chance
         FROM move_meta
 
@@ -109,16 +124,17 @@ def main():
         ON move_meta.meta_category_id = move_meta_categories.id
 
         WHERE move_id < 10000 -- ignore non-standard moves;
+        AND {filters.entities('move_id')}
     '''):
         meta = data[row.move_id]['meta']
 
         meta['category'] = row.meta_category
 
-        if row.min_hits != '' and row.max_hits != '':
+        if row.min_hits is not None and row.max_hits is not None:
             meta['min_hits'] = row.min_hits
             meta['max_hits'] = row.max_hits
 
-        if row.min_turns != '' and row.max_turns != '':
+        if row.min_turns is not None and row.max_turns is not None:
             meta['min_turns'] = row.min_turns
             meta['max_turns'] = row.max_turns
 
@@ -132,7 +148,7 @@ def main():
             meta['flinch_chance'] = row.flinch_chance
 
     # Ailment data
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             move_id, ailment_chance,
             move_meta_ailments.identifier AS meta_ailment
@@ -142,6 +158,7 @@ def main():
         ON move_meta.meta_ailment_id = move_meta_ailments.id
 
         WHERE move_id < 10000 -- ignore non-standard moves;
+        AND {filters.entities('move_id')}
     '''):
         meta = data[row.move_id]['meta']
 
@@ -152,20 +169,20 @@ def main():
             }
 
     # Stat change data
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             move_meta.move_id, stat_chance,
             move_meta_stat_changes.change AS change,
-            stats.identifier AS stat
+            move_meta_stat_changes.stat_id
         FROM move_meta
 
         JOIN move_meta_stat_changes
         ON move_meta.move_id = move_meta_stat_changes.move_id
 
-        JOIN stats
-        ON move_meta_stat_changes.stat_id = stats.id
-
         WHERE move_meta.move_id < 10000 -- ignore non-standard moves;
+        AND {filters.entities('move_meta.move_id')}
+
+        ORDER BY move_meta.move_id, move_meta_stat_changes.stat_id
     '''):
         meta = data[row.move_id]['meta']
 
@@ -175,7 +192,7 @@ def main():
                 'changes': [],
             })
             meta['stat_changes']['changes'].append({
-                'stat': row.stat,
+                'stat': dimensions.stats[row.stat_id],
                 'change': row.change,
             })
 
@@ -184,7 +201,8 @@ def main():
     for datum in data.values():
         del datum['id']
 
-    print(u.json_dumps(data))
+    return data
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,41 @@
 #!/usr/bin/env python3
 
+import sys
 import u
 
 NATIONAL_DEX_ID = 1
 
+# The entities of the dataset, for --id and --generation
+ENTITY_TABLE = 'pokemon_species'
+
+# The filters of the dataset (see FILTER_ARGS in u.py)
+FILTERS = ['--id', '--lang', '--generation']
+
 def main():
-    u.parse_args()
+    args = u.parse_args(args={
+        **u.filter_args(FILTERS),
+        **u.OUTPUT_ARGS,
+        '--engine': {
+            'default': 'python',
+            'choices': ['python', 'sql'],
+            'help': 'python: the dataset is put together in Python from the rows of a query per section (the default), sql: each pokemon is put together by SQLite\'s JSON functions, with the same output',
+        },
+    })
 
     db = u.open_db()
+    filters = u.get_filters(db, args, ENTITY_TABLE)
+    if args.engine == 'sql':
+        u.write_dataset(generate_json(db, filters), sys.stdout.buffer, args, u.json_dump_encoded)
+    else:
+        u.write_dataset(generate(db, u.Dimensions(db), filters), sys.stdout.buffer, args)
+
 
+# Returns the dataset keyed by pokemon identifier, export.py calls this directly
+def generate(db, dimensions, filters):
     data = {}
 
     # Basic info
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             p.species_id AS pokemon_id, p.identifier, ps."order" AS "order",
             p.height, p.weight, p.base_experience, ps.base_happiness,
@@ -32,6 +55,9 @@ def main():
         ON ps.growth_rate_id = growth_rates.id
 
         WHERE pokemon_id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('p.species_id')}
+
+        ORDER BY p.id
     '''):
         datum = data.setdefault(row.pokemon_id, {
             'id': row.identifier,
@@ -65,81 +91,82 @@ def main():
         })
 
     # Names
-    for row in db.execute('''
-        SELECT pokemon_species_id AS pokemon_id, iso3166, name, genus
+    for row in db.execute(f'''
+        SELECT pokemon_species_id AS pokemon_id, local_language_id, name, NULLIF(genus, '') AS genus
         FROM pokemon_species_names
-
-        JOIN languages
-        ON pokemon_species_names.local_language_id = languages.id
+        WHERE {filters.entities('pokemon_species_id')}
+        AND {filters.languages('local_language_id')}
+        ORDER BY pokemon_species_id, local_language_id
     '''):
-        data[row.pokemon_id]['name'][row.iso3166] = row.name
-        if row.genus != "":
-            data[row.pokemon_id]['genus'][row.iso3166] = row.genus
+        iso3166 = dimensions.languages[row.local_language_id]
+        data[row.pokemon_id]['name'][iso3166] = row.name
+        if row.genus is not None:
+            data[row.pokemon_id]['genus'][iso3166] = row.genus
 
     # Pokedex numbers
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT species_id AS pokemon_id, pokedex_number
         FROM pokemon_dex_numbers
         WHERE pokedex_id = ?
+        AND {filters.entities('species_id')}
     ''', (NATIONAL_DEX_ID,)):
         data[row.pokemon_id]['national_dex_number'] = row.pokedex_number
 
     # Flavor text
-    for row in db.execute('''
-        SELECT species_id AS pokemon_id, iso3166, flavor_text
+    for row in db.execute(f'''
+        SELECT species_id AS pokemon_id, language_id, flavor_text
         FROM pokemon_species_flavor_text
-
-        JOIN languages
-        ON pokemon_species_flavor_text.language_id = languages.id
+        WHERE {filters.entities('species_id')}
+        AND {filters.languages('language_id')}
+        ORDER BY species_id, version_id, language_id
     '''):
-        data[row.pokemon_id]['flavor_text'].setdefault(row.iso3166, set())
-        flavor_text = data[row.pokemon_id]['flavor_text'][row.iso3166]
-        flavor_text.add(clean_flavor_text(row.flavor_text))
+        # The distinct texts in the order they first appear (rather than a set,
+        # whose order depends on the string hashes)
+        flavor_text = data[row.pokemon_id]['flavor_text'].setdefault(dimensions.languages[row.language_id], {})
+        flavor_text[clean_flavor_text(row.flavor_text)] = None
     for datum in data.values():
         for lang, text in datum['flavor_text'].items():
             datum['flavor_text'][lang] = list(text)
 
     # Types
-    for row in db.execute('''
-        SELECT p.pokemon_id, t1.identifier AS type1, t2.identifier AS type2
-        FROM (SELECT DISTINCT pokemon_id FROM pokemon_types) p
+    for row in db.execute(f'''
+        SELECT p.pokemon_id, pt1.type_id AS type1_id, pt2.type_id AS type2_id
+        FROM (SELECT DISTINCT pokemon_id FROM pokemon_types WHERE {filters.entities('pokemon_id')}) p
 
         LEFT JOIN pokemon_types pt1 ON p.pokemon_id = pt1.pokemon_id AND pt1.slot = 1
         LEFT JOIN pokemon_types pt2 ON p.pokemon_id = pt2.pokemon_id AND pt2.slot = 2
 
-        LEFT JOIN types t1 ON pt1.type_id = t1.id
-        LEFT JOIN types t2 ON pt2.type_id = t2.id
-
         WHERE pt1.pokemon_id < 10000 -- ignore non-standard pokemon
     '''):
-        data[row.pokemon_id]['type'] = [row.type1]
-        if row.type2:
-            data[row.pokemon_id]['type'].append(row.type2)
+        type1 = dimensions.types.get(row.type1_id)
+        type2 = dimensions.types.get(row.type2_id)
+        data[row.pokemon_id]['type'] = [type1]
+        if type2:
+            data[row.pokemon_id]['type'].append(type2)
 
     # Base stats
-    for row in db.execute('''
-        SELECT pokemon_id, stats.identifier AS stat, base_stat, effort
+    for row in db.execute(f'''
+        SELECT pokemon_id, stat_id, base_stat, effort
         FROM pokemon_stats
-
-        JOIN stats
-        ON pokemon_stats.stat_id = stats.id
-
         WHERE pokemon_id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('pokemon_id')}
+        ORDER BY pokemon_id, stat_id
     '''):
-        data[row.pokemon_id]['base_stats'][row.stat] = row.base_stat
+        stat = dimensions.stats[row.stat_id]
+        data[row.pokemon_id]['base_stats'][stat] = row.base_stat
         if row.effort != 0:
-            data[row.pokemon_id]['effort_values'][row.stat] = row.effort
+            data[row.pokemon_id]['effort_values'][stat] = row.effort
     for datum in data.values():
         datum['base_stats']['total'] = sum(datum['base_stats'].values())
 
     # Abilities
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             p.pokemon_id,
             a1.identifier AS slot1, pa1.is_hidden AS is_hidden1,
             a2.identifier AS slot2, pa2.is_hidden AS is_hidden2,
             a3.identifier AS slot3, pa3.is_hidden AS is_hidden3
-        FROM (SELECT DISTINCT pokemon_id FROM pokemon_abilities) p
+        FROM (SELECT DISTINCT pokemon_id FROM pokemon_abilities WHERE {filters.entities('pokemon_id')}) p
 
         LEFT JOIN pokemon_abilities pa1 ON p.pokemon_id = pa1.pokemon_id AND pa1.slot = 1
         LEFT JOIN pokemon_abilities pa2 ON p.pokemon_id = pa2.pokemon_id AND pa2.slot = 2
@@ -164,7 +191,7 @@ def main():
         if row.slot3: datum['abilities'].append(to_dict(row.slot3, row.is_hidden3))
 
     # Egg groups
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             species_id AS pokemon_id,
             egg_groups.identifier AS egg_group
@@ -174,44 +201,39 @@ def main():
         ON pokemon_egg_groups.egg_group_id = egg_groups.id
 
         WHERE pokemon_id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('species_id')}
+
+        ORDER BY species_id, egg_group_id
     '''):
         data[row.pokemon_id]['egg_groups'].append(row.egg_group)
 
     # Moves
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
-            pm.pokemon_id, pm.version_group_id,
-            m.identifier AS move,
+            pm.pokemon_id, pm.version_group_id, pm.move_id,
             pmm.identifier AS move_method,
             IIF(pmm.identifier = 'level-up', pm.level, NULL) AS level
-        FROM pokemon_moves AS pm
-
-        -- Get the latest moveset for each pokemon
-        JOIN (
-            SELECT pokemon_id, MAX(version_group_id) AS latest
-            FROM pokemon_moves
-            GROUP BY pokemon_id
-        ) AS ver
-        ON pm.pokemon_id = ver.pokemon_id AND pm.version_group_id = ver.latest
-
-        JOIN moves AS m
-        ON pm.move_id = m.id
+        -- Only the moveset from the latest version group of each pokemon
+        FROM latest_pokemon_moves AS pm
 
         JOIN pokemon_move_methods AS pmm
         ON pm.pokemon_move_method_id = pmm.id
 
         WHERE pm.pokemon_id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('pm.pokemon_id')}
 
-        ORDER BY pm.pokemon_id, pm.level
+        -- Break ties on move_id so the output doesn't depend on the query plan
+        ORDER BY pm.pokemon_id, pm.level, pm.move_id
     '''):
         datum = data[row.pokemon_id]
+        move = dimensions.moves[row.move_id]
         if row.move_method == 'level-up':
-            datum['moves']['level-up'][row.level] = row.move
+            datum['moves']['level-up'][row.level] = move
         else:
-            datum['moves'].setdefault(row.move_method, []).append(row.move)
+            datum['moves'].setdefault(row.move_method, []).append(move)
 
     # Evolution From
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT ps1.id AS pokemon_id, ps2.identifier AS evolves_from
         FROM pokemon_species AS ps1
 
@@ -219,19 +241,24 @@ def main():
         ON ps1.evolves_from_species_id = ps2.id
 
         WHERE ps1.id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('ps1.id')}
     '''):
         datum = data[row.pokemon_id]
         datum['evolves_from'] = row.evolves_from
 
     # Evolutions To
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT
             ps.evolves_from_species_id AS pokemon_id,
             ps.identifier AS evolves_to,
             et.identifier AS evolution_trigger,
-            pe.minimum_level,
-            pe.minimum_happiness, pe.minimum_affection, pe.minimum_beauty,
-            pe.time_of_day, pe.relative_physical_stats,
+            -- empty values are only NULL in "build.py --strict" databases
+            NULLIF(pe.minimum_level, '') AS minimum_level,
+            NULLIF(pe.minimum_happiness, '') AS minimum_happiness,
+            NULLIF(pe.minimum_affection, '') AS minimum_affection,
+            NULLIF(pe.minimum_beauty, '') AS minimum_beauty,
+            NULLIF(pe.time_of_day, '') AS time_of_day,
+            NULLIF(pe.relative_physical_stats, '') AS relative_physical_stats,
             pe.needs_overworld_rain, pe.turn_upside_down,
             ti.identifier AS trigger_item,
             hi.identifier AS held_item,
@@ -281,56 +308,57 @@ def main():
         ON pe.trade_species_id = trade_species.id
 
         WHERE ps.id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('ps.evolves_from_species_id')}
+
+        ORDER BY pe.id
     '''):
         datum = data[row.pokemon_id]
         entry = {
             'pokemon': row.evolves_to,
             'trigger': row.evolution_trigger,
         }
-        is_valid = lambda x: x != None and x != ''
-
-        if is_valid(row.minimum_level):
+        if row.minimum_level is not None:
             entry['minimum_level'] = row.minimum_level
 
-        if is_valid(row.minimum_happiness):
+        if row.minimum_happiness is not None:
             entry['minimum_happiness'] = row.minimum_happiness
-        if is_valid(row.minimum_affection):
+        if row.minimum_affection is not None:
             entry['minimum_affection'] = row.minimum_affection
-        if is_valid(row.minimum_beauty):
+        if row.minimum_beauty is not None:
             entry['minimum_beauty'] = row.minimum_beauty
 
-        if is_valid(row.time_of_day):
+        if row.time_of_day is not None:
             entry['time_of_day'] = row.time_of_day
-        if is_valid(row.relative_physical_stats):
+        if row.relative_physical_stats is not None:
             entry['relative_physical_stats'] = row.relative_physical_stats
         if row.needs_overworld_rain == 1:
             entry['during_overworld_rain'] = True
         if row.turn_upside_down == 1:
             entry['hold_device_upside_down'] = True
 
-        if is_valid(row.trigger_item):
+        if row.trigger_item is not None:
             entry['trigger_item'] = row.trigger_item
-        if is_valid(row.held_item):
+        if row.held_item is not None:
             entry['held_item'] = row.held_item
 
-        if is_valid(row.known_move):
+        if row.known_move is not None:
             entry['known_move'] = row.known_move
-        if is_valid(row.known_move_type):
+        if row.known_move_type is not None:
             entry['known_move_type'] = row.known_move_type
 
-        if is_valid(row.gender):
+        if row.gender is not None:
             entry['gender'] = row.gender
 
-        if is_valid(row.location):
+        if row.location is not None:
             entry['location'] = { "location": row.location, "region": None }
-            if is_valid(row.location_region):
+            if row.location_region is not None:
                 entry['location']['region'] = row.location_region
 
-        if is_valid(row.party_species):
+        if row.party_species is not None:
             entry['pokemon_in_party'] = row.party_species
-        if is_valid(row.party_type):
+        if row.party_type is not None:
             entry['type_in_party'] = row.party_type
-        if is_valid(row.trade_species):
+        if row.trade_species is not None:
             entry['trade_for'] = row.trade_species
 
         datum['evolves_to'].append(entry)
@@ -340,11 +368,289 @@ def main():
     for datum in data.values():
         del datum['id']
 
-    print(u.json_dumps(data))
+    return data
+
+
+# Returns the dataset as (pokemon identifier, JSON text) pairs, the same as the
+# entries of generate() but with each pokemon put together in a single query by
+# SQLite's JSON functions, so Python only writes out the text. The sections are
+# correlated subqueries on the species, in the same order and with the same
+# rules (eg. the languages that share an iso3166 code) as those of generate().
+#
+# The aggregates don't take an ORDER BY before SQLite 3.44, the rows are ordered
+# by subqueries instead. JSON values lose their subtype (and would be quoted as
+# strings) when they come out of a subquery, which json() gives back.
+def generate_json(db, filters):
+    # Plain tuples whatever the row factory of the connection
+    cursor = db.cursor()
+    cursor.row_factory = None
+
+    return cursor.execute(f'''
+        SELECT p.identifier, json_object(
+            'national_dex_number', (
+                SELECT pokedex_number
+                FROM pokemon_dex_numbers
+                WHERE species_id = ps.id AND pokedex_id = {NATIONAL_DEX_ID}
+            ),
+            'sort_order', ps."order",
+
+            -- The languages sharing an iso3166 code (eg. ja and ja-Hrkt) have
+            -- the name of the last one, in the place of the first one
+            'name', (
+                SELECT json_group_object(iso3166, name) FROM (
+                    SELECT iso3166, name FROM (
+                        SELECT
+                            l.iso3166, n.local_language_id,
+                            last_value(n.name) OVER languages AS name,
+                            row_number() OVER languages AS number
+                        FROM pokemon_species_names AS n
+                        JOIN languages AS l ON n.local_language_id = l.id
+                        WHERE n.pokemon_species_id = ps.id
+                        AND {filters.languages('n.local_language_id')}
+                        WINDOW languages AS (
+                            PARTITION BY l.iso3166 ORDER BY n.local_language_id
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                        )
+                    )
+                    WHERE number = 1
+                    ORDER BY local_language_id
+                )
+            ),
+            'genus', (
+                SELECT json_group_object(iso3166, genus) FROM (
+                    SELECT iso3166, genus FROM (
+                        SELECT
+                            l.iso3166, n.local_language_id,
+                            last_value(n.genus) OVER languages AS genus,
+                            row_number() OVER languages AS number
+                        FROM pokemon_species_names AS n
+                        JOIN languages AS l ON n.local_language_id = l.id
+                        WHERE n.pokemon_species_id = ps.id
+                        AND NULLIF(n.genus, '') IS NOT NULL
+                        AND {filters.languages('n.local_language_id')}
+                        WINDOW languages AS (
+                            PARTITION BY l.iso3166 ORDER BY n.local_language_id
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                        )
+                    )
+                    WHERE number = 1
+                    ORDER BY local_language_id
+                )
+            ),
+
+            -- The distinct texts of each iso3166 code in the order they first
+            -- appear, and the codes in the order of their first text
+            'flavor_text', (
+                SELECT json_group_object(iso3166, json(flavor_texts)) FROM (
+                    SELECT iso3166, flavor_texts, position FROM (
+                        SELECT
+                            iso3166, position,
+                            json_group_array(flavor_text) OVER languages AS flavor_texts,
+                            row_number() OVER languages AS number
+                        FROM (
+                            SELECT iso3166, flavor_text, MIN(position) AS position FROM (
+                                SELECT
+                                    l.iso3166,
+                                    replace(replace(f.flavor_text, char(10), ' '), char(12), ' ') AS flavor_text,
+                                    row_number() OVER (ORDER BY f.version_id, f.language_id) AS position
+                                FROM pokemon_species_flavor_text AS f
+                                JOIN languages AS l ON f.language_id = l.id
+                                WHERE f.species_id = ps.id
+                                AND {filters.languages('f.language_id')}
+                            )
+                            GROUP BY iso3166, flavor_text
+                        )
+                        WINDOW languages AS (
+                            PARTITION BY iso3166 ORDER BY position
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                        )
+                    )
+                    WHERE number = 1
+                    ORDER BY position
+                )
+            ),
+
+            'type', (
+                SELECT IIF(t2.identifier IS NULL, json_array(t1.identifier), json_array(t1.identifier, t2.identifier))
+                FROM pokemon_types AS pt1
+                LEFT JOIN types AS t1 ON pt1.type_id = t1.id
+                LEFT JOIN pokemon_types AS pt2 ON pt1.pokemon_id = pt2.pokemon_id AND pt2.slot = 2
+                LEFT JOIN types AS t2 ON pt2.type_id = t2.id
+                WHERE pt1.pokemon_id = ps.id AND pt1.slot = 1
+            ),
+
+            -- null rather than empty if there are no abilities at all
+            'abilities', (
+                SELECT json_group_array(json(ability)) FROM (
+                    SELECT IIF(
+                        pa.is_hidden = 0,
+                        json_object('ability', a.identifier),
+                        json_object('ability', a.identifier, 'is_hidden', pa.is_hidden)
+                    ) AS ability
+                    FROM pokemon_abilities AS pa
+                    JOIN abilities AS a ON pa.ability_id = a.id
+                    WHERE pa.pokemon_id = ps.id AND pa.slot IN (1, 2, 3)
+                    ORDER BY pa.slot
+                )
+                WHERE EXISTS (SELECT 1 FROM pokemon_abilities WHERE pokemon_id = ps.id)
+            ),
+
+            'base_stats', (
+                SELECT json_insert(json_group_object(stat, base_stat), '$.total', IFNULL(SUM(base_stat), 0)) FROM (
+                    SELECT s.identifier AS stat, pst.base_stat
+                    FROM pokemon_stats AS pst
+                    JOIN stats AS s ON pst.stat_id = s.id
+                    WHERE pst.pokemon_id = ps.id
+                    ORDER BY pst.stat_id
+                )
+            ),
+            'effort_values', (
+                SELECT json_group_object(stat, effort) FROM (
+                    SELECT s.identifier AS stat, pst.effort
+                    FROM pokemon_stats AS pst
+                    JOIN stats AS s ON pst.stat_id = s.id
+                    WHERE pst.pokemon_id = ps.id AND pst.effort != 0
+                    ORDER BY pst.stat_id
+                )
+            ),
+
+            -- The level-up moves by level (the last one by move_id of each
+            -- level), then the moves of the other methods in the order of their
+            -- first move by level and move_id
+            'moves', (
+                SELECT json_group_object(move_method, json(moves)) FROM (
+                    SELECT 'level-up' AS move_method, NULL AS level, NULL AS move_id, (
+                        SELECT json_group_object(level, move) FROM (
+                            SELECT pm.level, m.identifier AS move, MAX(pm.move_id)
+                            FROM latest_pokemon_moves AS pm
+                            JOIN pokemon_move_methods AS pmm ON pm.pokemon_move_method_id = pmm.id
+                            JOIN moves AS m ON pm.move_id = m.id
+                            WHERE pm.pokemon_id = ps.id AND pmm.identifier = 'level-up'
+                            GROUP BY pm.level
+                            ORDER BY pm.level
+                        )
+                    ) AS moves
+
+                    UNION ALL
+
+                    SELECT move_method, level, move_id, moves FROM (
+                        SELECT
+                            pmm.identifier AS move_method, pm.level, pm.move_id,
+                            json_group_array(m.identifier) OVER move_methods AS moves,
+                            row_number() OVER move_methods AS number
+                        FROM latest_pokemon_moves AS pm
+                        JOIN pokemon_move_methods AS pmm ON pm.pokemon_move_method_id = pmm.id
+                        JOIN moves AS m ON pm.move_id = m.id
+                        WHERE pm.pokemon_id = ps.id AND pmm.identifier != 'level-up'
+                        WINDOW move_methods AS (
+                            PARTITION BY pmm.identifier ORDER BY pm.level, pm.move_id
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                        )
+                    )
+                    WHERE number = 1
+
+                    -- NULLs first
+                    ORDER BY level, move_id
+                )
+            ),
+
+            'evolves_from', (
+                SELECT identifier FROM pokemon_species WHERE id = ps.evolves_from_species_id
+            ),
+            'evolves_to', (
+                SELECT json_group_array(json(evolution)) FROM (
+                    SELECT {EVOLUTION} AS evolution
+                    FROM pokemon_evolution AS pe
+                    {EVOLUTION_JOINS}
+                    WHERE evolved.evolves_from_species_id = ps.id
+                    AND evolved.id < 10000 -- ignore non-standard pokemon
+                    ORDER BY pe.id
+                )
+            ),
+
+            'base_experience', p.base_experience,
+            'height', p.height,
+            'weight', p.weight,
+            'gender_rate', ps.gender_rate,
+            'capture_rate', ps.capture_rate,
+            'base_happiness', ps.base_happiness,
+            'hatch_counter', ps.hatch_counter,
+            'egg_groups', (
+                SELECT json_group_array(egg_group) FROM (
+                    SELECT eg.identifier AS egg_group
+                    FROM pokemon_egg_groups AS peg
+                    JOIN egg_groups AS eg ON peg.egg_group_id = eg.id
+                    WHERE peg.species_id = ps.id
+                    ORDER BY peg.egg_group_id
+                )
+            ),
+            'is_baby', ps.is_baby,
+            'is_legendary', ps.is_legendary,
+            'is_mythical', ps.is_mythical,
+            'habitat', (SELECT identifier FROM pokemon_habitats WHERE id = ps.habitat_id),
+            'growth_rate', (SELECT identifier FROM growth_rates WHERE id = ps.growth_rate_id)
+        )
+        FROM pokemon AS p
+
+        JOIN pokemon_species AS ps
+        ON p.species_id = ps.id
+
+        -- The first pokemon of each species, like the basic info of generate()
+        WHERE p.id = (SELECT MIN(id) FROM pokemon WHERE species_id = p.species_id)
+        AND p.species_id < 10000 -- ignore non-standard pokemon
+        AND {filters.entities('p.species_id')}
+
+        ORDER BY p.id
+    ''')
+
+
+# An entry of evolves_to, which only has the conditions that apply. json_object()
+# keeps the NULLs so those members are removed after, by their path or by a path
+# that doesn't exist.
+EVOLUTION_MEMBERS = [
+    ('pokemon', 'evolved.identifier'),
+    ('trigger', 'et.identifier'),
+    ('minimum_level', "NULLIF(pe.minimum_level, '')"),
+    ('minimum_happiness', "NULLIF(pe.minimum_happiness, '')"),
+    ('minimum_affection', "NULLIF(pe.minimum_affection, '')"),
+    ('minimum_beauty', "NULLIF(pe.minimum_beauty, '')"),
+    ('time_of_day', "NULLIF(pe.time_of_day, '')"),
+    ('relative_physical_stats', "NULLIF(pe.relative_physical_stats, '')"),
+    ('during_overworld_rain', "IIF(pe.needs_overworld_rain = 1, json('true'), NULL)"),
+    ('hold_device_upside_down', "IIF(pe.turn_upside_down = 1, json('true'), NULL)"),
+    ('trigger_item', 'ti.identifier'),
+    ('held_item', 'hi.identifier'),
+    ('known_move', 'km.identifier'),
+    ('known_move_type', 'kt.identifier'),
+    ('gender', 'g.identifier'),
+    ('location', "IIF(l.identifier IS NULL, NULL, json_object('location', l.identifier, 'region', r.identifier))"),
+    ('pokemon_in_party', 'party_species.identifier'),
+    ('type_in_party', 'party_type.identifier'),
+    ('trade_for', 'trade_species.identifier'),
+]
+EVOLUTION = 'json_remove(json_object({}), {})'.format(
+    ', '.join(f"'{key}', {value}" for key, value in EVOLUTION_MEMBERS),
+    ', '.join(f"IIF({value} IS NULL, '$.{key}', '$.\"\"')" for key, value in EVOLUTION_MEMBERS[2:]),
+)
+EVOLUTION_JOINS = '''
+    JOIN pokemon_species AS evolved ON pe.evolved_species_id = evolved.id
+    JOIN evolution_triggers AS et ON pe.evolution_trigger_id = et.id
+    LEFT JOIN items AS ti ON pe.trigger_item_id = ti.id
+    LEFT JOIN items AS hi ON pe.held_item_id = hi.id
+    LEFT JOIN moves AS km ON pe.known_move_id = km.id
+    LEFT JOIN types AS kt ON pe.known_move_type_id = kt.id
+    LEFT JOIN genders AS g ON pe.gender_id = g.id
+    LEFT JOIN locations AS l ON pe.location_id = l.id
+    LEFT JOIN regions AS r ON l.region_id = r.id
+    LEFT JOIN pokemon_species AS party_species ON pe.party_species_id = party_species.id
+    LEFT JOIN types AS party_type ON pe.party_type_id = party_type.id
+    LEFT JOIN pokemon_species AS trade_species ON pe.trade_species_id = trade_species.id
+'''
 
 
 def clean_flavor_text(flavor_text):
     return flavor_text.replace('\n', ' ').replace('\x0c', ' ')
 
 
-main()
+if __name__ == '__main__':
+    main()
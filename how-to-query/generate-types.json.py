@@ -1,43 +1,65 @@
 #!/usr/bin/env python3
 
+import sys
 import u
 
 
+# The entities of the dataset, for --id and --generation
+ENTITY_TABLE = 'types'
+
+# The filters of the dataset (see FILTER_ARGS in u.py)
+FILTERS = ['--id', '--lang', '--generation']
+
+
 def main():
-    u.parse_args()
+    args = u.parse_args(args={**u.filter_args(FILTERS), **u.OUTPUT_ARGS})
 
     db = u.open_db()
+    filters = u.get_filters(db, args, ENTITY_TABLE)
+    u.write_dataset(generate(db, u.Dimensions(db), filters), sys.stdout.buffer, args)
 
+
+# Returns the dataset keyed by type identifier, export.py calls this directly
+def generate(db, dimensions, filters):
     data = {}
 
-    # Names
-    for row in db.execute('''
-        SELECT type_id, types.identifier, iso3166, name
+    # The types with a name, in any language as --lang only filters the names
+    for row in db.execute(f'''
+        SELECT id, identifier
         FROM types
-
-        JOIN type_names
-        ON types.id = type_names.type_id
-
-        JOIN languages
-        ON type_names.local_language_id = languages.id
-
-        WHERE type_id < 10000 -- ignore non-standard types
+        WHERE id < 10000 -- ignore non-standard types
+        AND {filters.entities('id')}
+        AND EXISTS (SELECT 1 FROM type_names WHERE type_id = types.id)
+        ORDER BY id
     '''):
-        datum = data.setdefault(row.type_id, {
+        data[row.id] = {
             'id': row.identifier,
             'name': {},
             'super_effective': [],
             'not_very_effective': [],
             'no_effect': [],
-        })
-        datum['name'][row.iso3166] = row.name
+        }
+
+    # Names
+    for row in db.execute(f'''
+        SELECT type_id, local_language_id, name
+        FROM type_names
+        WHERE {filters.entities('type_id')}
+        AND {filters.languages('local_language_id')}
+        ORDER BY type_id, local_language_id
+    '''):
+        if row.type_id in data:
+            data[row.type_id]['name'][dimensions.languages[row.local_language_id]] = row.name
 
     # Type efficacies
-    for row in db.execute('''
+    for row in db.execute(f'''
         SELECT damage_type_id, target_type_id, damage_factor
         FROM type_efficacy
+        WHERE {filters.entities('damage_type_id')}
+        ORDER BY damage_type_id, target_type_id
     '''):
-        target_type_id = data[row.target_type_id]['id']
+        # The target type isn't in the data if it's filtered out
+        target_type_id = dimensions.types[row.target_type_id]
         if row.damage_factor == 0:
             data[row.damage_type_id]['no_effect'].append(target_type_id)
         elif row.damage_factor == 50:
@@ -50,7 +72,8 @@ def main():
     for datum in data.values():
         del datum['id']
 
-    print(u.json_dumps(data))
+    return data
 
 
-main()
+if __name__ == '__main__':
+    main()
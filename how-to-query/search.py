@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import sys
+import u
+
+# The table with the names of each kind of entity and its id column
+NAMES = {
+    'pokemon_species': ('pokemon_species_names', 'pokemon_species_id'),
+    'move': ('move_names', 'move_id'),
+    'item': ('item_names', 'item_id'),
+    'ability': ('ability_names', 'ability_id'),
+}
+
+def main():
+    args = u.parse_args(
+        description='Full-text search over the names, flavor text and prose, needs a database built with "build.py --fts".',
+        args={
+            'text': {
+                'nargs': '+',
+                'help': 'The words to search for',
+            },
+            '--kind': {
+                'default': 'pokemon_species',
+                'choices': NAMES.keys(),
+                'help': 'The kind of entity to search for (default: pokemon_species)',
+            },
+            '--lang': {
+                'default': 'en',
+                'metavar': 'LANGUAGE',
+                'help': 'The language to search in, by identifier (default: en)',
+            },
+            '--limit': {
+                'type': int,
+                'default': 10,
+                'help': 'The maximum number of results (default: 10)',
+            },
+        }
+    )
+
+    db = u.open_db()
+    try:
+        results = u.search(db, ' '.join(args.text), args.kind, language=args.lang, limit=args.limit)
+    except ValueError as e:
+        u.error(e)
+        sys.exit(1)
+    except sqlite3.OperationalError as e:
+        u.error(f'Search failed: {e}')
+        u.info('Was the database built with "build.py --fts"?')
+        sys.exit(1)
+
+    table_name, id_column = NAMES[args.kind]
+    for entity_id, score in results:
+        name = db.execute(f'''
+            SELECT names.name
+            FROM "{table_name}" AS names
+                INNER JOIN languages ON languages.id = names.local_language_id
+            WHERE names."{id_column}" = ? AND languages.identifier = ?
+        ''', (entity_id, args.lang)).fetchone()
+        print(f'{entity_id:>6}  {name.name if name else "?":<30} {score:.2f}')
+
+main()
@@ -1,3 +1,5 @@
+import gzip
+import io
 import os
 import sqlite3
 import sys
@@ -9,14 +11,186 @@ sys.path.append(parent_dir)
 from utils import *
 
 def open_db():
-    pokeapi_sqlite = os.path.join(parent_dir, 'pokeapi.sqlite')
+    # Can be pointed at another database (eg. by the benchmarks) with an env var
+    pokeapi_sqlite = os.environ.get('POKEAPI_SQLITE', os.path.join(parent_dir, 'pokeapi.sqlite'))
 
     try:
         # Open the database in read-only mode and don't create it if it doesn't exist
         db = sqlite3.connect(f'file:{pokeapi_sqlite}?mode=ro', uri=True)
         db.row_factory = Row.row_factory
-        return db
     except sqlite3.OperationalError as e:
         error(f'Failed to open pokeapi.sqlite database: {e}')
         info('Did you forget to run "build.py"?')
         sys.exit(1)
+
+    missing_indexes = get_missing_indexes(db)
+    if missing_indexes:
+        warn(f'The pokeapi.sqlite database is missing {len(missing_indexes)} indexes, queries will be slow.')
+        info('Was it built with "build.py --no-indexes" or by an older version?')
+
+    missing_tables = get_missing_latest_tables(db)
+    if missing_tables:
+        error(f'The pokeapi.sqlite database is missing the {", ".join(missing_tables)} tables.')
+        info('Was it built by an older version of "build.py"?')
+        sys.exit(1)
+
+    # Multi-version databases (see "build.py --multi-version") show the latest
+    # version unless another one is selected
+    pokeapi_version = os.environ.get('POKEAPI_VERSION')
+    if pokeapi_version:
+        try:
+            select_version(db, pokeapi_version)
+        except (ValueError, sqlite3.OperationalError) as e:
+            error(f'Failed to select version {pokeapi_version}: {e}')
+            sys.exit(1)
+
+    return db
+
+
+# The lookups of ids the export scripts share, eg. the iso3166 code of every
+# language or the identifier of every type. They're built once per connection
+# (see export.py) rather than joined into every query of every script.
+class Dimensions:
+    def __init__(self, db):
+        self.languages = lookup(db, 'languages', 'iso3166')
+        self.types = lookup(db, 'types')
+        self.stats = lookup(db, 'stats')
+        self.moves = lookup(db, 'moves')
+
+
+# Returns a {id: value} dict of a column of a table
+def lookup(db, table_name, column='identifier'):
+    # Plain tuples whatever the row factory of the connection
+    cursor = db.cursor()
+    cursor.row_factory = None
+    return dict(cursor.execute(f'SELECT id, "{column}" FROM "{table_name}"'))
+
+
+# The output options of the generate-*.json.py scripts and export.py
+OUTPUT_ARGS = {
+    '--format': {
+        'default': 'pretty',
+        'choices': JSON_FORMATS,
+        'help': 'pretty: indented JSON (the default), minified: JSON without whitespace, ndjson: an entity per line with its key as "id"',
+    },
+    '--gzip': {
+        'action': 'store_true',
+        'help': 'Compress the output with gzip',
+    },
+}
+
+# Compression level 9 is ~5x slower than 6 for ~10% less
+GZIP_LEVEL = 6
+
+
+# Writes a dataset to a binary file (eg. sys.stdout.buffer) in the format of
+# the OUTPUT_ARGS, with json_dump or json_dump_encoded for a dataset that's
+# already JSON text. The gzip header has no file name or timestamp so the same
+# data always compresses to the same bytes.
+def write_dataset(data, file, args, dump=json_dump):
+    gzip_file = gzip.GzipFile(filename='', fileobj=file, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) if args.gzip else None
+    text = io.TextIOWrapper(gzip_file or file, encoding='utf8', newline='')
+    dump(data, text, args.format)
+    # Leaves the file itself open
+    text.flush()
+    text.detach()
+    if gzip_file:
+        gzip_file.close()
+
+
+# The file name of a dataset in the format of the OUTPUT_ARGS
+def dataset_file_name(dataset, args):
+    extension = 'ndjson' if args.format == 'ndjson' else 'json'
+    return f'{dataset}.{extension}.gz' if args.gzip else f'{dataset}.{extension}'
+
+
+# The filters of the generate-*.json.py scripts, see Filters
+FILTER_ARGS = {
+    '--id': {
+        'nargs': '+',
+        'metavar': 'IDENTIFIER',
+        'help': 'Only the entities with these identifiers, eg. pikachu',
+    },
+    '--lang': {
+        'nargs': '+',
+        'metavar': 'LANGUAGE',
+        'help': 'Only the names and texts in these languages, by identifier (eg. en) or by the iso3166 code used in the output (eg. us)',
+    },
+    '--generation': {
+        'type': int,
+        'metavar': 'N',
+        'help': 'Only the entities introduced in this generation',
+    },
+}
+
+
+# The FILTER_ARGS of the filters a script supports (its FILTERS)
+def filter_args(filters):
+    return {name: FILTER_ARGS[name] for name in filters}
+
+
+# The filters of FILTER_ARGS, resolved to the ids of the entities (of the
+# entity_table, eg. pokemon_species) and languages that match them. They're
+# compiled into the WHERE clauses of the queries so they only read the rows of
+# those, the ids are inlined as they're integers from the database. Raises a
+# ValueError for unknown identifiers and languages. The filters a script doesn't
+# support aren't in its args.
+class Filters:
+    def __init__(self, db, args, entity_table):
+        # Plain tuples whatever the row factory of the connection
+        cursor = db.cursor()
+        cursor.row_factory = None
+
+        entity_ids = None
+        identifiers = getattr(args, 'id', None)
+        generation = getattr(args, 'generation', None)
+        langs = getattr(args, 'lang', None)
+        if identifiers:
+            found = dict(cursor.execute(f'''
+                SELECT identifier, id FROM "{entity_table}"
+                WHERE identifier IN ({",".join("?" * len(identifiers))})
+            ''', identifiers))
+            unknown = [identifier for identifier in identifiers if identifier not in found]
+            if unknown:
+                raise ValueError(f'Unknown {entity_table} identifiers: {", ".join(unknown)}')
+            entity_ids = set(found.values())
+
+        if generation is not None:
+            if 'generation_id' not in [column[1] for column in cursor.execute(f'PRAGMA table_info("{entity_table}")')]:
+                raise ValueError(f'The {entity_table} can\'t be filtered by generation')
+            ids = {row[0] for row in cursor.execute(f'SELECT id FROM "{entity_table}" WHERE generation_id = ?', (generation,))}
+            entity_ids = ids if entity_ids is None else entity_ids & ids
+
+        language_ids = None
+        if langs:
+            languages = cursor.execute('SELECT id, identifier, iso3166 FROM languages').fetchall()
+            unknown = [lang for lang in langs if not any(lang in (identifier, iso3166) for _, identifier, iso3166 in languages)]
+            if unknown:
+                raise ValueError(f'Unknown languages: {", ".join(unknown)}')
+            language_ids = {language_id for language_id, identifier, iso3166 in languages if identifier in langs or iso3166 in langs}
+
+        self.entity_ids = None if entity_ids is None else sorted(entity_ids)
+        self.language_ids = None if language_ids is None else sorted(language_ids)
+
+    # The SQL conditions on a column holding entity or language ids, true if
+    # there's nothing to filter by
+    def entities(self, column):
+        return sql_in(column, self.entity_ids)
+
+    def languages(self, column):
+        return sql_in(column, self.language_ids)
+
+
+def sql_in(column, ids):
+    if ids is None:
+        return '1'
+    return f'{column} IN ({",".join(map(str, ids))})'
+
+
+# The filters of a script, exits if they can't be resolved
+def get_filters(db, args, entity_table):
+    try:
+        return Filters(db, args, entity_table)
+    except ValueError as e:
+        error(e)
+        sys.exit(1)
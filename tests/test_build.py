@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+spec = importlib.util.spec_from_file_location('build', os.path.join(parent_dir, 'build.py'))
+build = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(build)
+
+
+class ReadTableTest(unittest.TestCase):
+    def write_csv(self, text):
+        f = tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf8', delete=False)
+        self.addCleanup(os.remove, f.name)
+        with f:
+            f.write(text)
+        return f.name
+
+    def test_empty_file(self):
+        file = self.write_csv('')
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                with self.assertRaisesRegex(ValueError, 'empty'):
+                    build.read_table(('empty', file), stream=stream)
+
+    # Raises rather than ending the map() of the import loop early
+    def test_empty_file_in_map(self):
+        files = [('empty', self.write_csv('')), ('abilities', self.write_csv('id,identifier\n1,stench\n'))]
+        with self.assertRaises(ValueError):
+            list(map(build.read_table, files))
+
+    def test_header_only(self):
+        file = self.write_csv('id,identifier\n')
+        table_name, schema, rows, links, _ = build.read_table(('abilities', file))
+        self.assertEqual(table_name, 'abilities')
+        self.assertEqual(schema.names, ['id', 'identifier'])
+        self.assertEqual(list(rows), [])
+        self.assertEqual(links, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
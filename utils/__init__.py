@@ -1,5 +1,13 @@
 from .args import parse_args
 from .db import Row
+from .dictionary import decode_tables, encode_tables
+from .fts import create_fts_tables, drop_fts_tables, search
 from .grid import Grid
-from .json import json_dumps
+from .indexes import get_indexes, get_missing_indexes, get_primary_key
+from .json import JSON_FORMATS, json_dump, json_dump_encoded, json_dumps
+from .latest import create_latest_tables, get_missing_latest_tables
 from .log import Color, info, warn, error
+from .patch import create_patch, apply_patch
+from .schema import Column, Schema, infer_schema
+from .timings import Timings, get_peak_rss
+from .versions import merge_versions, select_version
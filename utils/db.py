@@ -1,12 +1,53 @@
 # Custom sqlite row factory that allows accessing columns by name or index
+#
+# Rather than every row mapping its column names to indexes, a record class (a
+# subclass of Row) is created once per distinct set of columns and cached. It
+# has a property per column, so the rows themselves only hold their values.
 class Row:
+    __slots__ = ('_values',)
+
+    # Column name -> index, set on the record classes. The indexes are only
+    # needed by __iter__ when there are duplicate names, otherwise the fields
+    # are in the same order as the values.
+    _fields = {}
+    _indexes = None
+
+    # The record classes by column names, and the last cursor description seen
+    # with its class as the rows of a query all come from the same cursor
+    _classes = {}
+    _last = (None, None)
+
     @staticmethod
     def row_factory(cursor, row):
-        return Row(cursor, row)
+        description = cursor.description
+        last_description, cls = Row._last
+        if description is not last_description:
+            cls = Row.record_class(tuple(column[0] for column in description))
+            Row._last = (description, cls)
+        # Without going through __init__, as this is called for every row
+        row_object = new_row(cls)
+        set_values(row_object, row)
+        return row_object
+
+    @staticmethod
+    def record_class(names):
+        cls = Row._classes.get(names)
+        if cls is None:
+            # Duplicate column names resolve to the last one
+            fields = { name: i for i, name in enumerate(names) }
+            namespace = { '__slots__': (), '_fields': fields }
+            if len(fields) != len(names):
+                namespace['_indexes'] = tuple(fields.values())
+            for name, index in fields.items():
+                # Names that aren't identifiers (eg. COUNT(*)) or that clash
+                # with the attributes of Row go through __getattr__
+                if name.isidentifier() and not hasattr(Row, name):
+                    namespace[name] = column_property(index)
+            cls = Row._classes[names] = type('Row', (Row,), namespace)
+        return cls
 
-    def __init__(self, cursor, row):
-        self._fields = { column[0]: i for i, column in enumerate(cursor.description) }
-        self._values = row
+    def __init__(self, values):
+        self._values = values
 
     def __getitem__(self, key):
         return self._values[key]
@@ -19,10 +60,20 @@ class Row:
     def __len__(self):
         return len(self._values)
 
+    # (field, value) pairs, so dict(row) works
     def __iter__(self):
-        for field, index in self._fields.items():
-            yield field, self._values[index]
+        if self._indexes is None:
+            return zip(self._fields, self._values)
+        return zip(self._fields, map(self._values.__getitem__, self._indexes))
 
     def __repr__(self):
         inner = (", ".join(f"{field}={value!r}" for field, value in self))
         return f'Row({inner})'
+
+
+new_row = object.__new__
+set_values = Row._values.__set__
+
+
+def column_property(index):
+    return property(lambda row: row._values[index])
@@ -0,0 +1,173 @@
+from .patch import has_rowid_column, is_without_rowid
+
+
+# Dictionary encoding of the TEXT columns that repeat the same values a lot (eg.
+# the flavor text of every version group), see build.py --dictionary.
+#
+# The values of the encoded columns are stored once in the shared __strings
+# table and the table itself is moved to __encoded_<table>, with the ids of the
+# strings in place of the text. The table is replaced by a view that joins the
+# strings back in, so it has the same name and columns as before and queries
+# don't have to know about the encoding. Rowids are kept as they are, the
+# indexes are moved over to the __encoded_<table> table.
+#
+# The original CREATE TABLE statements are kept in __encoded_tables, so the
+# tables can be decoded again before they're updated (see decode_tables).
+STRINGS_TABLE = '__strings'
+ENCODED_TABLES = '__encoded_tables'
+
+# A column is encoded if that saves at least this share of the bytes of its
+# values, and at least DICTIONARY_MIN_BYTES. The savings are estimated as the
+# bytes of the values minus those of the distinct values (stored once in
+# __strings) and of an id per value (up to 3 bytes for less than 8M strings).
+DICTIONARY_MIN_SAVINGS = 0.5
+DICTIONARY_MIN_BYTES = 4096
+ID_SIZE = 3
+
+
+def encoded_table(table_name):
+    return f'__encoded_{table_name}'
+
+
+# Returns the encoded tables as a {table_name: (sql, encoded_columns)} dict
+def get_encoded_tables(db):
+    if not db.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (ENCODED_TABLES,)).fetchone():
+        return {}
+    return {
+        table_name: (sql, columns.split(','))
+        for table_name, sql, columns in db.execute(f'SELECT table_name, sql, columns FROM {ENCODED_TABLES} ORDER BY table_name')
+    }
+
+
+# Returns the TEXT columns of the table that are worth encoding
+def get_dictionary_columns(db, table_name):
+    columns = []
+    for column in db.execute(f'PRAGMA table_info("{table_name}")').fetchall():
+        if column[2] != 'TEXT':
+            continue
+        (size, count) = db.execute(f'''
+            SELECT TOTAL(LENGTH(CAST("{column[1]}" AS BLOB))), COUNT("{column[1]}") FROM "{table_name}"
+        ''').fetchone()
+        (distinct_size,) = db.execute(f'''
+            SELECT TOTAL(LENGTH(CAST(value AS BLOB))) FROM (SELECT DISTINCT "{column[1]}" AS value FROM "{table_name}")
+        ''').fetchone()
+        savings = size - distinct_size - count * ID_SIZE
+        if savings >= DICTIONARY_MIN_BYTES and savings >= size * DICTIONARY_MIN_SAVINGS:
+            columns.append(column[1])
+    return columns
+
+
+# The SELECT of the decoded rows of an encoded table, with the rowid first if
+# the table has a rowid of its own
+def get_decoded_select(db, table_name, encoded_columns, with_rowid=False):
+    storage = encoded_table(table_name)
+    columns = []
+    joins = []
+    for column in db.execute(f'PRAGMA table_info("{storage}")').fetchall():
+        name, not_null = column[1], column[3]
+        if name not in encoded_columns:
+            columns.append(f'encoded."{name}"')
+            continue
+        alias = f's{len(joins)}'
+        columns.append(f'{alias}.value AS "{name}"')
+        join = 'JOIN' if not_null else 'LEFT JOIN'
+        joins.append(f'{join} {STRINGS_TABLE} AS {alias} ON {alias}.id = encoded."{name}"')
+    if with_rowid:
+        columns.insert(0, 'encoded.rowid')
+    return f'SELECT {", ".join(columns)} FROM "{storage}" AS encoded {" ".join(joins)}'
+
+
+# Whether the rowids of the table have to be copied over explicitly, ie. it's
+# a rowid table without an INTEGER PRIMARY KEY column
+def has_implicit_rowid(db, table_name):
+    return not (has_rowid_column(db, table_name) or is_without_rowid(db, table_name))
+
+
+# Encodes the columns of all the (non-internal) tables that are worth it, into
+# a new __strings table. The strings are numbered in the order they're first
+# seen so the same tables always encode the same way. Returns the (table_name,
+# columns) of every encoded table.
+def encode_tables(db):
+    if get_encoded_tables(db):
+        raise ValueError('The database is already dictionary encoded')
+
+    tables = [row[0] for row in db.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table'
+        AND name NOT LIKE '\\_\\_%' ESCAPE '\\' -- internal tables like __metadata
+        AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'
+        ORDER BY name
+    ''').fetchall()]
+    encoded = [(table_name, get_dictionary_columns(db, table_name)) for table_name in tables]
+    encoded = [(table_name, columns) for table_name, columns in encoded if columns]
+    if not encoded:
+        return []
+
+    db.execute(f'CREATE TABLE {STRINGS_TABLE} (id INTEGER PRIMARY KEY, value TEXT NOT NULL)')
+    db.execute(f'CREATE TABLE {ENCODED_TABLES} (table_name TEXT PRIMARY KEY, sql TEXT NOT NULL, columns TEXT NOT NULL)')
+
+    strings = {}
+    for table_name, columns in encoded:
+        storage = encoded_table(table_name)
+        (sql,) = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+        indexes = [row[0] for row in db.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table_name,))]
+        column_names = [column[1] for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+        positions = [column_names.index(column) for column in columns]
+
+        # The SQL is the one generated by utils/schema.py, so the encoded
+        # columns can be found by their definition
+        storage_sql = sql.replace(f'"{table_name}"', f'"{storage}"', 1)
+        for column in columns:
+            storage_sql = storage_sql.replace(f'"{column}" TEXT', f'"{column}" INTEGER', 1)
+        db.execute(storage_sql)
+
+        # The rowids are copied over as __text_links refers to rows by rowid
+        row_columns = [f'"{column}"' for column in column_names]
+        if has_implicit_rowid(db, table_name):
+            row_columns.insert(0, 'rowid')
+            positions = [position + 1 for position in positions]
+
+        def encode_rows():
+            for row in db.execute(f'SELECT {",".join(row_columns)} FROM "{table_name}"'):
+                row = list(row)
+                for position in positions:
+                    if row[position] is not None:
+                        row[position] = strings.setdefault(row[position], len(strings) + 1)
+                yield row
+
+        db.executemany(f'INSERT INTO "{storage}" ({",".join(row_columns)}) VALUES ({",".join("?" * len(row_columns))})', encode_rows())
+
+        db.execute(f'DROP TABLE "{table_name}"')
+        for index_sql in indexes:
+            db.execute(index_sql.replace(f'ON "{table_name}"', f'ON "{storage}"', 1))
+        db.execute(f'CREATE VIEW "{table_name}" AS {get_decoded_select(db, table_name, columns)}')
+        db.execute(f'INSERT INTO {ENCODED_TABLES} VALUES (?, ?, ?)', (table_name, sql, ','.join(columns)))
+
+    db.executemany(f'INSERT INTO {STRINGS_TABLE} VALUES (?, ?)', ((string_id, value) for value, string_id in strings.items()))
+    return encoded
+
+
+# Turns the encoded tables back into plain tables and drops the __strings table,
+# the opposite of encode_tables. Does nothing if nothing's encoded.
+def decode_tables(db):
+    encoded = get_encoded_tables(db)
+    for table_name, (sql, columns) in encoded.items():
+        storage = encoded_table(table_name)
+        indexes = [row[0] for row in db.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (storage,))]
+        implicit_rowid = has_implicit_rowid(db, storage)
+        select = get_decoded_select(db, table_name, columns, with_rowid=implicit_rowid)
+
+        db.execute(f'DROP VIEW "{table_name}"')
+        db.execute(sql)
+        if implicit_rowid:
+            column_names = [f'"{column[1]}"' for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+            db.execute(f'INSERT INTO "{table_name}" (rowid, {",".join(column_names)}) {select}')
+        else:
+            db.execute(f'INSERT INTO "{table_name}" {select}')
+        db.execute(f'DROP TABLE "{storage}"')
+        for index_sql in indexes:
+            db.execute(index_sql.replace(f'ON "{storage}"', f'ON "{table_name}"', 1))
+
+    db.execute(f'DROP TABLE IF EXISTS {STRINGS_TABLE}')
+    db.execute(f'DROP TABLE IF EXISTS {ENCODED_TABLES}')
+    return list(encoded)
@@ -0,0 +1,160 @@
+import sqlite3
+
+
+# Full-text search over the names, flavor text and prose (see build.py --fts).
+#
+# There is one FTS5 table per tokenizer, each holding the text of the languages
+# that use it. Every row is a single text of an entity (eg. the English name of
+# a move), in either the name or the text column so names can be ranked above
+# flavor text and prose.
+TOKENIZERS = {
+    # Stemmed, so "burns" finds "burn"
+    'porter': 'porter unicode61 remove_diacritics 2',
+    # Japanese and Chinese aren't split on spaces, so they're matched by
+    # substring instead (queries need at least 3 characters)
+    'trigram': 'trigram',
+    'unicode61': 'unicode61 remove_diacritics 2',
+}
+
+# The tokenizer used for each language (by identifier), the rest use unicode61
+LANGUAGE_TOKENIZERS = {
+    'en': 'porter',
+    'ja-Hrkt': 'trigram',
+    'ja': 'trigram',
+    'zh-Hant': 'trigram',
+    'zh-Hans': 'trigram',
+}
+
+# The texts of each kind of entity, as (kind, column, query) where the query
+# returns the entity_id, language_id and text. Flavor text repeats a lot across
+# versions so only the distinct texts are indexed.
+FTS_SOURCES = [
+    ('pokemon_species', 'name', 'SELECT pokemon_species_id AS entity_id, local_language_id AS language_id, name AS text FROM pokemon_species_names'),
+    ('pokemon_species', 'text', 'SELECT pokemon_species_id AS entity_id, local_language_id AS language_id, genus AS text FROM pokemon_species_names'),
+    ('pokemon_species', 'text', 'SELECT DISTINCT species_id AS entity_id, language_id, flavor_text AS text FROM pokemon_species_flavor_text'),
+    ('move', 'name', 'SELECT move_id AS entity_id, local_language_id AS language_id, name AS text FROM move_names'),
+    ('move', 'text', 'SELECT DISTINCT move_id AS entity_id, language_id, flavor_text AS text FROM move_flavor_text'),
+    ('move', 'text', '''
+        SELECT moves.id AS entity_id, local_language_id AS language_id, short_effect || ' ' || effect AS text
+        FROM moves INNER JOIN move_effect_prose ON move_effect_prose.move_effect_id = moves.effect_id
+    '''),
+    ('item', 'name', 'SELECT item_id AS entity_id, local_language_id AS language_id, name AS text FROM item_names'),
+    ('item', 'text', 'SELECT DISTINCT item_id AS entity_id, language_id, flavor_text AS text FROM item_flavor_text'),
+    ('item', 'text', "SELECT item_id AS entity_id, local_language_id AS language_id, short_effect || ' ' || effect AS text FROM item_prose"),
+    ('ability', 'name', 'SELECT ability_id AS entity_id, local_language_id AS language_id, name AS text FROM ability_names'),
+    ('ability', 'text', 'SELECT DISTINCT ability_id AS entity_id, language_id, flavor_text AS text FROM ability_flavor_text'),
+    ('ability', 'text', "SELECT ability_id AS entity_id, local_language_id AS language_id, short_effect || ' ' || effect AS text FROM ability_prose"),
+]
+
+# How much more a match in a name counts than one in the text, for bm25()
+NAME_WEIGHT = 10.0
+
+
+# The FTS tables and their shadow tables are rebuilt rather than copied by
+# patches and multi-version databases
+FTS_PREFIX = '__fts_'
+
+
+def fts_table(tokenizer):
+    return f'{FTS_PREFIX}{tokenizer}'
+
+
+def has_fts_tables(db):
+    return any(
+        db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts_table(tokenizer),)).fetchone()
+        for tokenizer in TOKENIZERS
+    )
+
+
+def get_tokenizer(language):
+    return LANGUAGE_TOKENIZERS.get(language, 'unicode61')
+
+
+def drop_fts_tables(db):
+    for tokenizer in TOKENIZERS:
+        db.execute(f'DROP TABLE IF EXISTS "{fts_table(tokenizer)}"')
+
+
+# (Re)creates the FTS tables from the imported tables, sources whose tables
+# don't exist (eg. in older versions of PokeAPI) are skipped. Returns the
+# number of texts indexed per kind.
+def create_fts_tables(db):
+    drop_fts_tables(db)
+
+    languages = {}
+    for language_id, identifier in db.execute('SELECT id, identifier FROM languages'):
+        languages.setdefault(get_tokenizer(identifier), []).append(language_id)
+
+    counts = {}
+    for tokenizer, language_ids in languages.items():
+        table = fts_table(tokenizer)
+        db.execute(f'''
+            CREATE VIRTUAL TABLE "{table}" USING fts5(
+                name, text,
+                kind UNINDEXED, entity_id UNINDEXED, language_id UNINDEXED,
+                tokenize = '{TOKENIZERS[tokenizer]}'
+            )
+        ''')
+        for kind, column, sql in FTS_SOURCES:
+            try:
+                cursor = db.execute(f'''
+                    INSERT INTO "{table}" ({column}, kind, entity_id, language_id)
+                    SELECT text, ?, entity_id, language_id FROM ({sql})
+                    WHERE language_id IN ({",".join("?" * len(language_ids))}) AND text != ''
+                ''', (kind, *language_ids))
+            except sqlite3.OperationalError as e:
+                if not str(e).startswith(('no such table', 'no such column')):
+                    raise
+                continue
+            counts[kind] = counts.get(kind, 0) + cursor.rowcount
+
+        # Merges the b-trees built up by the inserts into one
+        db.execute(f'''INSERT INTO "{table}" ("{table}") VALUES ('optimize')''')
+
+    return counts
+
+
+# Turns plain text into an FTS5 query that matches all of its words, the last
+# one as a prefix so partially typed words match too. With trigrams the whole
+# text is matched as a substring instead.
+def to_fts_query(text, tokenizer):
+    words = text.split()
+    if tokenizer == 'trigram':
+        words = [' '.join(words)] if words else []
+    words = [f'''"{word.replace('"', '""')}"''' for word in words]
+    if words and tokenizer != 'trigram':
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+# Searches the names and texts of one kind of entity (pokemon_species, move,
+# item or ability) in a language (by identifier), returns the (entity_id,
+# score) of the best matches, best first. The score is the bm25() of the best
+# matching text of the entity, lower is better.
+def search(db, text, kind, language='en', limit=20):
+    # Plain tuples whatever the row factory of the connection
+    cursor = db.cursor()
+    cursor.row_factory = None
+
+    row = cursor.execute('SELECT id FROM languages WHERE identifier = ?', (language,)).fetchone()
+    if row is None:
+        raise ValueError(f'Unknown language: {language}')
+    tokenizer = get_tokenizer(language)
+    table = fts_table(tokenizer)
+    query = to_fts_query(text, tokenizer)
+    if not query:
+        return []
+
+    # bm25() can't be used in an aggregate, so the matches are materialized first
+    return cursor.execute(f'''
+        WITH matches AS MATERIALIZED (
+            SELECT entity_id, bm25("{table}", ?, 1.0) AS score
+            FROM "{table}"
+            WHERE "{table}" MATCH ? AND kind = ? AND language_id = ?
+        )
+        SELECT entity_id, MIN(score) AS score
+        FROM matches
+        GROUP BY entity_id
+        ORDER BY score, entity_id
+        LIMIT ?
+    ''', (NAME_WEIGHT, query, kind, row[0], limit)).fetchall()
@@ -0,0 +1,100 @@
+# Secondary indexes created by build.py
+#
+# Every *_id column gets an index of its own (other than the LOOKUP_COLUMNS), on
+# top of that these composite indexes cover the common access patterns of the
+# how-to-query scripts. A single column index is skipped if the column already
+# leads one of these.
+COMPOSITE_INDEXES = {
+    'pokemon_moves': [('pokemon_id', 'version_group_id')],
+    'pokemon_types': [('pokemon_id', 'slot')],
+    'pokemon_abilities': [('pokemon_id', 'slot')],
+    'pokemon_species_flavor_text': [('species_id', 'language_id', 'version_id')],
+    'move_flavor_text': [('move_id', 'language_id', 'version_group_id')],
+    'item_flavor_text': [('item_id', 'language_id', 'version_group_id')],
+    'ability_flavor_text': [('ability_id', 'language_id', 'version_group_id')],
+}
+
+# The *_id columns of small lookup tables (a few dozen versions, ...) don't get
+# an index of their own. The queries only read their rows through the key of
+# the entity they belong to and each value matches too many rows for an index to
+# beat a scan, while the indexes of the biggest tables (eg. pokemon_moves) would
+# take up as much space as the tables themselves. The language columns are kept
+# indexed, --lang filters the *_names, *_prose and *_flavor_text tables by them.
+LOOKUP_COLUMNS = {
+    'version_id',
+    'version_group_id',
+    'pokemon_move_method_id',
+    'stat_id',
+}
+
+# Covering indexes for the lookups of a single pokedex entry, used by the range
+# requests layout (see build.py --range-requests). These hold every column the
+# lookup needs so remote readers don't have to fetch the table pages at all.
+# They replace the composite/single column indexes they start with.
+COVERING_INDEXES = {
+    'pokemon_species_names': [('pokemon_species_id', 'local_language_id', 'name', 'genus')],
+    'pokemon_types': [('pokemon_id', 'slot', 'type_id')],
+    'pokemon_abilities': [('pokemon_id', 'slot', 'ability_id', 'is_hidden')],
+    'pokemon_stats': [('pokemon_id', 'stat_id', 'base_stat', 'effort')],
+    'pokemon_egg_groups': [('species_id', 'egg_group_id')],
+    'type_names': [('type_id', 'local_language_id', 'name')],
+    'ability_names': [('ability_id', 'local_language_id', 'name')],
+    'move_names': [('move_id', 'local_language_id', 'name')],
+    'item_names': [('item_id', 'local_language_id', 'name')],
+}
+
+
+def index_name(table_name, columns):
+    return f'{table_name}__{"__".join(columns)}'
+
+
+# Returns the columns of the primary key of a table, in key order
+def get_primary_key(db, table_name):
+    columns = [(column[5], column[1]) for column in db.execute(f'PRAGMA table_info("{table_name}")') if column[5]]
+    return [name for _, name in sorted(columns)]
+
+
+# Returns a list of (index_name, columns) tuples for the given table. Indexes
+# that start with the first column of the primary key are left out, as the
+# table itself is ordered by it (the rowid or the key of a WITHOUT ROWID table).
+def get_indexes(table_name, column_names, covering=False, primary_key=None):
+    indexes = [
+        columns for columns in COMPOSITE_INDEXES.get(table_name, [])
+        if all(column in column_names for column in columns)
+    ]
+    if covering:
+        covering_indexes = [
+            columns for columns in COVERING_INDEXES.get(table_name, [])
+            if all(column in column_names for column in columns)
+        ]
+        indexes = [
+            columns for columns in indexes
+            if not any(other[:len(columns)] == columns for other in covering_indexes)
+        ] + covering_indexes
+    leading_columns = {columns[0] for columns in indexes}
+    for column in column_names:
+        if column.endswith('_id') and column not in leading_columns and column not in LOOKUP_COLUMNS:
+            indexes.append((column,))
+    if primary_key:
+        indexes = [columns for columns in indexes if columns[0] != primary_key[0]]
+    return [(index_name(table_name, columns), columns) for columns in indexes]
+
+
+# Returns the names of the indexes that should exist in the database but don't,
+# an index is also there if a covering index starts with the same columns
+def get_missing_indexes(db):
+    tables = [row[0] for row in db.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table'
+        AND name NOT LIKE '\\_\\_%' ESCAPE '\\' -- internal tables like __metadata
+        AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'
+    ''')]
+    existing = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    missing = []
+    for table_name in tables:
+        column_names = [column[1] for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+        for name, _ in get_indexes(table_name, column_names, primary_key=get_primary_key(db, table_name)):
+            if name not in existing and not any(other.startswith(name + '__') for other in existing):
+                missing.append(name)
+    return missing
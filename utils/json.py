@@ -13,3 +13,110 @@ class JSONEncoder(json.JSONEncoder):
 
 def json_dumps(obj, **kwargs):
     return json.dumps(obj, cls=JSONEncoder, indent=4, ensure_ascii=False, **kwargs)
+
+
+# The formats of json_dump: indented (the same as json_dumps), without any
+# whitespace, or newline delimited with an entry per line
+JSON_FORMATS = ['pretty', 'minified', 'ndjson']
+
+
+# Writes the JSON of a dict (or list) to a file one entry at a time, so only the
+# text of a single entry (eg. a pokemon) is in memory rather than the whole
+# document and the pieces it's joined from. The dict itself is still in memory
+# as a whole, see json_dump_encoded for entries that are streamed. With ndjson
+# the entries of a dict are written as objects with their key as "id". Ends with
+# a newline.
+def json_dump(obj, file, format='pretty'):
+    if isinstance(obj, Row):
+        obj = dict(obj)
+
+    if format == 'ndjson':
+        encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+        if isinstance(obj, dict):
+            lines = (ndjson_entry(key, value) for key, value in obj.items())
+        elif isinstance(obj, (list, tuple)):
+            lines = obj
+        else:
+            lines = [obj]
+        for line in lines:
+            file.write(encoder.encode(line))
+            file.write('\n')
+        return
+
+    # An entry on its own is encoded as "{<entry>}" or "{\n    <entry>\n}",
+    # the latter with the same indent as in the whole document
+    if format == 'minified':
+        encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+        strip, first, separator, last = 1, '', ',', ''
+    else:
+        encoder = JSONEncoder(indent=4, ensure_ascii=False)
+        strip, first, separator, last = 2, '\n', ',\n', '\n'
+
+    if isinstance(obj, dict):
+        entries, brackets = ({key: value} for key, value in obj.items()), '{}'
+    elif isinstance(obj, (list, tuple)):
+        entries, brackets = ([value] for value in obj), '[]'
+    else:
+        file.write(encoder.encode(obj))
+        file.write('\n')
+        return
+
+    file.write(brackets[0])
+    empty = True
+    for entry in entries:
+        file.write(first if empty else separator)
+        file.write(encoder.encode(entry)[strip:-strip])
+        empty = False
+    if not empty:
+        file.write(last)
+    file.write(brackets[1])
+    file.write('\n')
+
+
+# Writes the JSON of a dict given as (key, value) pairs whose values are already
+# encoded as minified JSON text (eg. by SQLite's JSON functions), the same as
+# json_dump would of the dict with the values decoded. The text is written as is
+# other than for the pretty format, which decodes it again to indent it. The
+# entries can be a cursor, so only a single entry is in memory at a time.
+def json_dump_encoded(entries, file, format='pretty'):
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    if format == 'ndjson':
+        for key, value in entries:
+            # The same as ndjson_entry, an object gets the "id" as its first member
+            if value == '{}':
+                file.write(f'{{"id":{encoder.encode(key)}}}')
+            elif value.startswith('{'):
+                file.write(f'{{"id":{encoder.encode(key)},{value[1:]}')
+            else:
+                file.write(f'{{"id":{encoder.encode(key)},"value":{value}}}')
+            file.write('\n')
+        return
+
+    if format == 'minified':
+        first, separator, last = '', ',', ''
+    else:
+        pretty_encoder = JSONEncoder(indent=4, ensure_ascii=False)
+        first, separator, last = '\n', ',\n', '\n'
+
+    file.write('{')
+    empty = True
+    for key, value in entries:
+        file.write(first if empty else separator)
+        if format == 'minified':
+            file.write(f'{encoder.encode(key)}:{value}')
+        else:
+            file.write(pretty_encoder.encode({key: json.loads(value)})[2:-2])
+        empty = False
+    if not empty:
+        file.write(last)
+    file.write('}')
+    file.write('\n')
+
+
+def ndjson_entry(key, value):
+    if isinstance(value, Row):
+        value = dict(value)
+    if isinstance(value, dict):
+        return { 'id': key, **value }
+    return { 'id': key, 'value': value }
@@ -0,0 +1,69 @@
+from .patch import is_without_rowid
+
+
+# Tables of the latest version of the per-version tables, built by build.py so
+# the how-to-query scripts don't have to find the latest rows with self joins or
+# GROUP BY subqueries on every run.
+#
+# Each latest table has the same schema as its source table and holds the rows
+# whose version column is the highest within their key, eg. the latest flavor
+# text of every (move, language) or the moveset of every pokemon in the latest
+# version group it has moves in. The rows are in the same order as the source.
+LATEST_TABLES = {
+    # latest table: (source table, key columns, version column)
+    'latest_pokemon_species_flavor_text': ('pokemon_species_flavor_text', ('species_id', 'language_id'), 'version_id'),
+    'latest_move_flavor_text': ('move_flavor_text', ('move_id', 'language_id'), 'version_group_id'),
+    'latest_item_flavor_text': ('item_flavor_text', ('item_id', 'language_id'), 'version_group_id'),
+    'latest_ability_flavor_text': ('ability_flavor_text', ('ability_id', 'language_id'), 'version_group_id'),
+    'latest_pokemon_moves': ('pokemon_moves', ('pokemon_id',), 'version_group_id'),
+}
+
+
+def get_table_sql(db, table_name):
+    row = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+    return row[0] if row else None
+
+
+# Tables may also be views, see utils/dictionary.py
+def has_table(db, table_name):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (table_name,)).fetchone() is not None
+
+
+# (Re)creates the latest tables whose source table exists (and drops the others),
+# returns the (table_name, column_names, row_count) of each created table
+def create_latest_tables(db):
+    created = []
+    for table_name, (source, keys, version) in LATEST_TABLES.items():
+        db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        sql = get_table_sql(db, source)
+        if sql is None:
+            continue
+
+        db.execute(sql.replace(f'"{source}"', f'"{table_name}"', 1))
+        key_columns = ','.join(f'"{key}"' for key in keys)
+        join = ' AND '.join(f'source."{key}" = latest."{key}"' for key in keys)
+        # WITHOUT ROWID tables are kept in the order of their key anyway
+        order = '' if is_without_rowid(db, source) else 'ORDER BY source.rowid'
+        cursor = db.execute(f'''
+            INSERT INTO "{table_name}"
+            SELECT source.* FROM "{source}" AS source
+            JOIN (
+                SELECT {key_columns}, MAX("{version}") AS "{version}"
+                FROM "{source}"
+                GROUP BY {key_columns}
+            ) AS latest
+            ON {join} AND source."{version}" = latest."{version}"
+            {order}
+        ''')
+        column_names = [column[1] for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+        created.append((table_name, column_names, cursor.rowcount))
+    return created
+
+
+# Returns the names of the latest tables that should exist in the database (as
+# their source table does) but don't
+def get_missing_latest_tables(db):
+    return [
+        table_name for table_name, (source, _, _) in LATEST_TABLES.items()
+        if has_table(db, source) and not has_table(db, table_name)
+    ]
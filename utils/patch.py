@@ -0,0 +1,357 @@
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+
+from .fts import FTS_PREFIX, create_fts_tables, drop_fts_tables, has_fts_tables
+from .indexes import get_primary_key
+
+
+# Row level patches between two builds of pokeapi.sqlite (see build.py --base
+# and apply-patch.py).
+#
+# A patch is itself a SQLite file. It holds the schema changes and, for every
+# changed table, the rows that were inserted, updated or deleted. Tables with an
+# INTEGER PRIMARY KEY or a composite key (WITHOUT ROWID) are diffed by that key.
+# The other tables are diffed by the full contents of their rows, and the rows
+# which only changed position are recorded as runs of moved rowids. So a patched
+# file ends up with the same rowids as a fresh build, which matters as
+# __text_links refers to rows by rowid. The moves carry over to the row_id of
+# the links (when creating and applying the patch), so a row inserted in the
+# middle of a table doesn't show up as a change of every link after it.
+# The full-text search tables aren't diffed, they're rebuilt from the patched
+# tables instead. Views (eg. of the dictionary encoded tables) aren't diffed
+# either, the patch holds all the views of the new database and replaces them.
+PATCH_SCHEMA = [
+    'CREATE TABLE __metadata (key TEXT PRIMARY KEY, value TEXT)',
+    # action is one of create, replace (the schema changed), update or drop
+    'CREATE TABLE __patch_tables (table_name TEXT PRIMARY KEY, action TEXT NOT NULL, sql TEXT, base_rows INTEGER, rows INTEGER)',
+    # sql is NULL for dropped indexes
+    'CREATE TABLE __patch_indexes (index_name TEXT PRIMARY KEY, table_name TEXT NOT NULL, sql TEXT)',
+    # op is one of delete, move (count rowids starting at row_id moved to
+    # new_row_id), update or insert, data is the JSON array of the column values.
+    # WITHOUT ROWID tables have no row_id, their deletes have the key as data.
+    'CREATE TABLE __patch_rows (table_name TEXT NOT NULL, op TEXT NOT NULL, row_id INTEGER, new_row_id INTEGER, count INTEGER, data TEXT)',
+    'CREATE TABLE __patch_views (view_name TEXT PRIMARY KEY, sql TEXT NOT NULL)',
+]
+
+# The order the row operations have to be applied in, deletes free up the rowids
+# the moves and inserts need
+OPS = ['delete', 'move', 'update', 'insert']
+
+
+def get_schema(db):
+    tables = dict(db.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' AND NOT name GLOB ?
+    ''', (f'{FTS_PREFIX}*',)))
+    indexes = {
+        name: (table_name, sql)
+        for name, table_name, sql in db.execute('''
+            SELECT name, tbl_name, sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND NOT tbl_name GLOB ?
+        ''', (f'{FTS_PREFIX}*',))
+    }
+    return tables, indexes
+
+
+def get_views(db):
+    return dict(db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'"))
+
+
+# Whether the rowid of the table is an INTEGER PRIMARY KEY column
+def has_rowid_column(db, table_name):
+    primary_keys = [
+        column_type for _, _, column_type, _, _, pk in db.execute(f'PRAGMA table_info("{table_name}")')
+        if pk
+    ]
+    return primary_keys == ['INTEGER']
+
+
+# The table options (WITHOUT ROWID, STRICT) come after the column definitions
+def is_without_rowid(db, table_name):
+    (sql,) = db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+    return 'WITHOUT ROWID' in sql[sql.rindex(')'):].upper()
+
+
+# Yields the (rowid, values) of every row of the table in rowid order, for
+# WITHOUT ROWID tables the rowid is the tuple of the key columns
+def read_rows(db, table_name):
+    if is_without_rowid(db, table_name):
+        key = get_primary_key(db, table_name)
+        key_columns = ','.join(f'"{column}"' for column in key)
+        for row in db.execute(f'SELECT {key_columns}, * FROM "{table_name}" ORDER BY {key_columns}'):
+            yield row[:len(key)], row[len(key):]
+        return
+    for row in db.execute(f'SELECT rowid, * FROM "{table_name}" ORDER BY rowid'):
+        yield row[0], row[1:]
+
+
+def hash_row(row):
+    return hashlib.sha1(repr(row).encode('utf8')).digest()
+
+
+# Both sides are in rowid order so they can be merged without holding either
+# table in memory
+def diff_by_key(base_rows, rows):
+    base_rows = iter(base_rows)
+    base = next(base_rows, None)
+    for row_id, row in rows:
+        while base is not None and base[0] < row_id:
+            yield ('delete', base[0], None, None, None)
+            base = next(base_rows, None)
+        if base is not None and base[0] == row_id:
+            if base[1] != row:
+                yield ('update', row_id, None, None, row)
+            base = next(base_rows, None)
+        else:
+            yield ('insert', row_id, None, None, row)
+    while base is not None:
+        yield ('delete', base[0], None, None, None)
+        base = next(base_rows, None)
+
+
+def diff_by_content(base_rows, rows):
+    # Only the hashes of the base rows are kept in memory. The n-th copy of a
+    # row in the base is matched with the n-th copy in the new rows, so
+    # unchanged tables (even with duplicate rows) have no moves.
+    base_row_ids = {}
+    for row_id, row in base_rows:
+        base_row_ids.setdefault(hash_row(row), []).append(row_id)
+    for row_ids in base_row_ids.values():
+        row_ids.reverse()
+
+    moves = []
+    for row_id, row in rows:
+        row_ids = base_row_ids.get(hash_row(row))
+        if not row_ids:
+            yield ('insert', row_id, None, None, row)
+            continue
+        base_row_id = row_ids.pop()
+        if base_row_id != row_id:
+            moves.append((base_row_id, row_id))
+
+    for row_ids in base_row_ids.values():
+        for row_id in row_ids:
+            yield ('delete', row_id, None, None, None)
+
+    # Inserting or deleting a row shifts all the rows after it, which comes out
+    # as a single run
+    moves.sort()
+    run = None
+    for base_row_id, row_id in moves:
+        if run and base_row_id == run[0] + run[2] and row_id == run[1] + run[2]:
+            run[2] += 1
+            continue
+        if run:
+            yield ('move', *run, None)
+        run = [base_row_id, row_id, 1]
+    if run:
+        yield ('move', *run, None)
+
+
+# Maps the row_id of the links through the runs of moved rowids of their tables,
+# moves is a dict of table_name to sorted (row_id, new_row_id, count) runs
+def move_links(rows, names, moves):
+    table_name_idx = names.index('table_name')
+    row_id_idx = names.index('row_id')
+    starts = {table_name: [run[0] for run in runs] for table_name, runs in moves.items()}
+    for rowid, row in rows:
+        runs = moves.get(row[table_name_idx])
+        if runs:
+            i = bisect.bisect_right(starts[row[table_name_idx]], row[row_id_idx]) - 1
+            if i >= 0 and row[row_id_idx] < runs[i][0] + runs[i][2]:
+                row = list(row)
+                row[row_id_idx] += runs[i][1] - runs[i][0]
+                row = tuple(row)
+        yield rowid, row
+
+
+# Writes a patch that turns the base database into the new one, returns the
+# number of row operations of each kind per changed table
+def create_patch(base_db, db, patch_file, metadata):
+    if os.path.exists(patch_file):
+        os.remove(patch_file)
+    patch = sqlite3.connect(patch_file)
+    patch.execute('PRAGMA page_size = 1024')
+    for sql in PATCH_SCHEMA:
+        patch.execute(sql)
+    patch.executemany('INSERT INTO __metadata VALUES (?, ?)', metadata.items())
+    # The statistics tables aren't patched, they're regenerated instead
+    if db.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        patch.execute("INSERT INTO __metadata VALUES ('analyze', '1')")
+    if has_fts_tables(db):
+        patch.execute("INSERT INTO __metadata VALUES ('fts', '1')")
+
+    base_tables, base_indexes = get_schema(base_db)
+    tables, indexes = get_schema(db)
+
+    changes = {}
+    for table_name in base_tables.keys() - tables.keys():
+        patch.execute('INSERT INTO __patch_tables VALUES (?, ?, NULL, NULL, NULL)', (table_name, 'drop'))
+        changes[table_name] = 'drop'
+
+    # The links are last so the moves of every other table are known
+    moves = {}
+    for table_name in sorted(tables, key=lambda table_name: table_name == '__text_links'):
+        sql = tables[table_name]
+        rows = read_rows(db, table_name)
+        (row_count,) = db.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()
+        if table_name not in base_tables:
+            action, base_row_count = 'create', None
+            ops = (('insert', row_id, None, None, row) for row_id, row in rows)
+        elif base_tables[table_name] != sql:
+            action, base_row_count = 'replace', None
+            ops = (('insert', row_id, None, None, row) for row_id, row in rows)
+        else:
+            action = 'update'
+            (base_row_count,) = base_db.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()
+            keyed = has_rowid_column(db, table_name) or is_without_rowid(db, table_name)
+            diff = diff_by_key if keyed else diff_by_content
+            base_rows = read_rows(base_db, table_name)
+            if table_name == '__text_links':
+                names = [column[1] for column in db.execute('PRAGMA table_info("__text_links")')]
+                base_rows = move_links(base_rows, names, moves)
+            ops = diff(base_rows, rows)
+
+        without_rowid = is_without_rowid(db, table_name)
+        counts = {}
+        for op, row_id, new_row_id, count, row in ops:
+            counts[op] = counts.get(op, 0) + (count or 1)
+            if op == 'move':
+                moves.setdefault(table_name, []).append((row_id, new_row_id, count))
+            if without_rowid:
+                row_id, row = None, row_id if op == 'delete' else row
+            data = None if row is None else json.dumps(row, ensure_ascii=False)
+            patch.execute('INSERT INTO __patch_rows VALUES (?, ?, ?, ?, ?, ?)', (table_name, op, row_id, new_row_id, count, data))
+
+        if action != 'update' or counts:
+            patch.execute('INSERT INTO __patch_tables VALUES (?, ?, ?, ?, ?)', (table_name, action, sql, base_row_count, row_count))
+            changes[table_name] = counts
+
+    # Indexes are dropped along with their table, and have to be recreated for
+    # tables that are (re)created
+    for index_name, (table_name, sql) in indexes.items():
+        recreated = base_tables.get(table_name) != tables[table_name]
+        if recreated or base_indexes.get(index_name) != (table_name, sql):
+            patch.execute('INSERT INTO __patch_indexes VALUES (?, ?, ?)', (index_name, table_name, sql))
+    for index_name, (table_name, sql) in base_indexes.items():
+        if index_name not in indexes and table_name in tables:
+            patch.execute('INSERT INTO __patch_indexes VALUES (?, ?, NULL)', (index_name, table_name))
+
+    patch.executemany('INSERT INTO __patch_views VALUES (?, ?)', get_views(db).items())
+
+    patch.commit()
+    patch.execute('VACUUM')
+    patch.close()
+    return changes
+
+
+# Applies a patch to the database in a single transaction, nothing is changed
+# if it fails. Raises a ValueError if the database isn't the patch's base.
+def apply_patch(db, patch):
+    if db.in_transaction:
+        db.commit()
+    db.execute('BEGIN')
+    try:
+        changes = _apply_patch(db, patch)
+        db.commit()
+    except:
+        db.rollback()
+        raise
+    return changes
+
+
+def _apply_patch(db, patch):
+    tables, indexes = get_schema(db)
+
+    patch_tables = patch.execute('SELECT table_name, action, sql, base_rows FROM __patch_tables ORDER BY table_name').fetchall()
+    # The links are patched last, once the moves of the other tables have been
+    # carried over to them
+    patch_tables.sort(key=lambda patch_table: patch_table[0] == '__text_links')
+    has_links = '__text_links' in tables
+    for table_name, action, sql, base_rows in patch_tables:
+        if action in ('update', 'drop') and table_name not in tables:
+            raise ValueError(f'The {table_name} table does not exist')
+        if action == 'update':
+            if tables[table_name] != sql:
+                raise ValueError(f'The {table_name} table has a different schema')
+            (row_count,) = db.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()
+            if row_count != base_rows:
+                raise ValueError(f'The {table_name} table has {row_count} rows, expected {base_rows}')
+
+    for index_name, _, _ in patch.execute('SELECT * FROM __patch_indexes'):
+        db.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+    # The views are replaced as a whole, and first as a table may take the
+    # place of a view with the same name
+    for view_name in get_views(db):
+        db.execute(f'DROP VIEW "{view_name}"')
+
+    changes = {}
+    for table_name, action, sql, base_rows in patch_tables:
+        if action == 'drop':
+            db.execute(f'DROP TABLE "{table_name}"')
+            changes[table_name] = 'drop'
+            continue
+        if action in ('create', 'replace'):
+            db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            db.execute(sql)
+
+        columns = [f'"{column[1]}"' for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+        # WITHOUT ROWID tables are patched by key instead of rowid
+        key = get_primary_key(db, table_name) if is_without_rowid(db, table_name) else None
+        # Whether the rows hold their own key, otherwise the rowid is inserted
+        has_key = has_rowid_column(db, table_name) or bool(key)
+        insert_columns = ','.join(columns if has_key else ['rowid', *columns])
+        insert_sql = f'INSERT INTO "{table_name}" ({insert_columns}) VALUES ({",".join("?" * (len(columns) + (not has_key)))})'
+        update_sql = f'UPDATE "{table_name}" SET {",".join(f"{column} = ?" for column in columns)} WHERE rowid = ?'
+        if key:
+            where = ' AND '.join(f'"{column}" = ?' for column in key)
+            key_positions = [columns.index(f'"{column}"') for column in key]
+            delete_sql = f'DELETE FROM "{table_name}" WHERE {where}'
+            update_sql = f'UPDATE "{table_name}" SET {",".join(f"{column} = ?" for column in columns)} WHERE {where}'
+
+        counts = {}
+        for op in OPS:
+            ops = patch.execute('SELECT row_id, new_row_id, count, data FROM __patch_rows WHERE table_name = ? AND op = ? ORDER BY rowid', (table_name, op))
+            for row_id, new_row_id, count, data in ops:
+                counts[op] = counts.get(op, 0) + (count or 1)
+                if key and op == 'delete':
+                    db.execute(delete_sql, json.loads(data))
+                elif key and op == 'update':
+                    row = json.loads(data)
+                    db.execute(update_sql, (*row, *(row[i] for i in key_positions)))
+                elif op == 'delete':
+                    db.execute(f'DELETE FROM "{table_name}" WHERE rowid = ?', (row_id,))
+                elif op == 'move':
+                    # Moved to negative rowids first so the runs don't collide
+                    db.execute(f'UPDATE "{table_name}" SET rowid = -(rowid - ? + ?) WHERE rowid BETWEEN ? AND ?', (row_id, new_row_id, row_id, row_id + count - 1))
+                    if has_links and table_name != '__text_links':
+                        db.execute('UPDATE __text_links SET row_id = -(row_id - ? + ?) WHERE table_name = ? AND row_id BETWEEN ? AND ?', (row_id, new_row_id, table_name, row_id, row_id + count - 1))
+                elif op == 'update':
+                    db.execute(update_sql, (*json.loads(data), row_id))
+                elif op == 'insert':
+                    row = json.loads(data)
+                    db.execute(insert_sql, row if has_key else (row_id, *row))
+            if op == 'move' and 'move' in counts:
+                db.execute(f'UPDATE "{table_name}" SET rowid = -rowid WHERE rowid < 0')
+                if has_links and table_name != '__text_links':
+                    db.execute('UPDATE __text_links SET row_id = -row_id WHERE table_name = ? AND row_id < 0', (table_name,))
+        changes[table_name] = counts
+
+    for _, _, sql in patch.execute('SELECT * FROM __patch_indexes WHERE sql IS NOT NULL'):
+        db.execute(sql)
+    for _, sql in patch.execute('SELECT * FROM __patch_views'):
+        db.execute(sql)
+
+    if patch.execute("SELECT 1 FROM __metadata WHERE key = 'fts'").fetchone():
+        create_fts_tables(db)
+    else:
+        drop_fts_tables(db)
+
+    if patch.execute("SELECT 1 FROM __metadata WHERE key = 'analyze'").fetchone():
+        db.execute('ANALYZE')
+
+    return changes
@@ -0,0 +1,306 @@
+import itertools
+import json
+import operator
+import re
+
+
+INT_PATTTERN = re.compile(r'^-?\d+$') # Matches: 123, -123, 0
+REAL_PATTERN = re.compile(r'^(?:-?\d+\.\d*|\.\d+)$') # Matches: 123.456, -123.456, 0.456, .456, 123.
+def get_value_type(value):
+    if not value:
+        return 'NULL'
+    # Skip the regexes for the common cases, plain digits (\d is any unicode
+    # decimal, same as isdecimal) and values that can't be a number at all
+    if value.isdecimal():
+        return 'INTEGER'
+    if not (value[0].isdecimal() or value[0] in '-.'):
+        return 'TEXT'
+    if INT_PATTTERN.match(value):
+        return 'INTEGER'
+    if REAL_PATTERN.match(value):
+        return 'REAL'
+    return 'TEXT'
+
+
+def get_column_type(value_types):
+    # if there is even a single TEXT value, the column is TEXT
+    if 'TEXT' in value_types:
+        return 'TEXT'
+    if 'REAL' in value_types:
+        return 'REAL'
+    if 'INTEGER' in value_types or 'FLAG' in value_types:
+        return 'INTEGER'
+    # if there's no values at all, default to BLOB (ie. no coercion)
+    return 'BLOB'
+
+
+def get_column_is_nullable(value_types):
+    # if there is even a single NULL value, the column is NULLABLE
+    return 'NULL' in value_types
+
+
+def get_column_is_flag(value_types):
+    # a column of only 0 and 1 values (eg. is_baby or needs_overworld_rain)
+    return 'FLAG' in value_types and value_types <= {'FLAG', 'NULL'}
+
+
+# Natural keys are looked for in tables without a unique id column, they start
+# with the first column and have up to KEY_MAX_COLUMNS of the *_id (or slot)
+# columns
+KEY_MAX_COLUMNS = 3
+KEY_COLUMN_SUFFIXES = ('_id', 'slot')
+# Tables with a composite key are stored WITHOUT ROWID (ie. clustered on the
+# key), which the SQLite docs recommend for rows of less than about 1/20th of a
+# page. Longer rows (mostly prose) stay in rowid tables.
+WITHOUT_ROWID_MAX_ROW_SIZE = 200
+# The mark-up removed from text columns by build.py, the links it leaves behind
+# refer to rows by rowid so those tables need one
+MARKUP = ']{'
+
+
+# Whether all the values are ASCII digits without leading zeros, which sort like
+# the numbers they are when compared by length first (negative numbers and the
+# like aren't expected in keys)
+def is_plain_digits(values):
+    text = ''.join(values)
+    if '' in values or not (text.isascii() and text.isdecimal()):
+        return False
+    return ('\0' + '\0'.join(values)).count('\0' + '0') == values.count('0')
+
+
+# Looks for a natural key in the rows of a CSV file, see infer_schema
+class KeyCandidates:
+    def __init__(self, headers):
+        self.column_count = len(headers)
+        self.candidates = []
+        if headers and headers[0].endswith('_id'):
+            columns = [i for i, name in enumerate(headers) if i and name.endswith(KEY_COLUMN_SUFFIXES)]
+            self.candidates = [
+                (0, *combination)
+                for size in range(KEY_MAX_COLUMNS)
+                for combination in itertools.combinations(columns, size)
+            ]
+        # The last key of the previous chunk of each candidate
+        self.previous = {}
+        self.row_count = 0
+        self.row_size = 0
+
+    # Checks the next chunk of rows, given both as rows and as columns
+    def check(self, rows, columns):
+        if set(map(len, rows)) != {self.column_count}:
+            self.candidates = []
+            return
+
+        self.row_count += len(rows)
+        for column in columns:
+            text = ''.join(column)
+            self.row_size += len(text)
+            if MARKUP in text:
+                self.candidates = []
+                return
+
+        # Keys are made of plain digits, which are compared by (length, digits)
+        # as that's a lot quicker than converting them to numbers
+        values = {}
+        for col_idx in {col_idx for candidate in self.candidates for col_idx in candidate}:
+            if is_plain_digits(columns[col_idx]):
+                values[col_idx] = (list(map(len, columns[col_idx])), columns[col_idx])
+
+        candidates = []
+        for candidate in self.candidates:
+            if not all(col_idx in values for col_idx in candidate):
+                continue
+            keys = list(zip(*(value for col_idx in candidate for value in values[col_idx])))
+            if candidate in self.previous:
+                keys.insert(0, self.previous[candidate])
+            if all(map(operator.lt, keys, keys[1:])):
+                candidates.append(candidate)
+                self.previous[candidate] = keys[-1]
+        self.candidates = candidates
+
+    @property
+    def average_row_size(self):
+        return self.row_size / self.row_count if self.row_count else 0
+
+
+class Column:
+    def __init__(self, name, type, nullable=False, primary_key=False, flag=False):
+        self.name = name
+        self.type = type
+        self.nullable = nullable
+        # Either the INTEGER PRIMARY KEY or part of a composite key
+        self.primary_key = primary_key
+        # Only ever 0 or 1 (or NULL)
+        self.flag = flag
+
+    # Flag columns are only constrained to 0 and 1 in STRICT tables, without
+    # STRICT their empty values aren't NULL
+    def to_sql(self, inline_primary_key=True, strict=False):
+        sql = f'"{self.name}" {self.type}'
+        if not self.nullable:
+            sql += ' NOT NULL'
+        if self.primary_key and inline_primary_key:
+            sql += ' PRIMARY KEY'
+        if self.flag and strict:
+            sql += f' CHECK ("{self.name}" IN (0, 1))'
+        return sql
+
+    def __repr__(self):
+        return f'Column({self.name!r}, {self.type!r}, nullable={self.nullable}, primary_key={self.primary_key}, flag={self.flag})'
+
+
+# The inferred schema of a CSV file, it only depends on the contents of the file
+# so it can be serialized and reused as long as the file doesn't change
+class Schema:
+    def __init__(self, columns):
+        self.columns = columns
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    # Indexes of the TEXT columns
+    @property
+    def text_columns(self):
+        return [i for i, column in enumerate(self.columns) if column.type == 'TEXT']
+
+    # Indexes of the columns with empty values
+    @property
+    def nullable_columns(self):
+        return [i for i, column in enumerate(self.columns) if column.nullable]
+
+    # Names of the columns of the composite key of a WITHOUT ROWID table, or
+    # None for rowid tables
+    @property
+    def key(self):
+        key = [column.name for column in self.columns if column.primary_key]
+        return key if len(key) > 1 else None
+
+    # Index of the INTEGER PRIMARY KEY column (ie. the rowid) or None
+    @property
+    def rowid_column(self):
+        if self.key:
+            return None
+        for i, column in enumerate(self.columns):
+            if column.primary_key:
+                return i
+        return None
+
+    def to_sql(self, strict=False):
+        key = self.key
+        definitions = [column.to_sql(inline_primary_key=not key, strict=strict) for column in self.columns]
+        if key:
+            key_columns = ','.join(f'"{name}"' for name in key)
+            definitions.append(f'PRIMARY KEY ({key_columns})')
+        return definitions
+
+    # STRICT tables need the empty values to be NULL (see build.py --strict)
+    def create_table_sql(self, table_name, strict=False):
+        sql = f'CREATE TABLE "{table_name}" ({",".join(self.to_sql(strict=strict))})'
+        options = []
+        if self.key:
+            options.append('WITHOUT ROWID')
+        if strict:
+            options.append('STRICT')
+        if options:
+            sql += ' ' + ', '.join(options)
+        return sql
+
+    def to_json(self):
+        return json.dumps([
+            [column.name, column.type, column.nullable, column.primary_key, column.flag]
+            for column in self.columns
+        ])
+
+    @staticmethod
+    def from_json(string):
+        return Schema([Column(*column) for column in json.loads(string)])
+
+    def __repr__(self):
+        return f'Schema({self.columns!r})'
+
+
+# The value types of a column of a chunk of rows, skipping get_value_type for
+# the common case of plain digits. Chunks of only 0 and 1 values are FLAG, which
+# is otherwise the same as INTEGER (any other chunk has an INTEGER, REAL or TEXT
+# value so its column can't be a flag column anyway).
+def get_value_types(values):
+    present = list(filter(None, values))
+    value_types = {'NULL'} if len(present) < len(values) else set()
+    text = ''.join(present)
+    if present and text.isdecimal():
+        value_types.add('FLAG' if len(text) == len(present) and not text.strip('01') else 'INTEGER')
+    else:
+        value_types.update(map(get_value_type, present))
+    return value_types
+
+
+# Infers the schema from the headers and rows of a CSV file.
+#
+# This is a single pass over the rows, a chunk at a time so the cells are
+# classified a column at a time, keeping track of the value types seen in each
+# column (which is all that's needed for the type and nullability) and whether
+# the id column is unique. Once a column has seen both TEXT and NULL values
+# nothing can change its outcome so it's no longer checked.
+#
+# Tables without an id column are checked for a natural key at the same time.
+# Rather than remembering every key, a candidate key is only kept while it's
+# strictly increasing from row to row, which proves it's unique in constant
+# memory (the CSV files are sorted by their natural key) and means the rows are
+# inserted in key order. The smallest key left is used, a single column becomes
+# the INTEGER PRIMARY KEY and a composite one the key of a WITHOUT ROWID table.
+INFER_CHUNK_SIZE = 1024
+def infer_schema(headers, rows):
+    column_count = len(headers)
+    value_types = [set() for _ in headers]
+    pending = list(range(column_count))
+
+    id_idx = headers.index('id') if 'id' in headers else None
+    ids = set()
+    ids_are_unique = True
+
+    keys = KeyCandidates(headers if id_idx is None else [])
+
+    rows = iter(rows)
+    for chunk in iter(lambda: list(itertools.islice(rows, INFER_CHUNK_SIZE)), []):
+        # Short rows are padded with None (ie. NULL), long ones cut
+        columns = list(itertools.zip_longest(*chunk))[:column_count]
+        columns += [(None,) * len(chunk)] * (column_count - len(columns))
+
+        for col_idx in pending:
+            value_types[col_idx].update(get_value_types(columns[col_idx]))
+        pending = [i for i in pending if not {'TEXT', 'NULL'} <= value_types[i]]
+
+        if ids_are_unique and id_idx is not None:
+            id_count = len(ids)
+            ids.update(columns[id_idx])
+            if len(ids) != id_count + len(chunk):
+                ids_are_unique = False
+                ids = None
+
+        if keys.candidates:
+            keys.check(chunk, columns)
+
+    column_types = [get_column_type(types) for types in value_types]
+    column_nullables = [get_column_is_nullable(types) for types in value_types]
+    # ids that happen to only be 0 or 1 aren't flags
+    column_flags = [get_column_is_flag(types) and not name.endswith('id') for name, types in zip(headers, value_types)]
+
+    primary_key = ()
+    if id_idx is not None:
+        if column_types[id_idx] == 'INTEGER' and not column_nullables[id_idx] and ids_are_unique:
+            primary_key = (id_idx,)
+    else:
+        for candidate in keys.candidates:
+            if any(column_types[i] != 'INTEGER' or column_nullables[i] for i in candidate):
+                continue
+            if len(candidate) > 1 and keys.average_row_size > WITHOUT_ROWID_MAX_ROW_SIZE:
+                continue
+            primary_key = candidate
+            break
+
+    columns = []
+    for col_idx, column_name in enumerate(headers):
+        columns.append(Column(column_name, column_types[col_idx], column_nullables[col_idx], col_idx in primary_key, column_flags[col_idx]))
+
+    return Schema(columns)
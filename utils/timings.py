@@ -0,0 +1,76 @@
+import contextlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# Accumulates the time spent in each stage of some work.
+#
+# Stages can be nested (eg. rows being parsed while they're pulled through the
+# scrubbing), in which case the time only counts towards the innermost stage so
+# the stages always add up to the total.
+class Timings:
+    def __init__(self):
+        self.stages = {}
+        self.peak_rss = None
+        self._stack = []
+        self._mark = None
+
+    def _switch(self, stage=None):
+        now = time.perf_counter()
+        if self._stack:
+            current = self._stack[-1]
+            self.stages[current] = self.stages.get(current, 0) + now - self._mark
+        if stage is None:
+            self._stack.pop()
+        else:
+            self._stack.append(stage)
+        self._mark = now
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        self._switch(stage)
+        try:
+            yield
+        finally:
+            self._switch()
+
+    # Wraps an iterable so the time spent producing each item counts towards the stage
+    def iterate(self, stage, iterable):
+        iterator = iter(iterable)
+        while True:
+            self._switch(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._switch()
+            yield item
+
+    def record_peak_rss(self):
+        peak_rss = get_peak_rss()
+        if peak_rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, peak_rss)
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+
+# Returns the peak resident set size (in bytes) of this process and its children
+# that have been waited for, or None if it can't be determined on this platform
+def get_peak_rss():
+    if resource is None:
+        return None
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # macOS reports bytes, everything else kilobytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
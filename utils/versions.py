@@ -0,0 +1,227 @@
+import sqlite3
+
+from .fts import FTS_PREFIX
+from .indexes import get_primary_key, index_name
+from .patch import hash_row, read_rows
+
+
+# Multi-version databases (see build.py --multi-version) hold several builds of
+# pokeapi.sqlite, one per PokeAPI commit, in a single file.
+#
+# The rows of each table are stored once in a __versioned_<table> table and
+# tagged with the range of versions they're valid for (__from_version and
+# __to_version, inclusive), a row that's the same in consecutive versions only
+# takes up space once. The tables themselves are views of these for the latest
+# version, select_version shadows them with TEMP views of another version so
+# any query works unchanged against any version.
+#
+# The __text_links of each version are versioned the same way, with the row_id
+# mapped to the rowid of the row in the __versioned_<table> table. The storage
+# tables are plain rowid tables as a key can have a row per version, they get an
+# index on the primary key of the table (and __from_version) instead.
+#
+# The full-text search tables aren't versioned, they can be rebuilt over the
+# views of the latest version instead.
+
+# Tables of the builds which aren't versioned, the details of each version are
+# in __versions instead
+UNVERSIONED_TABLES = ['__metadata', '__sources']
+
+
+def storage_table(table_name):
+    return f'__versioned_{table_name}'
+
+
+def get_tables(db):
+    tables = {}
+    for (table_name,) in db.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' AND NOT name GLOB ?
+        ORDER BY name
+    ''', (f'{FTS_PREFIX}*',)):
+        if table_name not in UNVERSIONED_TABLES:
+            tables[table_name] = [(column[1], column[2]) for column in db.execute(f'PRAGMA table_info("{table_name}")')]
+    return tables
+
+
+def get_index_columns(db):
+    return {
+        index_name: (table_name, [column[2] for column in db.execute(f'PRAGMA index_info("{index_name}")')])
+        for index_name, table_name in db.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND NOT tbl_name GLOB ?", (f'{FTS_PREFIX}*',))
+    }
+
+
+def create_view(db, table_name, columns, version, temp=False):
+    columns = ','.join(f'"{column}"' for column in columns)
+    condition = f'__from_version <= {version} AND __to_version >= {version}' if version else '0'
+    db.execute(f'''
+        CREATE {"TEMP " if temp else ""}VIEW "{table_name}" AS
+        SELECT {columns} FROM main."{storage_table(table_name)}"
+        WHERE {condition}
+    ''')
+
+
+# Merges the builds of several versions, given as a list of (rev, file) tuples
+# from oldest to newest, into the (empty) database
+def merge_versions(db, versions):
+    version_tables = []
+    version_metadata = []
+    index_columns = {}
+    primary_keys = {}
+    for rev, file in versions:
+        version_db = sqlite3.connect(f'file:{file}?mode=ro', uri=True)
+        version_tables.append(get_tables(version_db))
+        version_metadata.append(dict(version_db.execute('SELECT key, value FROM __metadata')))
+        index_columns.update(get_index_columns(version_db))
+        # The key of the newest version that has one
+        for table_name in version_tables[-1]:
+            primary_key = get_primary_key(version_db, table_name)
+            if primary_key:
+                primary_keys[table_name] = primary_key
+        version_db.close()
+
+    # The columns of a table are those of all its versions, newer versions
+    # first. A column keeps its type only if it's the same in every version.
+    columns = {}
+    for tables in reversed(version_tables):
+        for table_name, table_columns in tables.items():
+            merged = columns.setdefault(table_name, {})
+            for column, column_type in table_columns:
+                merged.setdefault(column, set()).add(column_type)
+
+    db.execute('''
+        CREATE TABLE __versions (
+            version INTEGER PRIMARY KEY,
+            rev TEXT NOT NULL,
+            pokeapi_git_sha TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE __version_tables (
+            version INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            columns TEXT NOT NULL,
+            PRIMARY KEY (version, table_name)
+        )
+    ''')
+    for version, ((rev, _), metadata, tables) in enumerate(zip(versions, version_metadata, version_tables), 1):
+        db.execute('INSERT INTO __versions VALUES (?, ?, ?, ?)', (version, rev, metadata['pokeapi_git_sha'], metadata['created_at']))
+        db.executemany('INSERT INTO __version_tables VALUES (?, ?, ?)', (
+            (version, table_name, ','.join(column for column, _ in table_columns))
+            for table_name, table_columns in tables.items()
+        ))
+
+    for table_name, table_columns in columns.items():
+        definitions = [
+            f'"{column}" {types.pop() if len(types) == 1 else ""}'.strip()
+            for column, types in table_columns.items()
+        ]
+        db.execute(f'''
+            CREATE TABLE "{storage_table(table_name)}" (
+                {", ".join(definitions)},
+                __from_version INTEGER NOT NULL,
+                __to_version INTEGER NOT NULL
+            )
+        ''')
+
+    # The rows that are valid up to the previous version, by hash, and the next
+    # free rowid of each table
+    open_rows = {}
+    next_rowids = {table_name: 1 for table_name in columns}
+    for version, ((_, file), tables) in enumerate(zip(versions, version_tables), 1):
+        version_db = sqlite3.connect(f'file:{file}?mode=ro', uri=True)
+        rowid_maps = {}
+
+        # The links are last so the rowids of every other table are known
+        table_names = sorted(tables, key=lambda table_name: table_name == '__text_links')
+        for table_name in table_names:
+            names = list(columns[table_name])
+            positions = [names.index(column) for column, _ in tables[table_name]]
+            previous_rows = open_rows.get(table_name, {})
+            current_rows = open_rows[table_name] = {}
+            rowid_map = rowid_maps[table_name] = {}
+            inserts = []
+            extends = []
+
+            for rowid, row in read_rows(version_db, table_name):
+                values = [None] * len(names)
+                for position, value in zip(positions, row):
+                    values[position] = value
+                if table_name == '__text_links':
+                    values[names.index('row_id')] = rowid_maps[values[names.index('table_name')]][values[names.index('row_id')]]
+
+                key = hash_row(tuple(values))
+                storage_rowids = previous_rows.get(key)
+                if storage_rowids:
+                    storage_rowid = storage_rowids.pop()
+                    extends.append((version, storage_rowid))
+                else:
+                    storage_rowid = next_rowids[table_name]
+                    next_rowids[table_name] += 1
+                    inserts.append((storage_rowid, *values, version, version))
+                current_rows.setdefault(key, []).append(storage_rowid)
+                rowid_map[rowid] = storage_rowid
+
+            table = storage_table(table_name)
+            insert_columns = ','.join(['rowid', *(f'"{name}"' for name in names), '__from_version', '__to_version'])
+            db.executemany(f'INSERT INTO "{table}" ({insert_columns}) VALUES ({",".join("?" * (len(names) + 3))})', inserts)
+            db.executemany(f'UPDATE "{table}" SET __to_version = ? WHERE rowid = ?', extends)
+
+        # Tables that don't exist in this version can't be continued
+        for table_name in columns.keys() - tables.keys():
+            open_rows.pop(table_name, None)
+        version_db.close()
+
+    # The secondary indexes leave out the columns the tables of the builds are
+    # ordered by, which only the index of the primary key covers here
+    for table_name, primary_key in primary_keys.items():
+        index = [*primary_key, '__from_version']
+        db.execute(f'''
+            CREATE INDEX "{index_name(storage_table(table_name), primary_key)}"
+            ON "{storage_table(table_name)}" ({",".join(f'"{column}"' for column in index)})
+        ''')
+
+    for name, (table_name, index) in index_columns.items():
+        if table_name in columns:
+            db.execute(f'''
+                CREATE INDEX IF NOT EXISTS "{storage_table(name)}"
+                ON "{storage_table(table_name)}" ({",".join(f'"{column}"' for column in index)})
+            ''')
+
+    latest = len(versions)
+    latest_tables = version_tables[-1]
+    for table_name, table_columns in latest_tables.items():
+        create_view(db, table_name, [column for column, _ in table_columns], latest)
+
+
+# Switches the connection to another version of a multi-version database, the
+# version is either its number, the rev it was built from or the prefix of its
+# pokeapi_git_sha. Returns the version number.
+def select_version(db, version):
+    # Plain tuples whatever the row factory of the connection
+    cursor = db.cursor()
+    cursor.row_factory = None
+
+    row = cursor.execute('''
+        SELECT version FROM __versions
+        WHERE version = ? OR rev = ? OR pokeapi_git_sha LIKE ? || '%'
+        ORDER BY version DESC
+    ''', (version, version, version)).fetchone()
+    if row is None:
+        raise ValueError(f'Unknown version: {version}')
+    version = row[0]
+
+    # Tables that don't exist in the version are kept as empty views, the
+    # columns are those of the newest version that has them
+    tables = {}
+    for table_version, table_name, table_columns in cursor.execute('SELECT version, table_name, columns FROM __version_tables ORDER BY version').fetchall():
+        if tables.get(table_name, (None,))[0] != version:
+            tables[table_name] = (table_version, table_columns.split(','))
+
+    for (table_name,) in cursor.execute("SELECT name FROM sqlite_temp_master WHERE type = 'view'").fetchall():
+        db.execute(f'DROP VIEW temp."{table_name}"')
+    for table_name, (table_version, table_columns) in tables.items():
+        create_view(db, table_name, table_columns, version if table_version == version else None, temp=True)
+
+    return version